@@ -0,0 +1,75 @@
+"""
+Benchmark del reparto justo de plazas del LLM (fair_scheduler.py)
+Un cliente abusivo lanza de golpe muchos turnos (una sesión por turno) mientras varios
+clientes normales conversan turno a turno. Se compara la latencia de los clientes normales:
+
+- fifo: todos los turnos cuentan como un mismo cliente (cola por orden de llegada)
+- drr:  cada cliente tiene su parte (deficit round-robin entre clientes)
+
+Modelo simulado (simulated_llm.py): sin red ni API key.
+Ejecutar desde la raíz del proyecto: python benchmarks/bench_fairness.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+CAPACITY = int(os.getenv("BENCH_CAPACITY", 4))
+FLOOD_TURNS = int(os.getenv("BENCH_FLOOD_TURNS", 80))
+NORMAL_CLIENTS = int(os.getenv("BENCH_NORMAL_CLIENTS", 3))
+NORMAL_TURNS = int(os.getenv("BENCH_NORMAL_TURNS", 5))
+LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", 40))
+
+async def run(system, scheduler_mode: str):
+    import fair_scheduler
+    from fair_scheduler import FairScheduler, client_scope
+
+    scheduler = fair_scheduler.fair_scheduler = FairScheduler(CAPACITY)
+    import multi_agents
+    multi_agents.fair_scheduler = scheduler
+
+    def client(name: str) -> str:
+        return "todos" if scheduler_mode == "fifo" else name
+
+    async def flood(i: int):
+        with client_scope(client("abusivo")):
+            await system.process_message("Hola", session_id=f"flood-{i}")
+
+    async def conversation(n: int):
+        latencies = []
+        with client_scope(client(f"normal-{n}")):
+            for _ in range(NORMAL_TURNS):
+                started = time.perf_counter()
+                await system.process_message("¿Qué horario tenéis?", session_id=f"normal-{n}")
+                latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    flood_tasks = [asyncio.create_task(flood(i)) for i in range(FLOOD_TURNS)]
+    await asyncio.sleep(0)
+    normal = await asyncio.gather(*(conversation(n) for n in range(NORMAL_CLIENTS)))
+    await asyncio.gather(*flood_tasks)
+
+    latencies = sorted(ms for client_latencies in normal for ms in client_latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    waits = [scheduler.session_wait(f"normal-{n}")["avg_wait_ms"] for n in range(NORMAL_CLIENTS)]
+    print(f"{scheduler_mode:>6} {statistics.median(latencies):>10.0f} {p95:>10.0f} {statistics.mean(waits):>14.0f}")
+
+def main():
+    os.environ["TRACING_ENABLED"] = "false"
+    os.environ["LOAD_SHEDDING_ENABLED"] = "false"
+    from multi_agents import RestauranteMultiAgentSystem
+    from simulated_llm import simulated_runner
+
+    system = RestauranteMultiAgentSystem(speculative=False, mode="multi", runner=simulated_runner(LLM_LATENCY_MS))
+
+    print(f"⚖️ {CAPACITY} plazas, {FLOOD_TURNS} turnos del cliente abusivo, "
+          f"{NORMAL_CLIENTS} clientes normales × {NORMAL_TURNS} turnos (LLM {LLM_LATENCY_MS:.0f} ms/llamada)")
+    print(f"{'modo':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'espera media':>14}")
+    for mode in ("fifo", "drr"):
+        asyncio.run(run(system, mode))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark del coste de logging por turno de chat
+Mide el tiempo que pasa el hilo del event loop emitiendo los logs de un turno
+(orquestador + agente con una tool) con distintas configuraciones.
+
+Ejecutar desde la raíz del proyecto: python benchmarks/bench_logging.py
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from log_pipeline import setup_logging, log_context
+
+TURNS = int(os.getenv("BENCH_TURNS", 20000))
+
+# Latencia simulada por escritura en el destino lento (pipe lleno, disco o colector saturado)
+SINK_LATENCY_US = float(os.getenv("BENCH_SINK_LATENCY_US", 200))
+
+class SlowStream:
+    """Stream que bloquea en cada escritura, como stderr redirigido a un colector lento"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def write(self, data: str):
+        time.sleep(SINK_LATENCY_US / 1e6)
+        return self.inner.write(data)
+
+    def flush(self):
+        self.inner.flush()
+
+def legacy_turn(logger: logging.Logger, turn: int):
+    """Logs de un turno tal y como se emitían antes (f-strings a INFO, síncronos)"""
+    response = "Te recomiendo el menú degustación, con entrantes de temporada y postre casero. " * 3
+    for agent in ("orchestrator", "menus_agent"):
+        logger.info(f"🏃 Agent {agent} ejecutando mensaje #{turn}")
+        if agent == "menus_agent":
+            logger.info(f"🔧 Agent {agent} llamando función: listar_menus_disponibles")
+        logger.info(f"✅ Agent {agent} completó ejecución #{turn}")
+        if agent == "orchestrator":
+            logger.info(f"🎯 Orquestador eligió: {['menus_agent']} - Consulta sobre menús")
+    logger.info(f"📝 Respuesta del agente: {response[:100]}...")
+    logger.info(f"🧭 Acción de navegación detectada: {None}")
+
+def pipeline_turn(logger: logging.Logger, turn: int):
+    """Logs de un turno con el pipeline actual (lazy %-format, categorías, contexto)"""
+    response = "Te recomiendo el menú degustación, con entrantes de temporada y postre casero. " * 3
+    with log_context(session_id="bench", trace_id="0" * 32):
+        for agent in ("orchestrator", "menus_agent"):
+            with log_context(agent=agent):
+                logger.debug("🏃 Ejecutando mensaje #%d", turn, extra={"category": "agent"})
+                if agent == "menus_agent":
+                    logger.info("🔧 Llamando función %s", "listar_menus_disponibles",
+                                extra={"category": "tool", "tool": "listar_menus_disponibles"})
+                logger.info("✅ Ejecución #%d completada", turn, extra={"category": "agent", "latency_ms": 812.4})
+            if agent == "orchestrator":
+                logger.info("🎯 Orquestador eligió: %s - %s", ["menus_agent"], "Consulta sobre menús",
+                            extra={"category": "routing"})
+        logger.debug("📝 Respuesta del agente: %.100s...", response, extra={"category": "response"})
+        logger.debug("🧭 Acción de navegación detectada: %s", None, extra={"category": "response"})
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+def run(name: str, turn_fn, configure, slow: bool = False) -> float:
+    """Ejecuta TURNS turnos y devuelve µs por turno en el hilo que loguea"""
+    reset_root()
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as out:
+        listener = configure(SlowStream(out) if slow else out)
+        logger = logging.getLogger("bench")
+        start = time.perf_counter()
+        for turn in range(TURNS):
+            turn_fn(logger, turn)
+        elapsed = time.perf_counter() - start
+        if listener:
+            listener.stop()
+        out.flush()
+        size = out.tell()
+
+    per_turn_us = elapsed / TURNS * 1e6
+    print(f"{name:<42} {per_turn_us:>9.1f} µs/turno  {size / TURNS:>7.0f} bytes/turno")
+    return per_turn_us
+
+def configure_legacy(out):
+    """Equivalente a logging.basicConfig(level=INFO): escritura síncrona"""
+    handler = logging.StreamHandler(out)
+    handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    return None
+
+def main():
+    print("=" * 80)
+    print(f"📊 BENCHMARK DE LOGGING POR TURNO ({TURNS} turnos)")
+    print("=" * 80)
+
+    scenarios = [
+        ("Síncrono (basicConfig INFO)", legacy_turn, configure_legacy),
+        ("Cola + texto estructurado", pipeline_turn, lambda out: setup_logging("INFO", stream=out)),
+        ("Cola + JSON", pipeline_turn, lambda out: setup_logging("INFO", json_output=True, stream=out)),
+        ("Cola + muestreo (agent=0.1, routing=0.2)", pipeline_turn,
+         lambda out: setup_logging("INFO", sampling={"agent": 0.1, "routing": 0.2}, stream=out)),
+    ]
+
+    for slow in (False, True):
+        title = f"destino lento ({SINK_LATENCY_US:.0f} µs/escritura)" if slow else "destino rápido (fichero)"
+        print(f"\n▶ {title}")
+        results = [run(name, turn_fn, configure, slow) for name, turn_fn, configure in scenarios]
+        legacy = results[0]
+        print(f"  Coste en el hilo del event loop vs síncrono: "
+              + ", ".join(f"{name.split(' (')[0]} {100 * (r / legacy - 1):+.0f}%"
+                          for (name, _, _), r in zip(scenarios[1:], results[1:])))
+
+if __name__ == "__main__":
+    main()
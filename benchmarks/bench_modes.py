@@ -0,0 +1,105 @@
+"""
+Benchmark del modo multi-agente (orquestador + especialista) frente al modo fusionado
+Reproduce las conversaciones grabadas en conversations.json con cada modo y compara
+latencia, llamadas al LLM, tokens y calidad (routing, tools y navegación esperados).
+Con --prompt-variants también compara las variantes de prompt (A/B de full frente a compact).
+
+Requiere GEMINI_API_KEY y la API Node en marcha (las tools llaman al backend real).
+
+Ejecutar desde la raíz del proyecto:
+    python benchmarks/bench_modes.py
+    python benchmarks/bench_modes.py --modes fused --conversations otra.json
+    python benchmarks/bench_modes.py --modes multi --prompt-variants full compact
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+DEFAULT_CONVERSATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.json")
+
+def load_conversations(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def score_turn(expected: Dict[str, Any], result: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    """Compara un turno con lo esperado (el routing solo aplica al modo multi)"""
+    tools_used = set(result.get("tools_used") or [])
+    return {
+        "routing_ok": sorted(result.get("agents_used") or []) == sorted(expected["agents"]) if mode == "multi" else None,
+        "tools_ok": set(expected["tools"]) <= tools_used,
+        "navigation_ok": result.get("navigation_action") == expected["navigation"]
+    }
+
+async def run_mode(system, conversations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reproduce todas las conversaciones con un sistema ya inicializado"""
+    rows = []
+    for conversation in conversations:
+        system.reset_session(conversation["name"])
+        for expected in conversation["turns"]:
+            started = time.perf_counter()
+            result = await system.process_message(expected["user"], session_id=conversation["name"])
+            latency_ms = (time.perf_counter() - started) * 1000
+            rows.append({
+                "conversation": conversation["name"],
+                "user": expected["user"],
+                "success": bool(result.get("success")),
+                "latency_ms": latency_ms,
+                **(result.get("usage") or {}),
+                **score_turn(expected, result, system.mode)
+            })
+    return rows
+
+def _rate(rows: List[Dict[str, Any]], key: str) -> str:
+    values = [row[key] for row in rows if row.get(key) is not None]
+    return f"{100 * sum(values) / len(values):.0f}%" if values else "—"
+
+def summarize(mode: str, rows: List[Dict[str, Any]], variant: str = "full"):
+    latencies = sorted(row["latency_ms"] for row in rows)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"\n▶ Modo {mode}, prompts {variant} ({len(rows)} turnos)")
+    print(f"  Latencia media {statistics.mean(latencies):.0f} ms, p50 {statistics.median(latencies):.0f} ms, p95 {p95:.0f} ms")
+    print(f"  Llamadas LLM/turno {statistics.mean(row.get('llm_calls', 0) for row in rows):.2f}, "
+          f"tokens entrada/turno {statistics.mean(row.get('prompt_tokens', 0) for row in rows):.0f}, "
+          f"tokens salida/turno {statistics.mean(row.get('output_tokens', 0) for row in rows):.0f}")
+    print(f"  Éxito {_rate(rows, 'success')}, routing {_rate(rows, 'routing_ok')}, "
+          f"tools {_rate(rows, 'tools_ok')}, navegación {_rate(rows, 'navigation_ok')}")
+    for row in rows:
+        if not (row["success"] and row["tools_ok"] and row["navigation_ok"] and row["routing_ok"] is not False):
+            print(f"  ⚠️ {row['conversation']}: {row['user'][:60]}")
+
+async def main_async(args):
+    from config import configure_gemini, configure_logging
+    from multi_agents import RestauranteMultiAgentSystem
+
+    configure_logging()
+    configure_gemini()
+    conversations = load_conversations(args.conversations)
+
+    print("=" * 80)
+    print(f"📊 BENCHMARK MULTI-AGENTE vs FUSIONADO ({sum(len(c['turns']) for c in conversations)} turnos)")
+    print("=" * 80)
+
+    for mode in args.modes:
+        for variant in args.prompt_variants:
+            # Sin vía rápida de navegación: se mide lo que responde el modelo con cada prompt
+            system = RestauranteMultiAgentSystem(
+                speculative=False, mode=mode, prompt_variant=variant, navigation_fast_path=False
+            )
+            summarize(mode, await run_mode(system, conversations), variant)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los modos de ejecución multi y fused")
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS, help="Fichero JSON de conversaciones")
+    parser.add_argument("--modes", nargs="+", default=["multi", "fused"], choices=["multi", "fused"])
+    parser.add_argument("--prompt-variants", nargs="+", default=["full"], choices=["full", "compact"])
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
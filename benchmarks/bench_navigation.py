@@ -0,0 +1,98 @@
+"""
+Precisión y cobertura de la vía rápida de navegación
+Evalúa match_navigation sobre el conjunto etiquetado navigation_phrases.json (frase →
+destino, o null si debe ir a los agentes) con varios umbrales de confianza. Un acierto
+es responder sin LLM con el destino correcto; una frase que el matcher deja pasar a los
+agentes no cuenta como error, solo baja la cobertura.
+
+navigation_phrases.json se escribió junto con el matcher: para decidir si se activa
+NAVIGATION_FAST_PATH hay que medir también con frases reales etiquetadas aparte (--phrases).
+
+Ejecutar desde la raíz del proyecto:
+    python benchmarks/bench_navigation.py
+    python benchmarks/bench_navigation.py --threshold 0.8 --verbose
+    python benchmarks/bench_navigation.py --phrases frases_reales.json
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+PHRASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "navigation_phrases.json")
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+def load_phrases(path: str = PHRASES_FILE) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def evaluate(phrases: List[Dict[str, Any]], threshold: float, target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Precisión y cobertura de las respuestas locales (de un destino o de todos)
+
+    Returns:
+        {"precision", "recall", "served", "correct", "expected", "errors": [(frase, esperado, obtenido)]}
+    """
+    from intents import match_navigation
+
+    served = correct = expected = 0
+    errors = []
+    for phrase in phrases:
+        predicted, confidence = match_navigation(phrase["text"])
+        if confidence < threshold:
+            predicted = None
+        if target is not None and target not in (predicted, phrase["target"]):
+            continue
+        expected += phrase["target"] is not None and (target is None or phrase["target"] == target)
+        if predicted is None:
+            if phrase["target"] is not None:
+                errors.append((phrase["text"], phrase["target"], None))
+            continue
+        served += 1
+        if predicted == phrase["target"]:
+            correct += 1
+        else:
+            errors.append((phrase["text"], phrase["target"], predicted))
+    return {
+        "precision": correct / served if served else 1.0,
+        "recall": correct / expected if expected else 1.0,
+        "served": served,
+        "correct": correct,
+        "expected": expected,
+        "errors": errors
+    }
+
+def main(argv: List[str] = None):
+    from intents import NAVIGATION_REPLIES
+
+    parser = argparse.ArgumentParser(description="Precisión y cobertura de la navegación local")
+    parser.add_argument("--threshold", type=float, default=None, help="Umbral del detalle por destino (por defecto NAVIGATION_MIN_CONFIDENCE)")
+    parser.add_argument("--phrases", default=PHRASES_FILE, help="Fichero JSON de frases etiquetadas")
+    parser.add_argument("--verbose", action="store_true", help="Listar las frases mal resueltas")
+    args = parser.parse_args(argv)
+
+    from config import get_settings
+    threshold = args.threshold if args.threshold is not None else get_settings().navigation_min_confidence
+    phrases = load_phrases(args.phrases)
+    positives = sum(1 for phrase in phrases if phrase["target"])
+    print(f"🧭 {len(phrases)} frases etiquetadas ({positives} de navegación, {len(phrases) - positives} para los agentes)")
+
+    print(f"{'umbral':>7} {'precisión':>10} {'cobertura':>10} {'sin LLM':>8}")
+    for value in THRESHOLDS:
+        row = evaluate(phrases, value)
+        print(f"{value:>7.2f} {100 * row['precision']:>9.1f}% {100 * row['recall']:>9.1f}% {row['served']:>8}")
+
+    print(f"\nPor destino (umbral {threshold:.2f}):")
+    print(f"{'destino':<18} {'precisión':>10} {'cobertura':>10}")
+    for target in NAVIGATION_REPLIES:
+        row = evaluate(phrases, threshold, target)
+        print(f"{target:<18} {100 * row['precision']:>9.1f}% {100 * row['recall']:>9.1f}%")
+
+    if args.verbose:
+        for text, expected, predicted in evaluate(phrases, threshold)["errors"]:
+            print(f"  ❌ {text!r}: esperado {expected}, obtenido {predicted}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark de memoria por sesión inactiva
+Crea N sesiones con el mismo contenido que deja un turno real (routing del orquestador
+y respuesta del especialista) y mide con tracemalloc los bytes que ocupa cada sesión:
+
+- compacto: session_store (registros con __slots__, una sola copia, roles internados)
+- anterior: historial en listas de dicts por agente más la copia de la ChatSession
+  (protos de Gemini si el SDK está instalado; si no, dicts como aproximación por debajo)
+
+Ejecutar desde la raíz del proyecto: python benchmarks/bench_sessions.py
+"""
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+SIZES = [int(n) for n in os.getenv("BENCH_SESSION_SIZES", "1000,10000,50000").split(",")]
+TURNS = int(os.getenv("BENCH_TURNS", 2))
+
+def session_turns(i: int) -> List[Dict[str, str]]:
+    """Mensajes que guarda una sesión tras TURNS turnos (texto distinto por sesión)"""
+    turns = []
+    for t in range(TURNS):
+        user = f"Hola, ¿qué menús tenéis para el sábado {i}-{t}? Somos cuatro personas."
+        turns.append({
+            "agent": "orchestrator",
+            "user": f"Analiza esta consulta y determina qué agente(s) deben responder:\n\n{user}",
+            "model": '```json\n{"agents": ["menus_agent"], "reasoning": "Consulta sobre menús"}\n```'
+        })
+        turns.append({
+            "agent": "menus_agent",
+            "user": user,
+            "model": f"Tenemos el Menú del día (14,50 €) y el Menú degustación (45 €) para la sesión {i}-{t}. [NAVEGAR:menu]"
+        })
+    return turns
+
+def build_compact(sessions: int):
+    from session_state import SessionStore
+
+    store = SessionStore(max_sessions=sessions)
+    for i in range(sessions):
+        for turn in session_turns(i):
+            store.record(f"session-{i}", turn["agent"], turn["user"], turn["model"])
+        store.remember_agents(f"session-{i}", ["menus_agent"])
+    return store
+
+def _legacy_content(role: str, text: str):
+    try:
+        import google.generativeai as genai
+        return genai.protos.Content(role=role, parts=[genai.protos.Part(text=text)])
+    except ImportError:
+        return {"role": role, "parts": [text]}
+
+def build_legacy(sessions: int):
+    """Representación anterior: chat_history (dicts) + historial de la ChatSession, por agente"""
+    state = {}
+    for i in range(sessions):
+        agents: Dict[str, Dict[str, Any]] = {}
+        for turn in session_turns(i):
+            agent = agents.setdefault(turn["agent"], {"chat_history": [], "chat": []})
+            for role, text in (("user", turn["user"]), ("model", turn["model"])):
+                agent["chat_history"].append({"role": role, "parts": [text]})
+                agent["chat"].append(_legacy_content(role, text))
+        state[f"session-{i}"] = {"agents": agents, "last_agents": ["menus_agent"]}
+    return state
+
+def measure(build: Callable[[int], Any], sessions: int) -> int:
+    """Bytes retenidos por la estructura construida"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = build(sessions)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del state
+    gc.collect()
+    return retained
+
+def main():
+    os.environ.setdefault("TRACING_ENABLED", "false")
+    build_legacy(1)  # Importa el SDK (si está) fuera de la medición
+
+    print(f"💾 Memoria por sesión inactiva ({TURNS} turnos por sesión)")
+    print(f"{'sesiones':>9} {'compacto':>12} {'B/sesión':>9} {'anterior':>12} {'B/sesión':>9} {'ahorro':>7}")
+    for sessions in SIZES:
+        compact = measure(build_compact, sessions)
+        legacy = measure(build_legacy, sessions)
+        print(f"{sessions:>9} {compact / 1e6:>10.1f}MB {compact / sessions:>9.0f} "
+              f"{legacy / 1e6:>10.1f}MB {legacy / sessions:>9.0f} {100 * (1 - compact / legacy):>6.0f}%")
+
+if __name__ == "__main__":
+    main()
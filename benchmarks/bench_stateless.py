@@ -0,0 +1,124 @@
+"""
+Benchmark de escalado del modo sin estado
+Reparte los turnos de muchas sesiones entre N procesos worker en round-robin (sin afinidad:
+turnos consecutivos de una sesión caen en workers distintos) y mide el throughput.
+
+El LLM se simula (simulated_llm.py) con una latencia fija más un coste de CPU por llamada,
+de forma que cada worker tiene un techo de throughput y el escalado depende solo de poder repartir los turnos.
+Cada respuesta simulada informa de cuántos mensajes de usuario vio el modelo: con contexto
+reconstruido desde la petición debe coincidir con el turno, sirva quien sirva.
+
+Ejecutar desde la raíz del proyecto: python benchmarks/bench_stateless.py
+"""
+import asyncio
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+SESSIONS = int(os.getenv("BENCH_SESSIONS", 64))
+TURNS = int(os.getenv("BENCH_TURNS", 6))
+WORKERS = [int(w) for w in os.getenv("BENCH_WORKERS", "1,2,4").split(",")]
+LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", 40))
+LLM_CPU_MS = float(os.getenv("BENCH_LLM_CPU_MS", 4))
+
+def worker_main(requests, responses):
+    """Proceso worker: atiende turnos concurrentemente sin estado de sesión"""
+    os.environ["TRACING_ENABLED"] = "false"
+    # Se mide el camino del LLM: las respuestas de plantilla del modo degradado falsearían el throughput
+    os.environ["LOAD_SHEDDING_ENABLED"] = "false"
+    from config import get_settings
+    from conversation import build_history
+    from multi_agents import RestauranteMultiAgentSystem
+    from simulated_llm import simulated_runner
+
+    settings = get_settings()
+    system = RestauranteMultiAgentSystem(speculative=False, mode="multi",
+                                         runner=simulated_runner(LLM_LATENCY_MS, LLM_CPU_MS))
+
+    async def handle(request_id, messages):
+        history, user_message = build_history(messages, settings.history_window, settings.history_max_chars)
+        result = await system.process_message(user_message, history=history)
+        responses.put((request_id, result.get("response", "")))
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        pending = set()
+        while True:
+            item = await loop.run_in_executor(None, requests.get)
+            if item is None:
+                break
+            task = asyncio.create_task(handle(*item))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    asyncio.run(serve())
+
+def run(workers: int):
+    """Reproduce SESSIONS sesiones de TURNS turnos con `workers` procesos"""
+    queues = [mp.Queue() for _ in range(workers)]
+    responses = mp.Queue()
+    processes = [mp.Process(target=worker_main, args=(q, responses), daemon=True) for q in queues]
+    for process in processes:
+        process.start()
+
+    conversations = {s: [] for s in range(SESSIONS)}
+    turn_of = {s: 0 for s in range(SESSIONS)}
+    dispatched = 0
+    mismatches = 0
+
+    def dispatch(session: int):
+        nonlocal dispatched
+        conversations[session].append(("user", f"Sesión {session}, pregunta {turn_of[session]}"))
+        queues[dispatched % workers].put((session, list(conversations[session])))
+        dispatched += 1
+
+    # Calentamiento: un turno por worker para no medir el arranque de los procesos
+    for q in queues:
+        q.put((-1, [("user", "warmup")]))
+    for _ in queues:
+        responses.get()
+
+    started = time.perf_counter()
+    for session in conversations:
+        dispatch(session)
+
+    completed = 0
+    while completed < SESSIONS * TURNS:
+        session, text = responses.get()
+        completed += 1
+        if text != f"contexto={turn_of[session]}":
+            mismatches += 1
+        conversations[session].append(("assistant", text))
+        turn_of[session] += 1
+        if turn_of[session] < TURNS:
+            dispatch(session)
+    elapsed = time.perf_counter() - started
+
+    for q in queues:
+        q.put(None)
+    for process in processes:
+        process.join(timeout=10)
+
+    return completed / elapsed, mismatches
+
+def main():
+    print("=" * 80)
+    print(f"📊 ESCALADO DEL MODO SIN ESTADO ({SESSIONS} sesiones x {TURNS} turnos, "
+          f"LLM {LLM_LATENCY_MS:.0f} ms + {LLM_CPU_MS:.0f} ms CPU)")
+    print("=" * 80)
+
+    baseline = None
+    for workers in WORKERS:
+        throughput, mismatches = run(workers)
+        baseline = baseline or throughput / workers
+        print(f"{workers:>2} workers: {throughput:>8.1f} turnos/s  "
+              f"eficiencia {100 * throughput / (baseline * workers):>5.1f}%  "
+              f"contexto incorrecto: {mismatches}")
+
+if __name__ == "__main__":
+    main()
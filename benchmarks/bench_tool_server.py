@@ -0,0 +1,186 @@
+"""
+Benchmark del servidor de tools compartido frente a tools en cada worker
+Lanza N procesos worker que llaman a las tools de lectura (menús y consulta de reservas)
+contra una API Node simulada que cuenta conexiones TCP y peticiones:
+
+- local: cada worker ejecuta las tools en su proceso (pool y caché propios)
+- remoto: los workers llaman por JSON-RPC a un único src/tool_server.py (pool y caché compartidos)
+
+Ejecutar desde la raíz del proyecto: python benchmarks/bench_tool_server.py
+"""
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+WORKERS = int(os.getenv("BENCH_WORKERS", 8))
+CALLS = int(os.getenv("BENCH_CALLS", 200))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", 8))
+BACKEND_LATENCY_MS = float(os.getenv("BENCH_BACKEND_LATENCY_MS", 5))
+BACKEND_PORT = 8791
+TOOL_SERVER_PORT = 8792
+
+# Reparto de llamadas: las de menús son cacheables, consultar_reserva no
+CALL_MIX = [
+    ("listar_menus_disponibles", {}, 0.6),
+    ("get_menu_mas_valorado", {}, 0.2),
+    ("consultar_reserva", {"token": "ABC123"}, 0.2),
+]
+CACHEABLE = {"listar_menus_disponibles", "get_menu_mas_valorado"}
+
+MENUS = [
+    {"id": i, "nombre": f"Menú {i}", "descripcion": "Entrante, principal y postre", "precio": 20 + i,
+     "valoracion_promedio": 3.5 + i / 10, "disponible": True}
+    for i in range(6)
+]
+RESERVA = {"token": "ABC123", "nombre_cliente": "Laura", "fecha_reserva": "2030-01-10T20:00", "num_personas": 2, "estado": "confirmada"}
+
+class FakeBackend:
+    """API Node simulada con HTTP/1.1 keep-alive que cuenta conexiones y peticiones"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.connections = 0
+        self.requests = {}
+        self._loop = None
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while (header := await reader.readline()) not in (b"\r\n", b""):
+                    if header.lower().startswith(b"content-length:"):
+                        length = int(header.split(b":")[1])
+                if length:
+                    await reader.readexactly(length)
+
+                path = request_line.split()[1].decode()
+                self.requests[path] = self.requests.get(path, 0) + 1
+                await asyncio.sleep(BACKEND_LATENCY_MS / 1000)
+                body = json.dumps(MENUS if path == "/menus" else RESERVA).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+            ready.set()
+            self._loop.run_until_complete(server.serve_forever())
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+
+    def reset(self):
+        self.connections = 0
+        self.requests = {}
+
+def worker_main(tool_server_url: str, seed: int, results):
+    """Proceso worker: CALLS llamadas a tools con CONCURRENCY en paralelo"""
+    os.environ["NODE_API_URL"] = f"http://127.0.0.1:{BACKEND_PORT}"
+    os.environ["TOOL_SERVER_URL"] = tool_server_url
+    os.environ["TRACING_ENABLED"] = "false"
+    from tool_server import get_tool_dispatcher
+
+    rng = random.Random(seed)
+    names, args, weights = zip(*CALL_MIX)
+    plan = rng.choices(range(len(names)), weights=weights, k=CALLS)
+
+    async def run():
+        dispatcher = get_tool_dispatcher()
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        errors = 0
+
+        async def call(i):
+            nonlocal errors
+            async with semaphore:
+                result = await dispatcher.dispatch(names[i], dict(args[i]))
+                errors += 1 if result.get("success") is False or "error" in result else 0
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in plan))
+        return time.perf_counter() - started, errors
+
+    elapsed, errors = asyncio.run(run())
+    results.put({
+        "elapsed": elapsed,
+        "errors": errors,
+        "cacheable_calls": sum(1 for i in plan if names[i] in CACHEABLE)
+    })
+
+def run_workers(tool_server_url: str):
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker_main, args=(tool_server_url, seed, results)) for seed in range(WORKERS)]
+    for proc in procs:
+        proc.start()
+    rows = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return rows
+
+def start_tool_server() -> subprocess.Popen:
+    env = dict(os.environ, NODE_API_URL=f"http://127.0.0.1:{BACKEND_PORT}", TRACING_ENABLED="false")
+    proc = subprocess.Popen(
+        [sys.executable, "tool_server.py", "--port", str(TOOL_SERVER_PORT)],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{TOOL_SERVER_PORT}/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("El servidor de tools no arrancó")
+
+def report(name: str, backend: FakeBackend, rows):
+    calls = WORKERS * CALLS
+    cacheable = sum(row["cacheable_calls"] for row in rows)
+    # La única ruta de las tools cacheables es /menus
+    backend_menus = backend.requests.get("/menus", 0)
+    hit_rate = 1 - backend_menus / cacheable if cacheable else 0
+    elapsed = max(row["elapsed"] for row in rows)
+    print(f"{name:>8} {backend.connections:>10} {sum(backend.requests.values()):>10} "
+          f"{100 * hit_rate:>9.1f}% {calls / elapsed:>10.0f} {sum(row['errors'] for row in rows):>7}")
+
+def main():
+    backend = FakeBackend(BACKEND_PORT)
+    backend.start()
+
+    print(f"🧰 {WORKERS} workers × {CALLS} llamadas (concurrencia {CONCURRENCY} por worker)")
+    print(f"{'modo':>8} {'conexiones':>10} {'peticiones':>10} {'hit caché':>10} {'llamadas/s':>10} {'errores':>7}")
+
+    backend.reset()
+    report("local", backend, run_workers(""))
+
+    server = start_tool_server()
+    try:
+        backend.reset()
+        report("remoto", backend, run_workers(f"http://127.0.0.1:{TOOL_SERVER_PORT}/mcp"))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark del coste por mensaje: POST /chat frente a /ws/chat
+Levanta la aplicación real con uvicorn y el LLM simulado sin latencia, de forma que
+solo se mide el coste del transporte y la preparación de cada petición.
+
+Ejecutar desde la raíz del proyecto: python benchmarks/bench_ws.py
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", 500))
+PORT = int(os.getenv("BENCH_PORT", 8765))
+ORIGIN = "http://localhost:4200"
+
+def start_server():
+    """Arranca main.app en un hilo con el modelo simulado"""
+    os.environ["TRACING_ENABLED"] = "false"
+    os.environ["LOG_LEVEL"] = "WARNING"
+    import uvicorn
+    import main
+    from multi_agents import RestauranteMultiAgentSystem
+    from simulated_llm import simulated_runner
+
+    # El arranque (preload) usa este sistema en lugar de construir los modelos de Gemini
+    main.multi_agent_system = RestauranteMultiAgentSystem(speculative=False, mode="multi", runner=simulated_runner())
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+async def bench_http() -> list:
+    """POST /chat con conexión keep-alive, como haría el frontend"""
+    import httpx
+
+    latencies = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", headers={"Origin": ORIGIN}) as client:
+        for i in range(MESSAGES):
+            started = time.perf_counter()
+            response = await client.post("/chat", json={
+                "messages": [{"role": "user", "content": f"Hola {i}"}],
+                "session_id": "bench-http"
+            })
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+async def bench_ws() -> list:
+    """Mensajes por una única conexión /ws/chat (hasta el mensaje done)"""
+    from websockets.asyncio.client import connect
+
+    latencies = []
+    async with connect(f"ws://127.0.0.1:{PORT}/ws/chat?session_id=bench-ws") as ws:
+        await ws.recv()  # session
+        for i in range(MESSAGES):
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": "message", "content": f"Hola {i}", "id": str(i)}))
+            while json.loads(await ws.recv())["type"] not in ("done", "error"):
+                pass
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def report(name: str, latencies: list):
+    latencies = sorted(latencies[10:])  # Descarta el calentamiento
+    p95 = latencies[int(len(latencies) * 0.95)]
+    print(f"{name:<14} media {statistics.mean(latencies):>7.2f} ms  p50 {statistics.median(latencies):>7.2f} ms  p95 {p95:>7.2f} ms")
+    return statistics.mean(latencies)
+
+def main():
+    print("=" * 80)
+    print(f"📊 COSTE POR MENSAJE: POST /chat vs /ws/chat ({MESSAGES} mensajes, LLM simulado sin latencia)")
+    print("=" * 80)
+
+    server, thread = start_server()
+    try:
+        http_ms = report("POST /chat", asyncio.run(bench_http()))
+        ws_ms = report("/ws/chat", asyncio.run(bench_ws()))
+        print(f"\nAhorro por mensaje con WebSocket: {http_ms - ws_ms:.2f} ms ({100 * (1 - ws_ms / http_ms):.0f}%)")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Micro-benchmarks de las rutas calientes de Python puro (se ejecutan en cada turno)
+Mide cada caso en ns/operación y lo compara con la línea base guardada en
+microbench_baseline.json; falla (exit 1) si alguno empeora más que el umbral.
+
+Los tiempos se normalizan con un bucle de calibración para que la línea base sea
+comparable entre máquinas: se guarda "coste relativo" = ns del caso / ns de la calibración.
+La calibración se mide intercalada con cada repetición de cada caso y se toma la mediana de
+los cocientes, así una muestra ruidosa no desplaza todos los casos; el umbral de cada caso
+crece con el ruido medido (NOISE_FACTOR veces la desviación de sus cocientes).
+
+Ejecutar desde la raíz del proyecto:
+    python benchmarks/microbench.py                      # Comparar con la línea base
+    python benchmarks/microbench.py --update-baseline    # Guardar una línea base nueva
+    python benchmarks/microbench.py --threshold 0.5 --only routing
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+
+# Empeoramiento máximo admitido frente a la línea base (0.25 = +25 %)
+DEFAULT_THRESHOLD = float(os.getenv("MICROBENCH_THRESHOLD", 0.25))
+
+# Tiempo objetivo por repetición y repeticiones por caso (se toma la mediana)
+TARGET_SECONDS = 0.05
+REPEATS = int(os.getenv("MICROBENCH_REPEATS", 7))
+
+# Un cambio menor que NOISE_FACTOR veces el ruido medido del caso no cuenta como regresión
+NOISE_FACTOR = 3.0
+
+AGENT_RESPONSE = (
+    "¡Perfecto! Tu reserva para 4 personas el sábado a las 21:00 está confirmada. "
+    "Tu código es ABC123XYZ, guárdalo para consultarla o modificarla. "
+    "Te llevo a la página de tus reservas. [NAVEGAR:consultar_reserva]"
+)
+ORCHESTRATOR_RESPONSE = (
+    '```json\n{"agents": ["reservas_agent"], "reasoning": "El cliente quiere crear una reserva para el sábado"}\n```'
+)
+
+def _calibration():
+    """Bucle de referencia en Python puro (unidad de normalización)"""
+    total = 0
+    for i in range(1000):
+        total += i * 2
+    return total
+
+def build_cases() -> Dict[str, Tuple[Callable[[], Any], Any]]:
+    """Casos a medir: {nombre: (función sin argumentos, resultado esperado o None)}"""
+    os.environ.setdefault("TRACING_ENABLED", "false")
+    from agent_runner import AgentRunner, MultiAgentRunner
+    from mcp_tools import TOOLS_DEFINITIONS
+    from multi_agents import AgentFactory, RestauranteMultiAgentSystem
+    from tool_registry import get_tool_registry
+    from tool_shaping import shape_result
+
+    # Sin construir modelos: los métodos medidos no usan el SDK
+    system = RestauranteMultiAgentSystem(speculative=False, mode="multi", runner=MultiAgentRunner())
+    runner = AgentRunner.__new__(AgentRunner)
+
+    results = [
+        {"success": True, "response": "Tenemos el menú del día a 14,50 € y el degustación a 45 €."},
+        {"success": True, "response": "Abrimos de 9:00 a 23:00 todos los días. [NAVEGAR:home]"},
+    ]
+    context = {"session_id": "abc", "fecha_actual": "2025-11-20 19:30", "idioma": "es"}
+    reservas_tools = [t for t in TOOLS_DEFINITIONS if t["name"] in
+                      ("crear_reserva", "modificar_fecha_reserva", "cancelar_reserva", "consultar_reserva")]
+
+    registry = get_tool_registry()
+    menus_result = {
+        "success": True,
+        "menus": [
+            {"id": i, "nombre": f"Menú {i}", "descripcion": "Entrante, principal y postre de temporada. " * 6,
+             "precio": 20 + i, "valoracion_promedio": 4.2, "disponible": True,
+             "imagen_url": f"https://example.com/{i}.jpg", "created_at": "2025-01-01T00:00:00Z", "updated_at": None}
+            for i in range(8)
+        ],
+        "total": 8
+    }
+    reserva_result = {
+        "success": True,
+        "reserva": {"id": 7, "token": "ABC123XYZ", "nombre_cliente": "Laura Martín", "telefono_cliente": "+34612345678",
+                    "email_cliente": "laura@example.com", "fecha_reserva": "2030-01-10T20:00:00.000Z",
+                    "num_personas": 4, "estado": "confirmada", "notas": None, "created_at": "2025-01-01T00:00:00Z"}
+    }
+    menus_shaping = registry.get("listar_menus_disponibles").shaping
+    reserva_shaping = registry.get("consultar_reserva").shaping
+
+    return {
+        "navigation_extract": (lambda: system._extract_navigation_action(AGENT_RESPONSE), "consultar_reserva"),
+        "routing_parse": (lambda: system._parse_routing(ORCHESTRATOR_RESPONSE), (["reservas_agent"], "El cliente quiere crear una reserva para el sábado")),
+        "combine_responses": (lambda: system._combine_responses(results, ["menus_agent", "info_agent"]), None),
+        "add_context": (lambda: runner._add_context_to_message("¿Qué menús tenéis?", context), None),
+        "build_response": (lambda: system._build_response(AGENT_RESPONSE, ["reservas_agent"], "reserva", "abc", results)["navigation_action"], "consultar_reserva"),
+        "tool_declarations": (lambda: AgentFactory._function_declarations(reservas_tools), None),
+        "shape_menus": (lambda: shape_result(menus_result, menus_shaping), None),
+        "shape_reserva": (lambda: shape_result(reserva_result, reserva_shaping), None),
+    }
+
+def _loops_for(func: Callable[[], Any]) -> int:
+    """Llamadas por repetición para que cada una dure ~TARGET_SECONDS"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= TARGET_SECONDS / 5:
+            break
+        loops *= 4
+    return max(1, int(loops * TARGET_SECONDS / elapsed))
+
+def _time(func: Callable[[], Any], loops: int) -> float:
+    """ns por llamada en una repetición"""
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - started) / loops * 1e9
+
+def measure(func: Callable[[], Any]) -> Tuple[float, float, float]:
+    """
+    Mide un caso intercalado con la calibración (REPEATS repeticiones de cada uno)
+
+    Returns:
+        (ns por llamada, coste relativo, ruido): medianas de las repeticiones; el ruido es la
+        desviación absoluta mediana de los cocientes relativa a su mediana
+    """
+    loops, calibration_loops = _loops_for(func), _loops_for(_calibration)
+    times, ratios = [], []
+    for _ in range(REPEATS):
+        calibration_ns = _time(_calibration, calibration_loops)
+        ns = _time(func, loops)
+        times.append(ns)
+        ratios.append(ns / calibration_ns)
+    relative = statistics.median(ratios)
+    noise = statistics.median(abs(ratio - relative) for ratio in ratios) / relative
+    return statistics.median(times), relative, noise
+
+def load_baseline() -> Dict[str, Any]:
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de rutas calientes")
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar los resultados como línea base")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Empeoramiento admitido (0.25 = +25%%)")
+    parser.add_argument("--only", nargs="*", help="Medir solo estos casos")
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    if args.only:
+        cases = {name: case for name, case in cases.items() if name in args.only}
+
+    for name, (func, expected) in cases.items():
+        if expected is not None and func() != expected:
+            raise AssertionError(f"El caso {name} devuelve {func()!r} en lugar de {expected!r}")
+
+    baseline = load_baseline().get("cases", {})
+    measured = {}
+    regressions = []
+
+    print(f"⏱️ Umbral: +{args.threshold:.0%} o {NOISE_FACTOR:g} veces el ruido del caso si es mayor")
+    print(f"{'caso':<20} {'ns/op':>10} {'relativo':>10} {'base':>10} {'cambio':>8} {'umbral':>8}")
+    for name, (func, _) in cases.items():
+        ns, relative, noise = measure(func)
+        measured[name] = round(relative, 5)
+        threshold = max(args.threshold, NOISE_FACTOR * noise)
+        base = baseline.get(name)
+        change = relative / base - 1 if base else None
+        flag = ""
+        if change is not None and change > threshold:
+            regressions.append(name)
+            flag = " ❌"
+        change_text = f"{change:+.0%}" if change is not None else "—"
+        base_text = f"{base:.4f}" if base else "—"
+        print(f"{name:<20} {ns:>10,.0f} {relative:>10.4f} {base_text:>10} {change_text:>8} {threshold:>+8.0%}{flag}")
+
+    if args.update_baseline:
+        stored = load_baseline()
+        stored.setdefault("cases", {}).update(measured)
+        stored["unit"] = "ns del caso / ns del bucle de calibración"
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        print(f"💾 Línea base guardada en {os.path.relpath(BASELINE_FILE)}")
+        return 0
+
+    if regressions:
+        print(f"❌ Regresiones por encima del umbral: {', '.join(regressions)}")
+        return 1
+    print("✅ Sin regresiones")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
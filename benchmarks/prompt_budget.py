@@ -0,0 +1,93 @@
+"""
+Informe y presupuesto de tokens de los prompts de sistema
+Compila el prompt de cada agente en cada variante (full y compact), estima sus tokens y los de
+las declaraciones de tools que lo acompañan en cada turno, y los compara con el presupuesto por
+agente de prompt_budget.json. Sale con código 1 si algún agente lo supera (apto para CI).
+No necesita API key: los tokens se estiman igual que el shaping de resultados (4 caracteres/token).
+
+Para comparar la calidad de las variantes con el modelo real:
+    python benchmarks/bench_modes.py --modes multi --prompt-variants full compact
+
+Ejecutar desde la raíz del proyecto:
+    python benchmarks/prompt_budget.py
+    python benchmarks/prompt_budget.py --variants compact --show compact
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_budget.json")
+
+def load_budgets() -> Dict[str, int]:
+    with open(BUDGET_FILE, encoding="utf-8") as f:
+        return json.load(f)["budgets"]
+
+def build_report(variants: List[str]) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """{agente: {variante: estadísticas de prompt_stats}}"""
+    os.environ.setdefault("TRACING_ENABLED", "false")
+    from multi_agents import AGENT_PROMPTS, AgentFactory
+    from prompt_compiler import prompt_stats
+
+    context = AgentFactory._date_context()
+    report = {}
+    for agent_id, templates in AGENT_PROMPTS.items():
+        declarations = AgentFactory._function_declarations(AgentFactory._agent_tools(agent_id))
+        report[agent_id] = {
+            variant: prompt_stats(templates[variant], context, declarations) for variant in variants
+        }
+    return report
+
+def over_budget(report: Dict[str, Dict[str, Dict[str, int]]], budgets: Dict[str, int]) -> List[str]:
+    """Agentes y variantes que superan su presupuesto (o no lo tienen)"""
+    failures = []
+    for agent_id, variants in report.items():
+        budget = budgets.get(agent_id)
+        for variant, stats in variants.items():
+            if budget is None or stats["total_tokens"] > budget:
+                failures.append(f"{agent_id}/{variant}")
+    return failures
+
+def main(argv: List[str] = None) -> int:
+    from prompt_compiler import PROMPT_VARIANTS
+
+    parser = argparse.ArgumentParser(description="Tokens de los prompts de sistema por agente")
+    parser.add_argument("--variants", nargs="+", default=list(PROMPT_VARIANTS), choices=PROMPT_VARIANTS)
+    parser.add_argument("--show", choices=PROMPT_VARIANTS, help="Imprimir los prompts compilados de esta variante")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.variants)
+    budgets = load_budgets()
+
+    print(f"{'agente':<16} {'variante':<9} {'plantilla':>9} {'compilado':>9} {'tools':>6} {'total':>6} {'presup.':>8}")
+    for agent_id, variants in report.items():
+        for variant, stats in variants.items():
+            budget = budgets.get(agent_id)
+            flag = " ❌" if budget is None or stats["total_tokens"] > budget else ""
+            print(f"{agent_id:<16} {variant:<9} {stats['template_tokens']:>9} {stats['compiled_tokens']:>9} "
+                  f"{stats['tool_tokens']:>6} {stats['total_tokens']:>6} {budget or '—':>8}{flag}")
+
+    if len(args.variants) > 1:
+        base, other = args.variants[0], args.variants[1]
+        saved = sum(v[base]["total_tokens"] - v[other]["total_tokens"] for v in report.values())
+        total = sum(v[base]["total_tokens"] for v in report.values())
+        print(f"\n{other} frente a {base}: {saved} tokens menos sumando todos los agentes ({saved / total:.0%})")
+
+    if args.show:
+        from multi_agents import AgentFactory
+        for agent_id in report:
+            print(f"\n===== {agent_id} ({args.show}) =====")
+            print(AgentFactory.system_prompt(agent_id, args.show))
+
+    failures = over_budget(report, budgets)
+    if failures:
+        print(f"❌ Por encima del presupuesto de {os.path.relpath(BUDGET_FILE)}: {', '.join(failures)}")
+        return 1
+    print("✅ Todos los prompts dentro del presupuesto")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Modelo Gemini simulado para los benchmarks (sin red ni API key)
+Latencia fija + coste de CPU por llamada; el orquestador responde con un routing JSON
+y los especialistas con el número de mensajes de usuario que vieron en su historial.
+"""
+import asyncio
+import time
+import types
+
+class SimulatedChat:
+    """ChatSession simulada"""
+
+    def __init__(self, model: "SimulatedModel", history):
+        self.model = model
+        self.history = list(history or [])
+
+    async def send_message_async(self, message):
+        if self.model.latency_ms:
+            await asyncio.sleep(self.model.latency_ms / 1000)
+        deadline = time.perf_counter() + self.model.cpu_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+
+        if self.model.agent_id == "orchestrator":
+            text = '{"agents": ["info_agent"], "reasoning": "benchmark"}'
+        else:
+            user_turns = sum(1 for item in self.history if item["role"] == "user")
+            text = f"contexto={user_turns}"
+            self.history.append({"role": "user", "parts": [str(message)]})
+            self.history.append({"role": "model", "parts": [text]})
+        part = types.SimpleNamespace(text=text, function_call=None)
+        return types.SimpleNamespace(
+            text=text,
+            candidates=[types.SimpleNamespace(content=types.SimpleNamespace(parts=[part]))]
+        )
+
+class SimulatedModel:
+    """GenerativeModel simulado"""
+
+    def __init__(self, agent_id: str, latency_ms: float = 0.0, cpu_ms: float = 0.0):
+        self.agent_id = agent_id
+        self.latency_ms = latency_ms
+        self.cpu_ms = cpu_ms
+
+    def start_chat(self, history=None, **kwargs):
+        return SimulatedChat(self, history)
+
+def simulated_runner(latency_ms: float = 0.0, cpu_ms: float = 0.0):
+    """
+    Runner con los agentes del modo multi sobre el modelo simulado
+    Se pasa al sistema como en los tests: RestauranteMultiAgentSystem(..., runner=simulated_runner())
+    """
+    from agent_runner import AgentRunner, AgentType, MultiAgentRunner
+    from multi_agents import AgentFactory
+
+    runner = MultiAgentRunner()
+    for agent_id, agent_type in (
+        ("reservas_agent", AgentType.RESERVAS),
+        ("menus_agent", AgentType.MENUS),
+        ("info_agent", AgentType.INFO),
+        ("orchestrator", AgentType.ORCHESTRATOR),
+    ):
+        model = SimulatedModel(agent_id, latency_ms, cpu_ms)
+        runner.register_agent(AgentRunner(agent_id, agent_type, model, AgentFactory._agent_tools(agent_id)))
+    return runner
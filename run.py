@@ -2,9 +2,11 @@
 """
 Script de arranque del Sistema Multi-Agente
 Ejecutar desde la raíz del proyecto: python run.py
+Modo producción (pre-fork + drenado): python run.py --prod --workers 4
 """
 import sys
 import os
+import argparse
 
 # Obtener directorio raíz del proyecto
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,13 +23,29 @@ if __name__ == "__main__":
     # Cargar .env desde la raíz del proyecto
     load_dotenv(os.path.join(ROOT_DIR, '.env'))
     
-    port = int(os.getenv("PORT", 8000))
-    host = os.getenv("HOST", "0.0.0.0")
+    from config import get_settings
+    settings = get_settings()
+    
+    parser = argparse.ArgumentParser(description="Arranque del Sistema Multi-Agente")
+    parser.add_argument("--prod", action="store_true",
+                        help="Modo producción: workers pre-fork, sin reload")
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="Número de workers en modo producción")
+    args = parser.parse_args()
+    
+    port = settings.port
+    host = settings.host
     
     print("=" * 60)
     print("🚀 SISTEMA MULTI-AGENTE IA - RESTAURANTE")
     print("=" * 60)
     print(f"🤖 Iniciando en {host}:{port}")
+    if args.prod:
+        print(f"🏭 Modo producción con {args.workers} worker(s)")
     print("=" * 60)
     
-    uvicorn.run("main:app", host=host, port=port, reload=True)
+    if args.prod:
+        from server import serve
+        serve(host=host, port=port, workers=args.workers)
+    else:
+        uvicorn.run("main:app", host=host, port=port, reload=True)
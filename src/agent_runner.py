@@ -3,16 +3,45 @@ Agent Runner - Sistema base para ejecutar agentes IA
 Proporciona la infraestructura para manejar múltiples agentes especializados
 """
 import asyncio
+import json
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
-import google.generativeai as genai
+from config import get_settings
+from metrics import metrics
+from tracing import tracer
+from log_pipeline import log_context
+from progress import emit_progress
+from session_state import session_store
+from tool_shaping import estimate_tokens, serialize_result
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    # Solo para anotaciones: el SDK de Gemini se importa bajo demanda
+    import google.generativeai as genai
+
+# El logging lo configura el punto de entrada (config.configure_logging)
 logger = logging.getLogger(__name__)
 
+# Profundidad del bucle de tools (llamadas por turno)
+LOOP_DEPTH_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13)
+
+# Resultado enviado al modelo en lugar de ejecutar la tool cuando se agota el presupuesto del turno
+TOOL_LIMIT_RESULT = {
+    "error": "Límite de herramientas del turno alcanzado: no se ha ejecutado. "
+             "Responde al usuario con la información que ya tienes o pídele que concrete."
+}
+
+# Resultado enviado al modelo cuando repite una lectura cuyo resultado ya tiene en el chat
+SAME_RESULT = {
+    "same_as_before": True,
+    "mensaje": "Mismo resultado que la llamada anterior con estos argumentos (ya lo tienes arriba)."
+}
+
+# Respuesta si aun así el modelo no devuelve texto
+TOOL_LIMIT_REPLY = "Lo siento, no he podido completar la consulta. ¿Puedes concretar un poco más qué necesitas?"
+
 class AgentStatus(Enum):
     """Estados posibles de un agente"""
     IDLE = "idle"
@@ -27,6 +56,36 @@ class AgentType(Enum):
     MENUS = "menus"
     INFO = "info"
     ORCHESTRATOR = "orchestrator"
+    FUSED = "fused"
+
+class SpeculationAborted(Exception):
+    """El turno especulativo pidió una tool con efectos y se descartó"""
+
+class TurnStats:
+    """Llamadas al LLM, tokens y tools de un turno de agente"""
+    
+    __slots__ = ("llm_calls", "prompt_tokens", "output_tokens", "tools_used")
+    
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.tools_used: List[str] = []
+    
+    def record_response(self, response):
+        """Acumula el uso de tokens de una respuesta del modelo (si lo informa)"""
+        self.llm_calls += 1
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            self.output_tokens += getattr(usage, "candidates_token_count", 0) or 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens
+        }
 
 class AgentRunner:
     """
@@ -38,7 +97,7 @@ class AgentRunner:
         self,
         agent_id: str,
         agent_type: AgentType,
-        model: genai.GenerativeModel,
+        model: "genai.GenerativeModel",
         tools: Optional[List[Dict]] = None
     ):
         self.agent_id = agent_id
@@ -46,17 +105,19 @@ class AgentRunner:
         self.model = model
         self.tools = tools or []
         self.status = AgentStatus.IDLE
-        self.chat_history = []
+        # El historial vive en session_store (una copia por sesión, ver session_state.py)
         self.execution_count = 0
-        self.created_at = datetime.now()
-        self.last_execution = None
+        self.created_at = time.time()
+        self.last_execution: Optional[float] = None
         
         logger.info(f"✨ Agent {agent_id} ({agent_type.value}) inicializado")
     
     async def execute(
         self,
         user_message: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        session_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Ejecuta el agente con un mensaje de usuario
@@ -64,61 +125,56 @@ class AgentRunner:
         Args:
             user_message: Mensaje del usuario
             context: Contexto adicional para el agente
+            history: Historial aportado por el cliente (modo sin estado); si se indica,
+                el turno se ejecuta en un chat nuevo y no se guarda en la sesión
+            session_id: Sesión cuyo historial se usa y se amplía con el turno
             
         Returns:
             Respuesta del agente con metadata
         """
+        with tracer.span("agent.execute", agent=self.agent_id), log_context(agent=self.agent_id):
+            return await self._execute(user_message, context, history, session_id)
+    
+    async def _execute(
+        self,
+        user_message: str,
+        context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Cuerpo de execute (dentro del span del agente)"""
         self.status = AgentStatus.RUNNING
         self.execution_count += 1
-        self.last_execution = datetime.now()
+        self.last_execution = time.time()
+        started = time.perf_counter()
         
         try:
-            logger.info(f"🏃 Agent {self.agent_id} ejecutando mensaje #{self.execution_count}")
-            
-            # Crear o continuar chat
-            if not hasattr(self, 'chat'):
-                self.chat = self.model.start_chat(
-                    history=self.chat_history,
-                    enable_automatic_function_calling=True
-                )
+            logger.debug("🏃 Ejecutando mensaje #%d", self.execution_count, extra={"category": "agent"})
             
             # Agregar contexto si existe
             if context:
                 user_message = self._add_context_to_message(user_message, context)
             
-            # Enviar mensaje
-            response = self.chat.send_message(user_message)
-            
-            # Manejar llamadas a funciones
-            response = await self._handle_function_calls(response)
+            # Enviar mensaje (crea o continúa el chat) y resolver llamadas a funciones
+            stats = TurnStats()
+            stateless = history is not None
+            chat = self._start_chat(history if stateless else session_store.history(session_id, self.agent_id))
+            response_text = await self._run_turn(chat, user_message, stats, session_id=session_id)
             
-            # Guardar en historial
-            self.chat_history.append({
-                "role": "user",
-                "parts": [user_message]
-            })
-            self.chat_history.append({
-                "role": "model",
-                "parts": [response.text]
-            })
+            result = self._complete_turn(user_message, response_text, stats, None if stateless else session_id, record=not stateless)
             
-            self.status = AgentStatus.COMPLETED
-            
-            result = {
-                "success": True,
-                "agent_id": self.agent_id,
-                "agent_type": self.agent_type.value,
-                "response": response.text,
-                "execution_count": self.execution_count,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            logger.info(f"✅ Agent {self.agent_id} completó ejecución #{self.execution_count}")
+            logger.info(
+                "✅ Ejecución #%d completada", self.execution_count,
+                extra={"category": "agent", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+            )
             return result
             
         except Exception as e:
             self.status = AgentStatus.ERROR
-            logger.error(f"❌ Error en agent {self.agent_id}: {str(e)}")
+            logger.error(
+                "❌ Error en agent %s: %s", self.agent_id, e,
+                extra={"category": "agent", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+            )
             
             return {
                 "success": False,
@@ -129,50 +185,236 @@ class AgentRunner:
                 "timestamp": datetime.now().isoformat()
             }
     
-    async def _handle_function_calls(self, response) -> Any:
-        """Maneja llamadas a funciones del agente"""
-        # Importar tools aquí para evitar circular import
-        from mcp_tools import restaurante_tools
+    async def execute_speculative(self, user_message: str, session_id: Optional[str] = None) -> "SpeculativeTurn":
+        """
+        Ejecuta un turno especulativo en un chat aparte
+        
+        El historial de la sesión no se modifica hasta llamar a SpeculativeTurn.commit(),
+        y solo se permiten tools de lectura: si el modelo pide una tool con efectos
+        se lanza SpeculationAborted y el turno se repite por el camino normal.
+        
+        Args:
+            user_message: Mensaje del usuario
+            session_id: Sesión cuyo historial se usa
+            
+        Returns:
+            Turno especulativo pendiente de confirmar
+        """
+        with tracer.span("agent.speculative", agent=self.agent_id), log_context(agent=self.agent_id):
+            chat = self._start_chat(session_store.history(session_id, self.agent_id))
+            stats = TurnStats()
+            response_text = await self._run_turn(chat, user_message, stats, read_only=True, session_id=session_id)
+            return SpeculativeTurn(self, session_id, user_message, response_text, stats)
+    
+    def _start_chat(self, history: List[Any]):
+        """
+        Crea la ChatSession de un turno con el historial indicado
+        Se descarta al terminar el turno: la única copia del historial es la de session_store
+        """
+        return self.model.start_chat(
+            history=history,
+            enable_automatic_function_calling=True
+        )
+    
+    async def _run_turn(
+        self,
+        chat,
+        user_message: str,
+        stats: TurnStats,
+        read_only: bool = False,
+        session_id: Optional[str] = None
+    ) -> str:
+        """Envía el mensaje al modelo, resuelve las llamadas a funciones y devuelve el texto final"""
+        with tracer.span("llm.send_message", agent=self.agent_id, iteration=0):
+            response = await chat.send_message_async(user_message)
+        stats.record_response(response)
+        
+        response = await self._handle_function_calls(response, chat, read_only, stats, session_id)
+        if response.candidates[0].content.parts[0].function_call:
+            # El modelo siguió pidiendo tools tras agotar el presupuesto
+            return TOOL_LIMIT_REPLY
+        return response.text
+    
+    def _complete_turn(
+        self,
+        user_message: str,
+        response_text: str,
+        stats: TurnStats,
+        session_id: Optional[str] = None,
+        record: bool = True
+    ) -> Dict[str, Any]:
+        """Guarda el turno en la sesión (salvo en modo sin estado) y construye el resultado"""
+        if record:
+            session_store.record(session_id, self.agent_id, user_message, response_text)
+        
+        self.status = AgentStatus.COMPLETED
         
+        return {
+            "success": True,
+            "agent_id": self.agent_id,
+            "agent_type": self.agent_type.value,
+            "response": response_text,
+            "tools_used": stats.tools_used,
+            "usage": stats.to_dict(),
+            "execution_count": self.execution_count,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    async def _handle_function_calls(
+        self,
+        response,
+        chat,
+        read_only: bool = False,
+        stats: Optional[TurnStats] = None,
+        session_id: Optional[str] = None
+    ) -> Any:
+        """
+        Maneja llamadas a funciones del agente dentro del presupuesto del turno
+        (iteraciones, tiempo total en tools y bytes de resultados enviados al modelo).
+        Al agotarlo, la llamada pendiente no se ejecuta y se pide la respuesta final sin tools.
+        """
+        if not response.candidates[0].content.parts[0].function_call:
+            metrics.observe("tool_loop_depth", 0, buckets=LOOP_DEPTH_BUCKETS, agent=self.agent_id)
+            return response
+        
+        # Tabla de despacho compilada una sola vez (validación, timeout, caché y shaping por tool),
+        # en este proceso o en el servidor de tools compartido (TOOL_SERVER_URL)
+        from tool_registry import get_tool_registry
+        from tool_server import get_tool_dispatcher
+
+        registry = get_tool_registry()
+        dispatcher = get_tool_dispatcher()
+        settings = get_settings()
+        stats = stats or TurnStats()
+        iteration = 0
+        tool_seconds = 0.0
+        result_bytes = 0
+        # Lecturas cuyo resultado ya está en este chat: {clave: tokens estimados del resultado}
+        sent: Dict[Any, int] = {}
         while response.candidates[0].content.parts[0].function_call:
             function_call = response.candidates[0].content.parts[0].function_call
             function_name = function_call.name
+            
+            if iteration >= settings.tool_loop_max_iterations:
+                limit = "iterations"
+            elif tool_seconds >= settings.tool_loop_max_seconds:
+                limit = "time"
+            elif result_bytes >= settings.tool_loop_max_result_bytes:
+                limit = "bytes"
+            else:
+                limit = None
+            if limit:
+                response = await self._finish_tool_loop(chat, function_name, limit, stats)
+                break
+            
+            iteration += 1
             function_args = dict(function_call.args)
             
-            logger.info(f"🔧 Agent {self.agent_id} llamando función: {function_name}")
+            if read_only and function_name not in registry.read_only:
+                raise SpeculationAborted(f"La tool {function_name} tiene efectos y no puede ejecutarse especulativamente")
             
-            # Ejecutar la función
-            if hasattr(restaurante_tools, function_name):
-                func = getattr(restaurante_tools, function_name)
-                function_response = await func(**function_args)
-            else:
-                function_response = {"error": f"Función {function_name} no encontrada"}
+            logger.info("🔧 Llamando función %s", function_name, extra={"category": "tool", "tool": function_name})
+            stats.tools_used.append(function_name)
+            emit_progress("tool", agent=self.agent_id, tool=function_name)
             
-            # Enviar resultado al modelo
-            response = self.chat.send_message(
-                genai.protos.Content(
-                    parts=[genai.protos.Part(
-                        function_response=genai.protos.FunctionResponse(
-                            name=function_name,
-                            response={"result": function_response}
-                        )
-                    )]
-                )
+            # Validar, ejecutar (o servir de caché) y reducir el resultado antes de que entre en el contexto
+            tool_started = time.perf_counter()
+            function_response, memo_key = await self._call_tool(
+                dispatcher, registry, function_name, function_args, session_id, sent
             )
+            tool_seconds += time.perf_counter() - tool_started
+            encoded = serialize_result(function_response)
+            result_bytes += len(encoded.encode())
+            if memo_key is not None:
+                sent[memo_key] = estimate_tokens(encoded)
+
+            # Enviar resultado al modelo
+            with tracer.span("llm.send_message", agent=self.agent_id, iteration=iteration, tool=function_name):
+                response = await chat.send_message_async(self._function_response(function_name, function_response))
+            stats.record_response(response)
+        
+        metrics.observe("tool_loop_depth", iteration, buckets=LOOP_DEPTH_BUCKETS, agent=self.agent_id)
+        return response
+    
+    async def _call_tool(
+        self,
+        dispatcher,
+        registry,
+        name: str,
+        args: Dict[str, Any],
+        session_id: Optional[str],
+        sent: Dict[Any, int]
+    ) -> Tuple[Any, Optional[Tuple[str, str]]]:
+        """
+        Ejecuta una tool con la memoización de la sesión:
+        - lectura ya respondida en este chat: "mismo resultado que antes" (el modelo ya lo tiene)
+        - lectura memorizada en la sesión (turnos anteriores): se reutiliza sin volver al backend
+        - escritura: invalida lo memorizado en la sesión y en el chat
+        
+        Returns:
+            (resultado para el modelo, clave de la lectura si el resultado completo entra en el chat)
+        """
+        if name not in registry.read_only:
+            sent.clear()
+            session_store.invalidate_tool_results(session_id)
+            return await dispatcher.dispatch(name, args), None
+        
+        key = (name, json.dumps(args, sort_keys=True, default=str))
+        if key in sent:
+            metrics.inc("tool_memo", tool=name, outcome="same_as_before")
+            metrics.inc("tool_memo_tokens_saved", sent[key], tool=name)
+            return SAME_RESULT, None
         
+        # La sesión compartida (sin session_id) no memoriza: mezclaría datos de clientes distintos
+        memoize = session_id is not None
+        result = session_store.tool_result(session_id, key) if memoize else None
+        if result is not None:
+            metrics.inc("tool_memo", tool=name, outcome="session_hit")
+            return result, key
+        
+        result = await dispatcher.dispatch(name, args)
+        if memoize and isinstance(result, dict) and "error" not in result and result.get("success") is not False:
+            session_store.remember_tool_result(session_id, key, result, get_settings().session_tool_memo_ttl)
+        return result, key
+    
+    async def _finish_tool_loop(self, chat, function_name: str, limit: str, stats: TurnStats) -> Any:
+        """Responde a la llamada pendiente sin ejecutarla y pide al modelo la respuesta final sin tools"""
+        metrics.inc("tool_loop_limit", agent=self.agent_id, limit=limit)
+        logger.warning(
+            "🛑 Presupuesto de tools agotado (%s): %s no se ejecuta", limit, function_name,
+            extra={"category": "tool", "tool": function_name}
+        )
+        with tracer.span("llm.send_message", agent=self.agent_id, iteration="final", limit=limit):
+            response = await chat.send_message_async(
+                self._function_response(function_name, TOOL_LIMIT_RESULT),
+                tool_config={"function_calling_config": {"mode": "NONE"}}
+            )
+        stats.record_response(response)
         return response
     
+    @staticmethod
+    def _function_response(function_name: str, result: Any):
+        """Mensaje con el resultado de una tool para el modelo"""
+        import google.generativeai as genai
+
+        return genai.protos.Content(
+            parts=[genai.protos.Part(
+                function_response=genai.protos.FunctionResponse(
+                    name=function_name,
+                    response={"result": result}
+                )
+            )]
+        )
+    
     def _add_context_to_message(self, message: str, context: Dict[str, Any]) -> str:
         """Agrega contexto al mensaje del usuario"""
         context_str = "\n".join([f"{k}: {v}" for k, v in context.items()])
         return f"[Contexto: {context_str}]\n\n{message}"
     
     def reset(self):
-        """Reinicia el estado del agente"""
-        self.chat_history = []
+        """Reinicia el estado del agente (su historial en todas las sesiones)"""
+        session_store.clear_agent(self.agent_id)
         self.status = AgentStatus.IDLE
-        if hasattr(self, 'chat'):
-            delattr(self, 'chat')
         logger.info(f"🔄 Agent {self.agent_id} reiniciado")
     
     def get_status(self) -> Dict[str, Any]:
@@ -182,11 +424,31 @@ class AgentRunner:
             "agent_type": self.agent_type.value,
             "status": self.status.value,
             "execution_count": self.execution_count,
-            "created_at": self.created_at.isoformat(),
-            "last_execution": self.last_execution.isoformat() if self.last_execution else None,
-            "history_length": len(self.chat_history)
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "last_execution": datetime.fromtimestamp(self.last_execution).isoformat() if self.last_execution else None,
+            "history_length": session_store.history_length(self.agent_id)
         }
 
+class SpeculativeTurn:
+    """
+    Resultado de un turno especulativo, ejecutado en un chat aparte
+    Si el routing confirma el agente se llama a commit(); si no, basta con descartarlo
+    """
+    
+    def __init__(self, agent: AgentRunner, session_id: Optional[str], user_message: str, response_text: str, stats: TurnStats):
+        self.agent = agent
+        self.session_id = session_id
+        self.user_message = user_message
+        self.response_text = response_text
+        self.stats = stats
+    
+    def commit(self) -> Dict[str, Any]:
+        """Guarda el turno especulativo en la sesión y devuelve su resultado"""
+        agent = self.agent
+        agent.execution_count += 1
+        agent.last_execution = time.time()
+        return agent._complete_turn(self.user_message, self.response_text, self.stats, self.session_id)
+
 class MultiAgentRunner:
     """
     Gestor de múltiples agentes
@@ -218,7 +480,9 @@ class MultiAgentRunner:
         self,
         agent_id: str,
         message: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        session_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Ejecuta un agente específico"""
         agent = self.get_agent(agent_id)
@@ -228,7 +492,7 @@ class MultiAgentRunner:
                 "error": f"Agente {agent_id} no encontrado"
             }
         
-        return await agent.execute(message, context)
+        return await agent.execute(message, context, history, session_id)
     
     async def execute_parallel(
         self,
@@ -238,7 +502,7 @@ class MultiAgentRunner:
         Ejecuta múltiples agentes en paralelo
         
         Args:
-            tasks: Lista de diccionarios con {agent_id, message, context}
+            tasks: Lista de diccionarios con {agent_id, message, context, history, session_id}
         """
         logger.info(f"⚡ Ejecutando {len(tasks)} agentes en paralelo")
         
@@ -246,7 +510,9 @@ class MultiAgentRunner:
             self.execute_agent(
                 task['agent_id'],
                 task['message'],
-                task.get('context')
+                task.get('context'),
+                task.get('history'),
+                task.get('session_id')
             )
             for task in tasks
         ]
@@ -0,0 +1,229 @@
+"""
+Modo asíncrono de chat (/chat/jobs)
+Los turnos largos (varios agentes, varias tools) no mantienen abierta la conexión HTTP:
+POST encola el turno y devuelve un job_id, un pool de workers consume la cola y el cliente
+consulta el resultado con long polling. La cola está acotada, los jobs caducan tras un TTL
+y se pueden cancelar tanto en cola como en ejecución.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Estados de un job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+class JobQueueFull(Exception):
+    """La cola de jobs ha alcanzado su tamaño máximo"""
+
+class ChatJob:
+    """Un turno de chat encolado"""
+
+    __slots__ = (
+        "id", "payload", "context", "session_id", "status", "result", "error",
+        "created_at", "started_at", "finished_at", "task", "done_event"
+    )
+
+    def __init__(self, payload: Any, session_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        # Contexto de la petición que encoló el job (cliente, depuración...), para el handler
+        self.context = context or {}
+        self.session_id = session_id
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.done_event = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado público del job (tiempos en ms)"""
+        now = time.monotonic()
+        queue_end = self.started_at or self.finished_at or now
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "session_id": self.session_id,
+            "queue_wait_ms": round((queue_end - self.created_at) * 1000, 1),
+        }
+        if self.started_at is not None:
+            data["processing_ms"] = round(((self.finished_at or now) - self.started_at) * 1000, 1)
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+class ChatJobQueue:
+    """Cola acotada de turnos de chat con un pool de workers"""
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        max_queued: int = 100,
+        ttl: float = 300.0
+    ):
+        """
+        Args:
+            handler: Corrutina que procesa el payload del job (con su contexto como argumentos
+                con nombre) y devuelve el resultado
+            workers: Turnos procesados en paralelo
+            max_queued: Jobs en cola como máximo (los que están en ejecución no cuentan)
+            ttl: Segundos que se conserva un job terminado
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.jobs: "OrderedDict[str, ChatJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        # Jobs en cola sin cancelar: los cancelados siguen en `_queue` hasta que un worker
+        # los descarta y no deben ocupar hueco
+        self._pending = 0
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def start(self):
+        """Arranca el pool de workers (en el loop del servidor)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Para los workers y cancela los jobs pendientes"""
+        self._stopping = True
+        for job in self.jobs.values():
+            if not job.finished:
+                self._finish(job, CANCELLED, error="Servicio reiniciándose")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def queued(self) -> int:
+        return self._pending
+
+    def submit(self, payload: Any, session_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None) -> ChatJob:
+        """
+        Encola un turno; lanza JobQueueFull si la cola está llena
+
+        Args:
+            context: Datos de la petición que el handler recibe como argumentos con nombre
+                (el job se ejecuta fuera de la petición, sin sus cabeceras ni contextvars)
+        """
+        if self._queue is None:
+            raise RuntimeError("La cola de jobs no está arrancada")
+        self._purge()
+        if self.queued >= self.max_queued:
+            metrics.inc("chat_jobs_rejected")
+            raise JobQueueFull()
+
+        job = ChatJob(payload, session_id, context)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._pending += 1
+        metrics.inc("chat_jobs", status=QUEUED)
+        return job
+
+    def get(self, job_id: str) -> Optional[ChatJob]:
+        self._purge()
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[ChatJob]:
+        """Long polling: espera hasta `timeout` segundos a que el job termine"""
+        job = self.get(job_id)
+        if job is not None and not job.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def cancel(self, job_id: str) -> Optional[ChatJob]:
+        """Cancela un job en cola o en ejecución (sin efecto si ya terminó)"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None:
+            job.task.cancel()
+        self._finish(job, CANCELLED)
+        return job
+
+    def _finish(self, job: ChatJob, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        if job.status == QUEUED:
+            self._pending -= 1
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.monotonic()
+        job.payload = None
+        job.context = {}
+        job.done_event.set()
+        metrics.inc("chat_jobs", status=status)
+        if job.started_at is not None:
+            metrics.observe("chat_job_processing_ms", (job.finished_at - job.started_at) * 1000)
+
+    def _purge(self):
+        """Elimina los jobs terminados hace más de TTL (el diccionario está en orden de creación)"""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and now - job.finished_at > self.ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            metrics.inc("chat_jobs_expired", len(expired))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.finished:
+                continue  # Cancelado mientras esperaba en la cola
+
+            self._pending -= 1
+            job.status = RUNNING
+            job.started_at = time.monotonic()
+            metrics.observe("chat_job_queue_wait_ms", (job.started_at - job.created_at) * 1000)
+
+            job.task = asyncio.create_task(self.handler(job.payload, **job.context))
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if self._stopping:
+                    raise
+                continue  # Cancelación del job: ya marcado como cancelado
+            except Exception as e:
+                logger.warning("⚠️ Job %s fallido: %s", job.id, e)
+                self._finish(job, FAILED, error=str(e))
+            else:
+                self._finish(job, DONE, result=result)
+            finally:
+                job.task = None
+
+    def status(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": len(self._tasks), "queued": self.queued, "max_queued": self.max_queued, "jobs": counts}
@@ -0,0 +1,148 @@
+"""
+Configuración centralizada del servicio
+Carga el .env una sola vez y resuelve todas las variables de entorno en un único sitio.
+Los SDK pesados (Gemini) se configuran bajo demanda, no al importar módulos.
+"""
+import os
+import atexit
+from functools import lru_cache
+from typing import List, Optional
+
+# Raíz del proyecto (directorio padre de src/)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Lee una variable de entorno booleana (true/1/yes)"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+class Settings:
+    """Valores de configuración resueltos desde el entorno"""
+
+    def __init__(self):
+        self.gemini_api_key: Optional[str] = os.getenv("GEMINI_API_KEY")
+        self.node_api_url: str = os.getenv("NODE_API_URL", "http://localhost:3000/api")
+        self.cors_origins: List[str] = os.getenv("CORS_ORIGINS", "http://localhost:4200").split(",")
+        self.host: str = os.getenv("HOST", "0.0.0.0")
+        self.port: int = int(os.getenv("PORT", 8000))
+        self.workers: int = int(os.getenv("WORKERS", 1))
+        self.graceful_timeout: float = float(os.getenv("GRACEFUL_TIMEOUT", 30))
+        self.worker_warmup_stagger: float = float(os.getenv("WORKER_WARMUP_STAGGER", 0.5))
+        # Relanzado de workers caídos: espera inicial (se duplica en cada caída seguida) y caídas
+        # seguidas al arrancar antes de que el lanzador se rinda y salga
+        self.worker_restart_backoff: float = float(os.getenv("WORKER_RESTART_BACKOFF", 1.0))
+        self.worker_max_restarts: int = int(os.getenv("WORKER_MAX_RESTARTS", 5))
+        self.log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.log_format: str = os.getenv("LOG_FORMAT", "text").lower()
+        self.log_sampling: str = os.getenv("LOG_SAMPLING", "")
+        self.tracing_enabled: bool = _env_flag("TRACING_ENABLED", False)
+        self.trace_file: str = os.getenv("TRACE_FILE", os.path.join(ROOT_DIR, "traces", "traces.jsonl"))
+        self.trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+        self.trace_max_bytes: int = int(os.getenv("TRACE_MAX_BYTES", 50 * 1024 * 1024))
+        self.trace_backups: int = int(os.getenv("TRACE_BACKUPS", 3))
+        self.execution_mode: str = os.getenv("EXECUTION_MODE", "multi").lower()
+        self.prompt_variant: str = os.getenv("PROMPT_VARIANT", "full").lower()
+        self.stateless_chat: bool = _env_flag("STATELESS_CHAT", False)
+        self.history_window: int = int(os.getenv("HISTORY_WINDOW", 10))
+        self.history_max_chars: int = int(os.getenv("HISTORY_MAX_CHARS", 8000))
+        self.ws_heartbeat_interval: float = float(os.getenv("WS_HEARTBEAT_INTERVAL", 20))
+        self.ws_idle_timeout: float = float(os.getenv("WS_IDLE_TIMEOUT", 300))
+        self.ws_max_pending: int = int(os.getenv("WS_MAX_PENDING", 4))
+        self.load_shedding_enabled: bool = _env_flag("LOAD_SHEDDING_ENABLED", False)
+        self.overload_max_in_flight: int = int(os.getenv("OVERLOAD_MAX_IN_FLIGHT", 50))
+        self.overload_p95_ms: float = float(os.getenv("OVERLOAD_P95_MS", 15000))
+        self.overload_error_rate: float = float(os.getenv("OVERLOAD_ERROR_RATE", 0.5))
+        self.overload_window: float = float(os.getenv("OVERLOAD_WINDOW", 60))
+        self.overload_min_samples: int = int(os.getenv("OVERLOAD_MIN_SAMPLES", 20))
+        self.overload_cooldown: float = float(os.getenv("OVERLOAD_COOLDOWN", 30))
+        self.navigation_fast_path: bool = _env_flag("NAVIGATION_FAST_PATH", False)
+        self.navigation_min_confidence: float = float(os.getenv("NAVIGATION_MIN_CONFIDENCE", 0.8))
+        self.menu_cache_ttl: float = float(os.getenv("MENU_CACHE_TTL", 300))
+        self.warmup_inference: bool = _env_flag("WARMUP_INFERENCE", False)
+        self.warmup_timeout: float = float(os.getenv("WARMUP_TIMEOUT", 30))
+        self.menu_refresh_interval: float = float(os.getenv("MENU_REFRESH_INTERVAL", 120))
+        self.chat_job_workers: int = int(os.getenv("CHAT_JOB_WORKERS", 4))
+        self.chat_job_queue_size: int = int(os.getenv("CHAT_JOB_QUEUE_SIZE", 100))
+        self.chat_job_ttl: float = float(os.getenv("CHAT_JOB_TTL", 300))
+        self.chat_job_max_wait: float = float(os.getenv("CHAT_JOB_MAX_WAIT", 30))
+        self.max_sessions: int = int(os.getenv("MAX_SESSIONS", 50000))
+        self.tool_server_url: str = os.getenv("TOOL_SERVER_URL", "")
+        self.tool_server_port: int = int(os.getenv("TOOL_SERVER_PORT", 8100))
+        self.tool_server_timeout: float = float(os.getenv("TOOL_SERVER_TIMEOUT", 30))
+        self.idempotency_window: float = float(os.getenv("IDEMPOTENCY_WINDOW", 600))
+        self.backend_idempotency_keys: bool = _env_flag("BACKEND_IDEMPOTENCY_KEYS", False)
+        self.llm_max_concurrent_turns: int = int(os.getenv("LLM_MAX_CONCURRENT_TURNS", 32))
+        self.session_max_queued_turns: int = int(os.getenv("SESSION_MAX_QUEUED_TURNS", 4))
+        self.session_tool_memo_ttl: float = float(os.getenv("SESSION_TOOL_MEMO_TTL", 120))
+        self.tool_loop_max_iterations: int = int(os.getenv("TOOL_LOOP_MAX_ITERATIONS", 5))
+        self.tool_loop_max_seconds: float = float(os.getenv("TOOL_LOOP_MAX_SECONDS", 20))
+        self.tool_loop_max_result_bytes: int = int(os.getenv("TOOL_LOOP_MAX_RESULT_BYTES", 24000))
+        self.routing_max_output_tokens: int = int(os.getenv("ROUTING_MAX_OUTPUT_TOKENS", 128))
+        self.speculative_routing: bool = _env_flag("SPECULATIVE_ROUTING", False)
+        self.profiling_enabled: bool = _env_flag("PROFILING_ENABLED", False)
+        self.profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))
+        self.profile_dir: str = os.getenv("PROFILE_DIR", os.path.join(ROOT_DIR, "profiles"))
+        self.profile_max_files: int = int(os.getenv("PROFILE_MAX_FILES", 50))
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Carga el .env (una sola vez) y devuelve la configuración"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return Settings()
+
+# Proceso en el que se configuró el logging y su listener (el hilo no sobrevive a un fork)
+_logging_pid: Optional[int] = None
+_logging_listener = None
+
+def configure_logging(threaded: bool = True):
+    """
+    Configura el logging raíz una sola vez por proceso (solo desde puntos de entrada)
+    Usa el pipeline con cola de log_pipeline para no escribir desde el event loop
+
+    Args:
+        threaded: False en el padre del lanzador multi-worker, que escribe directamente;
+            cada worker vuelve a llamar a configure_logging() tras el fork y arranca su listener
+    """
+    global _logging_pid, _logging_listener
+    if _logging_pid == os.getpid():
+        return _logging_listener
+
+    from log_pipeline import setup_logging, parse_sampling
+
+    settings = get_settings()
+    _logging_listener = setup_logging(
+        level=settings.log_level,
+        json_output=settings.log_format == "json",
+        sampling=parse_sampling(settings.log_sampling),
+        threaded=threaded
+    )
+    _logging_pid = os.getpid()
+    if _logging_listener is not None:
+        atexit.register(_logging_listener.stop)
+    return _logging_listener
+
+def stop_logging():
+    """Vacía la cola y para el listener de este proceso (los workers salen con os._exit, sin atexit)"""
+    if _logging_pid == os.getpid() and _logging_listener is not None:
+        _logging_listener.stop()
+
+@lru_cache(maxsize=1)
+def configure_gemini():
+    """
+    Importa y configura el SDK de Gemini bajo demanda
+
+    Raises:
+        ValueError: Si GEMINI_API_KEY no está configurada
+    """
+    settings = get_settings()
+    if not settings.gemini_api_key:
+        raise ValueError("GEMINI_API_KEY no está configurada en el archivo .env")
+
+    import google.generativeai as genai
+
+    genai.configure(api_key=settings.gemini_api_key)
+    return genai
@@ -0,0 +1,92 @@
+"""
+Reconstrucción del contexto a partir de los mensajes del cliente (modo sin estado)
+Convierte ChatRequest.messages en historial de Gemini con ventana y compactación,
+de modo que cualquier worker (o réplica) puede atender cualquier turno.
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+
+from metrics import metrics
+
+# Caracteres que se conservan de cada mensaje de usuario en el resumen compactado
+SUMMARY_SNIPPET_CHARS = 120
+
+# Longitud mínima a la que se recorta un mensaje antiguo antes de descartarlo
+MIN_MESSAGE_CHARS = 200
+
+def _normalize_role(role: str) -> str:
+    """El frontend usa 'assistant', Gemini espera 'model'"""
+    return "model" if role in ("assistant", "model") else "user"
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+def _summarize(older: Sequence[Tuple[str, str]]) -> str:
+    """Resumen local (sin LLM) de los mensajes que quedan fuera de la ventana"""
+    snippets = [_clip(content, SUMMARY_SNIPPET_CHARS) for role, content in older if role == "user"]
+    return "[Resumen de la conversación anterior] El usuario dijo: " + " | ".join(snippets)
+
+def _merge_consecutive(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Une mensajes seguidos del mismo rol (Gemini espera turnos alternos)"""
+    merged: List[Dict[str, Any]] = []
+    for item in history:
+        if merged and merged[-1]["role"] == item["role"]:
+            merged[-1]["parts"] = [merged[-1]["parts"][0] + "\n\n" + item["parts"][0]]
+        else:
+            merged.append(item)
+    return merged
+
+def _total_chars(history: List[Dict[str, Any]]) -> int:
+    return sum(len(item["parts"][0]) for item in history)
+
+def _fit_budget(history: List[Dict[str, Any]], max_chars: int) -> List[Dict[str, Any]]:
+    """Recorta los mensajes más antiguos y, si no basta, los descarta"""
+    for item in history:
+        if _total_chars(history) <= max_chars:
+            return history
+        item["parts"] = [_clip(item["parts"][0], MIN_MESSAGE_CHARS)]
+
+    while history and _total_chars(history) > max_chars:
+        history = history[1:]
+    return history
+
+def build_history(
+    messages: Sequence[Tuple[str, str]],
+    window: int,
+    max_chars: int
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Construye el historial de Gemini y el mensaje actual a partir de los mensajes del cliente
+
+    Args:
+        messages: Pares (role, content) en orden; el último es el mensaje actual
+        window: Número de mensajes anteriores que se conservan literalmente
+        max_chars: Presupuesto de caracteres del historial
+
+    Returns:
+        (historial en formato {"role", "parts"}, mensaje actual del usuario)
+    """
+    if not messages:
+        return [], ""
+
+    current = messages[-1][1]
+    previous = [(_normalize_role(role), content) for role, content in messages[:-1] if content]
+
+    older, recent = (previous[:-window], previous[-window:]) if window > 0 else (previous, [])
+    history = [{"role": role, "parts": [content]} for role, content in recent]
+    if older and any(role == "user" for role, _ in older):
+        history.insert(0, {"role": "user", "parts": [_summarize(older)]})
+        metrics.inc("history_compactions")
+
+    history = _merge_consecutive(history)
+    history = _fit_budget(history, max_chars)
+
+    # El historial debe empezar por el usuario (se descarta el saludo inicial del asistente)
+    while history and history[0]["role"] == "model":
+        history.pop(0)
+
+    # Un mensaje de usuario sin respuesta (turno fallido) se une al mensaje actual
+    if history and history[-1]["role"] == "user":
+        current = history.pop()["parts"][0] + "\n\n" + current
+
+    metrics.observe("history_messages", len(history), buckets=(0, 2, 4, 8, 12, 16, 24, 32, 64))
+    return history, current
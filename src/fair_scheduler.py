@@ -0,0 +1,230 @@
+"""
+Planificador justo de turnos del LLM (deficit round-robin)
+Los turnos que van al LLM ocupan una de `capacity` plazas compartidas. Si no hay plaza,
+esperan en cola y se reparten por turnos entre clientes (DRR con un quantum por visita)
+y, dentro de cada cliente, entre sus sesiones: un cliente que inunda /chat solo alarga
+su propia cola. Cada sesión tiene como mucho un turno en curso; sus siguientes turnos
+esperan en orden de llegada.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from config import get_settings
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cabecera opcional con la que un cliente se identifica (si no, se usa su IP)
+CLIENT_HEADER = "X-Client-Id"
+
+# Sesiones de las que se guardan estadísticas de espera (LRU)
+MAX_TRACKED_SESSIONS = 1000
+
+_client: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("scheduler_client", default=None)
+
+@contextmanager
+def client_scope(client_id: Optional[str]):
+    """Cliente al que se atribuyen los turnos del bloque (None no cambia nada)"""
+    if not client_id:
+        yield
+        return
+    token = _client.set(client_id)
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+class SessionQueueFull(Exception):
+    """La sesión ya tiene demasiados turnos esperando"""
+
+class _Waiter:
+    """Un turno en espera de plaza"""
+
+    __slots__ = ("session", "client", "cost", "future", "enqueued_at")
+
+    def __init__(self, session: str, client: str, cost: float):
+        self.session = session
+        self.client = client
+        self.cost = cost
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+class FairScheduler:
+    """Plazas de turnos del LLM repartidas con DRR entre clientes y sesiones"""
+
+    def __init__(self, capacity: int, max_queued_per_session: int = 4, quantum: float = 1.0):
+        self.capacity = capacity
+        self.max_queued_per_session = max_queued_per_session
+        self.quantum = quantum
+        self.in_flight = 0
+        # Turnos en espera por sesión (FIFO) y sesiones con un turno en curso
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._running: Set[str] = set()
+        # Ronda DRR: clientes con alguna sesión lista, cada uno con sus sesiones listas (round robin)
+        self._clients: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._deficit: Dict[str, float] = {}
+        # Espera por sesión: [turnos, total ms, máximo ms]
+        self._waits: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(self, session_id: Optional[str], client_id: Optional[str] = None, cost: float = 1.0):
+        """
+        Ocupa una plaza durante el bloque; devuelve la espera en ms
+
+        Uso:
+            async with fair_scheduler.slot(session_id) as wait_ms:
+                result = await ...
+
+        Raises:
+            SessionQueueFull: si la sesión ya tiene max_queued_per_session turnos esperando
+        """
+        # Sin session_id los turnos no comparten historial: no hace falta ordenarlos entre sí
+        session = session_id if session_id is not None else f"anon:{uuid.uuid4().hex}"
+        wait_ms = await self._acquire(session, client_id or _client.get() or session, cost)
+        if session_id is not None:
+            self._record_wait(session, wait_ms)
+        try:
+            yield wait_ms
+        finally:
+            self._release(session)
+
+    async def _acquire(self, session: str, client: str, cost: float) -> float:
+        queue = self._queues.get(session)
+        if queue is not None and len(queue) >= self.max_queued_per_session:
+            metrics.inc("scheduler_rejected")
+            raise SessionQueueFull(f"La sesión tiene {len(queue)} turnos en espera")
+
+        waiter = _Waiter(session, client, cost)
+        if queue is None:
+            queue = self._queues[session] = deque()
+        queue.append(waiter)
+        if len(queue) == 1 and session not in self._running:
+            self._mark_ready(session, client)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self._withdraw(waiter)
+                self._dispatch()
+            else:
+                # La plaza llegó a la vez que la cancelación: se devuelve
+                self._release(session)
+            raise
+
+        wait_ms = (time.perf_counter() - waiter.enqueued_at) * 1000
+        metrics.observe("scheduler_wait_ms", wait_ms)
+        return wait_ms
+
+    def _mark_ready(self, session: str, client: str):
+        sessions = self._clients.get(client)
+        if sessions is None:
+            sessions = self._clients[client] = deque()
+            self._deficit[client] = 0.0
+        sessions.append(session)
+
+    def _dispatch(self):
+        """Concede plazas libres recorriendo la ronda DRR"""
+        while self.in_flight < self.capacity and self._clients:
+            client, sessions = next(iter(self._clients.items()))
+            waiter = self._queues[sessions[0]][0]
+            if waiter.future.cancelled():
+                # Cancelado antes de que su tarea lo retirase de la cola
+                self._withdraw(waiter)
+                continue
+            if self._deficit[client] < waiter.cost:
+                self._deficit[client] += self.quantum
+                if self._deficit[client] < waiter.cost:
+                    self._clients.move_to_end(client)
+                    continue
+
+            self._deficit[client] -= waiter.cost
+            sessions.popleft()
+            self._queues[waiter.session].popleft()
+            self._running.add(waiter.session)
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+            if not sessions:
+                # Un cliente sin nada en cola no acumula déficit (DRR)
+                del self._clients[client]
+                del self._deficit[client]
+            elif self._deficit[client] < self._queues[sessions[0]][0].cost:
+                # Fin de su visita: pasa al final de la ronda
+                self._clients.move_to_end(client)
+
+    def _release(self, session: str):
+        self._running.discard(session)
+        self.in_flight -= 1
+        queue = self._queues.get(session)
+        if queue:
+            self._mark_ready(session, queue[0].client)
+        elif queue is not None:
+            del self._queues[session]
+        self._dispatch()
+
+    def _withdraw(self, waiter: _Waiter):
+        """Quita de la cola un turno cancelado mientras esperaba (si sigue en ella)"""
+        queue = self._queues.get(waiter.session)
+        if not queue or waiter not in queue:
+            return
+        was_head = queue[0] is waiter
+        queue.remove(waiter)
+        if not was_head or waiter.session in self._running:
+            return
+        sessions = self._clients[waiter.client]
+        sessions.remove(waiter.session)
+        if queue:
+            self._mark_ready(waiter.session, queue[0].client)
+        else:
+            del self._queues[waiter.session]
+        if not sessions:
+            del self._clients[waiter.client]
+            del self._deficit[waiter.client]
+
+    def _record_wait(self, session: str, wait_ms: float):
+        stats = self._waits.get(session)
+        if stats is None:
+            stats = self._waits[session] = [0, 0.0, 0.0]
+            while len(self._waits) > MAX_TRACKED_SESSIONS:
+                self._waits.popitem(last=False)
+        else:
+            self._waits.move_to_end(session)
+        stats[0] += 1
+        stats[1] += wait_ms
+        stats[2] = max(stats[2], wait_ms)
+
+    def session_wait(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Espera acumulada de una sesión (None si no hay datos)"""
+        stats = self._waits.get(session_id)
+        if stats is None:
+            return None
+        return {
+            "turns": stats[0],
+            "avg_wait_ms": round(stats[1] / stats[0], 1),
+            "max_wait_ms": round(stats[2], 1)
+        }
+
+    def status(self, top: int = 10) -> Dict[str, Any]:
+        slowest = sorted(self._waits, key=lambda session: self._waits[session][1], reverse=True)[:top]
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "clients_waiting": len(self._clients),
+            "top_session_waits": {session: self.session_wait(session) for session in slowest}
+        }
+
+def _build_fair_scheduler() -> FairScheduler:
+    settings = get_settings()
+    return FairScheduler(settings.llm_max_concurrent_turns, settings.session_max_queued_turns)
+
+# Planificador global del worker
+fair_scheduler = _build_fair_scheduler()
@@ -0,0 +1,142 @@
+"""
+Claves de idempotencia para las tools de escritura (crear_reserva)
+La clave se deriva del ámbito del turno (la clave que envía el cliente o, si no hay,
+la sesión) más la tool y sus argumentos normalizados. Con ella:
+
+- una repetición dentro de la ventana devuelve el resultado original sin volver al backend
+  (también si llega mientras la primera sigue en curso),
+- el backend recibe la cabecera Idempotency-Key y puede deduplicar un POST que se reintenta
+  tras un timeout (el que ya pudo crear la reserva).
+
+Una escritura posterior en el mismo ámbito (cancelar o modificar una reserva) olvida sus
+resultados y cambia las claves siguientes: volver a reservar lo mismo después de cancelar
+es una reserva nueva, también para el backend.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import metrics
+
+# Cabecera con la que el cliente de /chat y la API Node intercambian la clave
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+_scope: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("idempotency_scope", default=None)
+
+@contextmanager
+def idempotency_scope(scope: Optional[str], override: bool = True):
+    """
+    Fija el ámbito de las claves de idempotencia mientras dura el bloque
+
+    Args:
+        scope: Clave del cliente o ID de sesión (None no cambia nada)
+        override: Si es False solo se aplica cuando no hay ya un ámbito (p. ej. la clave del cliente)
+    """
+    if not scope or (not override and _scope.get()):
+        yield
+        return
+    token = _scope.set(scope)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+def current_scope() -> Optional[str]:
+    return _scope.get()
+
+def idempotency_key(scope: Optional[str], tool: str, args: Dict[str, Any]) -> str:
+    """Clave estable para (ámbito, tool, argumentos); sin ámbito depende solo de la llamada"""
+    payload = json.dumps([scope or "", tool, args], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+class IdempotencyStore:
+    """Resultados de escrituras por clave durante una ventana, con las ejecuciones en curso"""
+
+    def __init__(self, window: float, max_entries: int = 10000):
+        self.window = window
+        self.max_entries = max_entries
+        # {clave: (caduca, resultado, ámbito)}
+        self._results: "OrderedDict[str, Tuple[float, Any, Optional[str]]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        # Generación de cada ámbito con escrituras posteriores (forma parte de la clave)
+        self._generations: "OrderedDict[Optional[str], int]" = OrderedDict()
+
+    def key(self, scope: Optional[str], tool: str, args: Dict[str, Any]) -> str:
+        """Clave de la llamada en el ámbito (cambia tras forget_scope)"""
+        generation = self._generations.get(scope)
+        return idempotency_key(f"{scope or ''}#{generation}" if generation else scope, tool, args)
+
+    async def run(
+        self,
+        key: str,
+        tool: str,
+        call: Callable[[], Awaitable[Tuple[Any, bool]]],
+        scope: Optional[str] = None
+    ) -> Any:
+        """
+        Ejecuta call() una sola vez por clave dentro de la ventana
+
+        Args:
+            call: Corrutina que devuelve (resultado, guardar); solo se guardan los resultados
+                definitivos: tras un timeout o un error se puede repetir con la misma clave
+            scope: Ámbito de la clave (para olvidarlo con forget_scope)
+        """
+        entry = self._results.get(key)
+        if entry is not None:
+            if time.monotonic() < entry[0]:
+                metrics.inc("idempotency", tool=tool, outcome="replayed")
+                return entry[1]
+            del self._results[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.inc("idempotency", tool=tool, outcome="coalesced")
+            return await asyncio.shield(inflight)
+
+        metrics.inc("idempotency", tool=tool, outcome="new")
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result, store = await call()
+            if store:
+                self._put(key, result, scope)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Evita el aviso si nadie más la esperaba
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _put(self, key: str, result: Any, scope: Optional[str] = None):
+        self._results[key] = (time.monotonic() + self.window, result, scope)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def forget_scope(self, scope: Optional[str]):
+        """Olvida los resultados guardados de un ámbito y pasa a claves nuevas (tras otra escritura en él)"""
+        expired = [key for key, entry in self._results.items() if entry[2] == scope]
+        for key in expired:
+            del self._results[key]
+        if expired:
+            metrics.inc("idempotency_forgotten", len(expired))
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        self._generations.move_to_end(scope)
+        while len(self._generations) > self.max_entries:
+            self._generations.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+        self._generations.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
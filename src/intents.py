@@ -0,0 +1,135 @@
+"""
+Clasificación local de intenciones (sin LLM)
+Reglas de palabras clave equivalentes a las del orquestador, usadas para especular
+el especialista, para responder en modo degradado y para la vía rápida de navegación.
+"""
+import re
+import unicodedata
+from typing import Optional, Tuple
+
+# Frases de navegación: el orquestador siempre las envía a info_agent
+NAVIGATION_PHRASES = ("llévame", "llevame", "ir a ", "navegar", "página de", "pagina de", "quiero ver", "volver al")
+
+# Palabras clave de cada especialista
+INTENT_KEYWORDS = {
+    "reservas_agent": ("reserv", "token", "cancelar", "modificar", "cambiar la fecha", "personas", "mesa"),
+    "menus_agent": ("menú", "menu", "plato", "comida", "precio", "recomiend", "valorad", "carta"),
+    "info_agent": ("horario", "abrís", "abren", "ubicación", "dónde", "llegar", "hola", "buenos", "gracias"),
+}
+
+# Destinos de navegación (en orden: las reglas más específicas primero)
+NAVIGATION_TARGETS = (
+    ("consultar_reserva", ("mis reservas", "mi reserva", "consultar reserva", "consultar una reserva")),
+    ("reserva", ("reserva", "reservar")),
+    ("menu", ("menú", "menus", "menu", "carta")),
+    ("valorar", ("valoración", "valoraciones", "valorar", "opinión", "reseña")),
+    ("home", ("inicio", "home", "página principal", "pagina principal")),
+)
+
+def navigation_target(message: str) -> Optional[str]:
+    """Destino de navegación pedido en el mensaje (None si no es una petición de navegación)"""
+    text = message.lower()
+    if not any(phrase in text for phrase in NAVIGATION_PHRASES):
+        return None
+    for target, keywords in NAVIGATION_TARGETS:
+        if any(keyword in text for keyword in keywords):
+            return target
+    return None
+
+# Respuestas de la vía rápida de navegación (mismo tono que los ejemplos de info_agent)
+NAVIGATION_REPLIES = {
+    "consultar_reserva": "Te llevo a la página donde puedes consultar tus reservas.",
+    "reserva": "Te llevo a la sección de reservas para que elijas fecha y hora.",
+    "menu": "Te muestro nuestros menús disponibles.",
+    "valorar": "Te llevo a la sección de valoraciones para que nos dejes tu opinión.",
+    "home": "Te llevo a la página de inicio.",
+}
+
+# Vía rápida: señales sobre el texto normalizado (minúsculas, sin tildes ni signos)
+NAVIGATION_CUES = (
+    "llevame", "ir a", "ir al", "navegar", "pagina de", "seccion de", "quiero ver", "ver la", "ver las",
+    "ver mi", "volver", "vuelve", "regresar", "muestrame", "ensename", "dejar una", "dejar mi", "quiero valorar",
+)
+FAST_PATH_TARGETS = (
+    ("consultar_reserva", ("mis reservas", "mi reserva", "consultar reserva", "consultar mi reserva", "consultar una reserva")),
+    ("reserva", ("reservas", "reserva")),
+    ("menu", ("menus", "menu", "carta")),
+    ("valorar", ("valoraciones", "valoracion", "valorar", "opinion", "resena")),
+    ("home", ("inicio", "home", "pagina principal")),
+)
+FILLER_WORDS = frozenset((
+    "a", "al", "el", "la", "los", "las", "mi", "mis", "de", "del", "por", "favor", "quiero", "una", "un",
+    "me", "hola", "ahora",
+))
+# Vocabulario de una petición de navegación: cualquier otra palabra (reservar, hacer, mesa,
+# precios, valorado, dia, vinos, degustacion...) indica una tarea o una pregunta sobre el
+# contenido y el turno va a los agentes
+NAVIGATION_VOCABULARY = FILLER_WORDS | frozenset(("abre", "abrir")) | frozenset(
+    word
+    for phrase in NAVIGATION_CUES + tuple(keyword for _, keywords in FAST_PATH_TARGETS for keyword in keywords)
+    for word in phrase.split()
+)
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Confianza de una petición rechazada (hay destino, pero el turno debe ir a los agentes)
+REJECTED_CONFIDENCE = 0.2
+
+def _normalize(message: str) -> str:
+    """Minúsculas y sin tildes"""
+    text = unicodedata.normalize("NFKD", message.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+def match_navigation(message: str) -> Tuple[Optional[str], float]:
+    """
+    Destino de navegación con su confianza para responder sin LLM
+
+    Solo las peticiones cortas y explícitas ("llévame a la carta", "mis reservas") superan el
+    umbral: el mensaje debe usar únicamente el vocabulario de navegación. Reservar, preguntar
+    o pedir algo concreto de una sección ("el menú del día", "la carta de vinos") lo rechaza.
+
+    Returns:
+        (destino o None, confianza entre 0 y 1)
+    """
+    words = WORD_PATTERN.findall(_normalize(message))
+    if not words:
+        return None, 0.0
+    joined = f" {' '.join(words)} "
+
+    # Destino mencionado primero en el mensaje (a igual posición, el más específico)
+    target, position = None, len(joined)
+    for candidate, keywords in FAST_PATH_TARGETS:
+        found = [joined.find(f" {keyword} ") for keyword in keywords if f" {keyword} " in joined]
+        if found and min(found) < position:
+            target, position = candidate, min(found)
+    if target is None:
+        return None, 0.0
+
+    if "?" in message or any(word not in NAVIGATION_VOCABULARY for word in words):
+        return target, REJECTED_CONFIDENCE
+    if any(f" {cue} " in joined for cue in NAVIGATION_CUES):
+        return target, 0.9
+    # Solo el nombre de la sección ("la carta", "página principal")
+    content = [word for word in words if word not in FILLER_WORDS]
+    return target, 0.85 if len(content) <= 2 else 0.5
+
+def classify_intent(message: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Clasifica el mensaje con las reglas locales
+
+    Returns:
+        (agente con más coincidencias o None si no hay un ganador claro, destino de navegación)
+    """
+    target = navigation_target(message)
+    text = message.lower()
+    if target or any(phrase in text for phrase in NAVIGATION_PHRASES):
+        return "info_agent", target
+
+    scores = {
+        agent_id: sum(1 for keyword in keywords if keyword in text)
+        for agent_id, keywords in INTENT_KEYWORDS.items()
+    }
+    best = max(scores.values())
+    if best == 0:
+        return None, None
+    candidates = [agent_id for agent_id, score in scores.items() if score == best]
+    return (candidates[0] if len(candidates) == 1 else None), None
@@ -0,0 +1,253 @@
+"""
+Degradación controlada bajo saturación del LLM
+Detecta sobrecarga (turnos en curso, p95 de latencia, tasa de errores) y, mientras dura,
+responde las peticiones claras de información y navegación con plantillas locales y las de
+menús desde la caché. Las reservas, los mensajes que las reglas locales no clasifican
+("sí, a las 9", un email, un nombre) y cualquier turno de una sesión con una reserva en
+curso siguen yendo al LLM.
+"""
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple, Type
+
+from config import get_settings
+from intents import NAVIGATION_REPLIES, classify_intent
+from menu_cache import menu_cache
+from metrics import metrics
+from session_state import session_store
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se recalculan p95 y tasa de errores (segundos)
+EVALUATION_INTERVAL = 1.0
+
+# Plantillas de información general: (palabras clave, respuesta)
+INFO_TEMPLATES = (
+    (("horario", "hora", "abrís", "abren", "cerráis", "cierran"),
+     "Abrimos todos los días de 9:00 AM a 11:00 PM. ¡Te esperamos!"),
+    (("hola", "buenos", "buenas"),
+     "¡Hola! Bienvenido a nuestro restaurante. Puedo ayudarte con reservas, menús e información general."),
+    (("gracias",),
+     "¡A ti! Si necesitas algo más, aquí estoy."),
+)
+
+DEFAULT_INFO_RESPONSE = (
+    "Somos un restaurante acogedor y familiar con cocina variada. Abrimos todos los días de "
+    "9:00 AM a 11:00 PM y puedes hacer tu reserva o consultar los menús desde la aplicación."
+)
+
+class OverloadDetector:
+    """
+    Decide si el sistema está sobrecargado
+    Una vez activado, el modo degradado se mantiene `cooldown` segundos desde el último disparo
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        p95_latency_ms: float,
+        max_error_rate: float,
+        window: float = 60.0,
+        min_samples: int = 20,
+        cooldown: float = 30.0
+    ):
+        self.max_in_flight = max_in_flight
+        self.p95_latency_ms = p95_latency_ms
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.reason: Optional[str] = None
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=2000)
+        self._overloaded_until = 0.0
+        self._last_evaluation = 0.0
+        self._window_stats: Tuple[Optional[float], Optional[float]] = (None, None)
+
+    def record(self, latency_ms: float, success: bool):
+        """Registra el resultado de un turno atendido por el LLM"""
+        self._samples.append((time.monotonic(), latency_ms, success))
+
+    def _evaluate_window(self, now: float) -> Tuple[Optional[float], Optional[float]]:
+        """p95 de latencia y tasa de errores de la ventana (cacheados EVALUATION_INTERVAL)"""
+        if now - self._last_evaluation < EVALUATION_INTERVAL:
+            return self._window_stats
+
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+        self._last_evaluation = now
+        if len(self._samples) < self.min_samples:
+            self._window_stats = (None, None)
+        else:
+            latencies = sorted(sample[1] for sample in self._samples)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            error_rate = sum(1 for sample in self._samples if not sample[2]) / len(self._samples)
+            self._window_stats = (p95, error_rate)
+        return self._window_stats
+
+    def _trigger(self) -> Optional[str]:
+        if self.in_flight >= self.max_in_flight:
+            return "queue_depth"
+        p95, error_rate = self._evaluate_window(time.monotonic())
+        if p95 is not None and p95 > self.p95_latency_ms:
+            return "latency"
+        if error_rate is not None and error_rate > self.max_error_rate:
+            return "error_rate"
+        return None
+
+    @property
+    def active(self) -> bool:
+        """Modo degradado activo (sin reevaluar los disparadores)"""
+        return time.monotonic() < self._overloaded_until
+
+    def is_overloaded(self) -> bool:
+        """Evalúa los disparadores y devuelve si el modo degradado está activo"""
+        now = time.monotonic()
+        reason = self._trigger()
+        if reason:
+            if now >= self._overloaded_until:
+                metrics.inc("overload_triggered", reason=reason)
+                logger.warning("🚦 Sobrecarga detectada (%s): activando modo degradado", reason,
+                               extra={"category": "routing"})
+            self.reason = reason
+            self._overloaded_until = now + self.cooldown
+        return now < self._overloaded_until
+
+    def status(self) -> Dict[str, Any]:
+        p95, error_rate = self._window_stats
+        return {
+            "overloaded": self.active,
+            "reason": self.reason,
+            "in_flight": self.in_flight,
+            "p95_latency_ms": p95,
+            "error_rate": round(error_rate, 3) if error_rate is not None else None,
+            "thresholds": {
+                "max_in_flight": self.max_in_flight,
+                "p95_latency_ms": self.p95_latency_ms,
+                "max_error_rate": self.max_error_rate
+            }
+        }
+
+class LoadShedder:
+    """Responde localmente los turnos que no necesitan el LLM mientras hay sobrecarga"""
+
+    def __init__(self, enabled: bool, detector: OverloadDetector):
+        self.enabled = enabled
+        self.detector = detector
+
+    @property
+    def served_mode(self) -> str:
+        """Modo en que se atiende un turno que va al LLM: normal u overload_llm (reservas bajo sobrecarga)"""
+        return "overload_llm" if self.enabled and self.detector.active else "normal"
+
+    @contextmanager
+    def track(self, ignore: Tuple[Type[BaseException], ...] = ()):
+        """
+        Cuenta un turno del LLM en curso (también mientras espera plaza) y registra su latencia y resultado
+
+        Uso:
+            with load_shedder.track() as outcome:
+                result = await ...
+                outcome["success"] = result.get("success")
+
+        Args:
+            ignore: Excepciones que no cuentan como muestra (p. ej. un turno rechazado por la cola de su sesión)
+        """
+        outcome = {"success": False}
+        started = time.perf_counter()
+        record = True
+        self.detector.in_flight += 1
+        try:
+            yield outcome
+        except ignore:
+            record = False
+            raise
+        finally:
+            self.detector.in_flight -= 1
+            if record:
+                self.detector.record((time.perf_counter() - started) * 1000, bool(outcome["success"]))
+
+    async def try_degraded(self, user_message: str, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta local si hay sobrecarga y el turno es claramente de información, menús o navegación
+
+        Returns:
+            Resultado con el mismo formato que process_message, o None para usar el LLM
+        """
+        if not self.enabled or not self.detector.is_overloaded():
+            return None
+
+        agent_id, target = classify_intent(user_message)
+        if agent_id is None or agent_id == "reservas_agent":
+            return None
+        # Una respuesta de plantilla a mitad de una reserva rompería la conversación
+        last_agents = session_store.last_agents(session_id) if session_id else None
+        if last_agents and "reservas_agent" in last_agents:
+            return None
+
+        if target:
+            intent = "navigation"
+            response = NAVIGATION_REPLIES[target]
+        elif agent_id == "menus_agent":
+            intent = "menus"
+            response, target = await self._menus_response(user_message)
+        else:
+            intent = "info"
+            response = self._info_response(user_message)
+
+        metrics.inc("chat_served", mode="degraded", intent=intent)
+        return {
+            "success": True,
+            "response": response,
+            "navigation_action": target,
+            "agents_used": [],
+            "routing_reasoning": f"Modo degradado ({self.detector.reason})",
+            "tools_used": [],
+            "usage": {"llm_calls": 0, "prompt_tokens": 0, "output_tokens": 0},
+            "served_mode": "degraded",
+            "session_id": session_id
+        }
+
+    def _info_response(self, user_message: str) -> str:
+        text = user_message.lower()
+        for keywords, response in INFO_TEMPLATES:
+            if any(keyword in text for keyword in keywords):
+                return response
+        return DEFAULT_INFO_RESPONSE
+
+    async def _menus_response(self, user_message: str) -> Tuple[str, Optional[str]]:
+        """Respuesta de menús desde la caché (con enlace a la sección si no hay datos)"""
+        menus: Optional[List[Dict[str, Any]]] = await menu_cache.get()
+        if not menus:
+            return "Ahora mismo no puedo consultar la carta, pero puedes verla en la sección de menús.", "menu"
+
+        text = user_message.lower()
+        if any(keyword in text for keyword in ("recomiend", "valorad", "mejor")):
+            best = menu_cache.best_rated()
+            return (
+                f"Nuestro menú mejor valorado es **{best.get('nombre')}** "
+                f"({best.get('precio')} €, valoración {best.get('valoracion_promedio')}).",
+                None
+            )
+
+        lines = [f"- **{m.get('nombre')}**: {m.get('precio')} €" for m in menus[:5]]
+        more = f"\n…y {len(menus) - 5} más en la sección de menús." if len(menus) > 5 else ""
+        return "Estos son nuestros menús disponibles:\n" + "\n".join(lines) + more, None
+
+def _build_load_shedder() -> LoadShedder:
+    settings = get_settings()
+    detector = OverloadDetector(
+        max_in_flight=settings.overload_max_in_flight,
+        p95_latency_ms=settings.overload_p95_ms,
+        max_error_rate=settings.overload_error_rate,
+        window=settings.overload_window,
+        min_samples=settings.overload_min_samples,
+        cooldown=settings.overload_cooldown
+    )
+    return LoadShedder(settings.load_shedding_enabled, detector)
+
+# Instancia global del load shedder
+load_shedder = _build_load_shedder()
@@ -0,0 +1,168 @@
+"""
+Pipeline de logging no bloqueante
+- QueueHandler en el event loop + QueueListener que escribe desde un hilo aparte
+- Campos estructurados (session_id, agent, latency_ms...) tomados del contexto de la petición
+- Muestreo por categoría (los WARNING/ERROR nunca se descartan)
+- Override de depuración por petición (cabecera X-Debug-Log)
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Cabecera que activa el nivel DEBUG (y desactiva el muestreo) para una petición
+DEBUG_HEADER = "x-debug-log"
+
+# Librerías que se mantienen en el nivel configurado (sus DEBUG no llegan a crearse)
+LIBRARY_LOGGERS = ("httpx", "httpcore", "asyncio", "urllib3", "grpc", "google", "multipart", "watchfiles")
+
+# Campos estructurados que se añaden a cada línea si están presentes
+STRUCTURED_FIELDS = ("category", "session_id", "agent", "latency_ms", "tool", "trace_id")
+
+_log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+@contextmanager
+def log_context(**fields):
+    """
+    Asocia campos al contexto de logging mientras dura el bloque
+
+    Uso:
+        with log_context(session_id="abc", debug=True):
+            ...
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def debug_enabled() -> bool:
+    """True si la petición actual tiene el override de depuración activo"""
+    return bool(_log_context.get().get("debug"))
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Convierte "agent=0.1,tool=0.5" en {"agent": 0.1, "tool": 0.5}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        category, _, rate = item.partition("=")
+        rates[category.strip()] = float(rate)
+    return rates
+
+class ContextFilter(logging.Filter):
+    """
+    Enriquece cada registro con el contexto de la petición y aplica
+    el nivel mínimo (salvo override de depuración)
+    """
+
+    def __init__(self, level: int):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        if record.levelno < self.level and not context.get("debug"):
+            return False
+        for key, value in context.items():
+            if key != "debug" and not hasattr(record, key):
+                setattr(record, key, value)
+        if not hasattr(record, "category"):
+            record.category = record.name
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Descarta una fracción de los registros de cada categoría"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        if _log_context.get().get("debug"):
+            return True
+        rate = self.rates.get(getattr(record, "category", record.name), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class StructuredFormatter(logging.Formatter):
+    """Formatea los registros como texto con pares clave=valor o como JSON"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            key: getattr(record, key)
+            for key in STRUCTURED_FIELDS
+            if getattr(record, key, None) is not None
+        }
+
+        if self.json_output:
+            payload = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields
+            }
+            if record.exc_info:
+                payload["exc_info"] = self.formatException(record.exc_info)
+            return json.dumps(payload, ensure_ascii=False, default=str)
+
+        line = super().format(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+def setup_logging(
+    level: str = "INFO",
+    json_output: bool = False,
+    sampling: Optional[Dict[str, float]] = None,
+    stream=None,
+    threaded: bool = True
+) -> Optional[logging.handlers.QueueListener]:
+    """
+    Configura el logging raíz con una cola: el hilo que loguea solo encola,
+    el QueueListener formatea y escribe en stderr desde su propio hilo
+
+    Args:
+        level: Nivel mínimo (salvo override de depuración por petición)
+        json_output: Formato JSON en lugar de texto clave=valor
+        sampling: Tasa de muestreo por categoría
+        stream: Destino de los logs (stderr por defecto)
+        threaded: Con False se escribe directamente, sin cola ni hilo (proceso que va a hacer fork:
+            el hilo del listener no sobrevive al fork y la cola heredada no la vaciaría nadie)
+
+    Returns:
+        El listener (hay que pararlo al apagar para vaciar la cola), o None sin hilo
+    """
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(StructuredFormatter(json_output))
+
+    listener = None
+    if threaded:
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    else:
+        handler = stream_handler
+    handler.addFilter(ContextFilter(logging.getLevelName(level)))
+    handler.addFilter(SamplingFilter(sampling or {}))
+
+    root = logging.getLogger()
+    for old_handler in list(root.handlers):
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    # El nivel efectivo lo aplica ContextFilter para permitir el override por petición
+    root.setLevel(logging.DEBUG)
+    for name in LIBRARY_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+
+    if listener is not None:
+        listener.start()
+    return listener
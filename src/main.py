@@ -7,25 +7,26 @@ Sistema de agentes especializados con Gemini Flash
 - Orquestador para coordinar agentes
 """
 import os
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-import google.generativeai as genai
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import httpx
-import json
-from multi_agents import RestauranteMultiAgentSystem
+from config import get_settings, configure_gemini, configure_logging
+from metrics import metrics
+from tracing import tracer
+from profiling import request_profiler, PROFILE_HEADER
+from log_pipeline import log_context, DEBUG_HEADER
+from chat_jobs import ChatJobQueue, JobQueueFull
+from idempotency import IDEMPOTENCY_HEADER, idempotency_scope
+from fair_scheduler import CLIENT_HEADER, SessionQueueFull, client_scope
+from warmup import warmup
+from ws_chat import ChatSocket
 
-# Cargar variables de entorno
-load_dotenv()
-
-# Configurar Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY no está configurada en el archivo .env")
-
-genai.configure(api_key=GEMINI_API_KEY)
+# Configuración resuelta una sola vez (Gemini, httpx y los agentes se cargan bajo demanda)
+settings = get_settings()
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -35,21 +36,99 @@ app = FastAPI(
 )
 
 # Configurar CORS
-cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:4200").split(",")
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=cors_origins,
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Rutas para las que se abre una traza por petición
+TRACED_PATH_PREFIXES = ("/chat",)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Abre el span raíz de la petición y devuelve su trace ID en la cabecera X-Trace-Id"""
+    if not request.url.path.startswith(TRACED_PATH_PREFIXES):
+        return await call_next(request)
+
+    with tracer.span(f"{request.method} {request.url.path}") as span:
+        response = await call_next(request)
+        span.set("status_code", response.status_code)
+
+    if span.trace_id:
+        response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
 # URL de la API Node.js
-NODE_API_URL = os.getenv("NODE_API_URL", "http://localhost:3000/api")
+NODE_API_URL = settings.node_api_url
 
 # Inicializar el sistema multi-agente
 multi_agent_system = None
 
+# Tiempo máximo (segundos) para drenar chats en curso al recibir SIGTERM
+GRACEFUL_TIMEOUT = settings.graceful_timeout
+
+# Hosts cuya resolución DNS se precalienta en cada worker
+WARMUP_HOSTS = [
+    (urlparse(NODE_API_URL).hostname, urlparse(NODE_API_URL).port or 80),
+    ("generativelanguage.googleapis.com", 443),
+]
+
+class ChatDrain:
+    """
+    Control de drenado de chats
+    Al recibir SIGTERM deja de aceptar chats nuevos y espera a que terminen los que están en curso
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def begin(self):
+        """Marca el inicio del drenado (llamado desde el handler de señales del worker)"""
+        self.draining = True
+
+    @asynccontextmanager
+    async def track(self):
+        """Contabiliza un chat en curso mientras dura el bloque"""
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Espera a que no queden chats en curso. Devuelve False si se agota el timeout"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+chat_drain = ChatDrain()
+
+def preload():
+    """
+    Precarga el sistema multi-agente (modelos y agentes)
+    El lanzador de producción lo llama en el proceso padre antes del fork,
+    así cada worker hereda los agentes ya construidos
+    """
+    global multi_agent_system
+    if multi_agent_system is None:
+        configure_logging()
+        configure_gemini()
+        from multi_agents import RestauranteMultiAgentSystem
+        multi_agent_system = RestauranteMultiAgentSystem()
+    return multi_agent_system
+
 # Modelos Pydantic
 class Message(BaseModel):
     role: str  # 'user' o 'assistant'
@@ -58,18 +137,46 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[Message]
     session_id: Optional[str] = None
+    # Clave de idempotencia del turno (o cabecera Idempotency-Key): al reenviar el mismo turno
+    # las escrituras (crear_reserva) devuelven el resultado original en lugar de repetirse
+    idempotency_key: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
     session_id: Optional[str] = None
     navigation_action: Optional[str] = None
+    served_mode: Optional[str] = None
 
 @app.on_event("startup")
 async def startup_event():
-    """Inicializa el sistema multi-agente al arrancar"""
-    global multi_agent_system
-    multi_agent_system = RestauranteMultiAgentSystem()
-    print("✅ Sistema Multi-Agente inicializado")
+    """
+    Inicializa el sistema multi-agente al arrancar (si no se precargó) y calienta el worker
+    El calentamiento corre en segundo plano: /health responde 503 hasta que termina
+    """
+    system = preload()
+    chat_jobs.start()
+    warmup.start(
+        system,
+        WARMUP_HOSTS,
+        inference=settings.warmup_inference,
+        timeout=settings.warmup_timeout,
+        refresh_interval=settings.menu_refresh_interval
+    )
+    print(f"✅ Sistema Multi-Agente inicializado (worker {os.getenv('WORKER_ID', '0')})")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Espera a que terminen los chats en curso antes de parar el worker"""
+    chat_drain.begin()
+    if not await chat_drain.wait_idle(GRACEFUL_TIMEOUT):
+        print(f"⚠️ Apagado con {chat_drain.in_flight} chats aún en curso")
+    await chat_jobs.stop()
+    await warmup.stop()
+    from mcp_tools import restaurante_tools
+    from tool_server import get_tool_dispatcher
+    await restaurante_tools.aclose()
+    if settings.tool_server_url:
+        await get_tool_dispatcher().aclose()
 
 @app.get("/")
 async def root():
@@ -83,12 +190,18 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
-    """Health check para monitoreo"""
-    return {"status": "healthy"}
+async def health_check(response: Response):
+    """Health check para monitoreo (503 mientras el worker se calienta o está drenando)"""
+    if chat_drain.draining:
+        response.status_code = 503
+        return {"status": "draining", "in_flight": chat_drain.in_flight}
+    if not warmup.ready:
+        response.status_code = 503
+        return {"status": "warming_up", "warmup": warmup.report}
+    return {"status": "healthy", "warmup": warmup.report}
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Endpoint principal para conversación con el sistema multi-agente
     
@@ -103,6 +216,39 @@ async def chat(request: ChatRequest):
     Returns:
         Respuesta coordinada del sistema multi-agente
     """
+    if chat_drain.draining:
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio reiniciándose, reintenta en unos segundos",
+            headers={"Retry-After": "5"}
+        )
+
+    debug = _debug_requested(http_request)
+    request.idempotency_key = request.idempotency_key or http_request.headers.get(IDEMPOTENCY_HEADER)
+    client_id = _client_id(http_request)
+    
+    with log_context(session_id=request.session_id, trace_id=tracer.current_trace_id(), debug=debug), \
+            client_scope(client_id):
+        async with chat_drain.track():
+            # Profiling opcional: sin coste alguno cuando PROFILING_ENABLED=false
+            if request_profiler.enabled and request_profiler.should_profile(http_request.headers.get(PROFILE_HEADER)):
+                return await request_profiler.run(
+                    _process_chat(request),
+                    session_id=request.session_id,
+                    trace_id=tracer.current_trace_id()
+                )
+            return await _process_chat(request)
+
+def _debug_requested(http_request: Request) -> bool:
+    """X-Debug-Log: campos estructurados de log para todo el turno, con DEBUG y sin muestreo"""
+    return http_request.headers.get(DEBUG_HEADER, "").strip().lower() in ("1", "true", "yes")
+
+def _client_id(http_request: Request) -> Optional[str]:
+    """Cliente para el reparto justo de plazas del LLM (cabecera X-Client-Id o IP)"""
+    return http_request.headers.get(CLIENT_HEADER) or (http_request.client.host if http_request.client else None)
+
+async def _process_chat(request: ChatRequest) -> ChatResponse:
+    """Procesa un turno de chat con el sistema multi-agente"""
     try:
         if not multi_agent_system:
             raise HTTPException(status_code=503, detail="Sistema multi-agente no inicializado")
@@ -113,11 +259,26 @@ async def chat(request: ChatRequest):
         if not user_message:
             raise HTTPException(status_code=400, detail="Mensaje vacío")
         
+        # Modo sin estado: el contexto se reconstruye desde los mensajes de la petición
+        history = None
+        if settings.stateless_chat:
+            from conversation import build_history
+            history, user_message = build_history(
+                [(m.role, m.content) for m in request.messages],
+                window=settings.history_window,
+                max_chars=settings.history_max_chars
+            )
+        
         # Procesar con el sistema multi-agente
-        result = await multi_agent_system.process_message(
-            user_message=user_message,
-            session_id=request.session_id
-        )
+        with idempotency_scope(request.idempotency_key):
+            result = await multi_agent_system.process_message(
+                user_message=user_message,
+                session_id=request.session_id,
+                history=history
+            )
+        
+        if request_profiler.enabled:
+            request_profiler.annotate(agents=result.get("agents_used"))
         
         if not result.get("success"):
             raise HTTPException(
@@ -128,16 +289,92 @@ async def chat(request: ChatRequest):
         return ChatResponse(
             response=result.get("response", ""),
             session_id=result.get("session_id"),
-            navigation_action=result.get("navigation_action")
+            navigation_action=result.get("navigation_action"),
+            served_mode=result.get("served_mode")
         )
         
     except HTTPException:
         raise
+    except SessionQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados mensajes seguidos en esta sesión, espera a la respuesta anterior",
+            headers={"Retry-After": "2"}
+        )
     except Exception as e:
         import traceback
         error_detail = f"Error al procesar el chat: {str(e)}\n{traceback.format_exc()}"
         raise HTTPException(status_code=500, detail=error_detail)
 
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket):
+    """
+    Chat por WebSocket ligado a una sesión (?session_id=...)
+    Envía eventos de progreso durante el turno y, al terminar, la respuesta por fragmentos y
+    navigation_action (ver ws_chat.py)
+    """
+    await ChatSocket(websocket, multi_agent_system, chat_drain).run()
+
+async def _run_chat_job(request: ChatRequest, client_id: Optional[str] = None, debug: bool = False) -> Dict[str, Any]:
+    """
+    Procesa un turno encolado en /chat/jobs (mismo flujo que /chat)
+    El cliente y X-Debug-Log se capturan al encolar; la clave de idempotencia viaja en la petición
+    """
+    with log_context(session_id=request.session_id, trace_id=tracer.current_trace_id(), debug=debug), \
+            client_scope(client_id):
+        async with chat_drain.track():
+            try:
+                return (await _process_chat(request)).dict()
+            except HTTPException as e:
+                raise RuntimeError(e.detail) from e
+
+# Cola de turnos asíncronos (los workers se arrancan en el startup)
+chat_jobs = ChatJobQueue(
+    _run_chat_job,
+    workers=settings.chat_job_workers,
+    max_queued=settings.chat_job_queue_size,
+    ttl=settings.chat_job_ttl
+)
+
+@app.post("/chat/jobs", status_code=202)
+async def create_chat_job(request: ChatRequest, http_request: Request):
+    """
+    Encola un turno de chat y devuelve su job_id sin esperar a la respuesta
+    El resultado se obtiene con GET /chat/jobs/{job_id} (long polling)
+    """
+    if chat_drain.draining:
+        raise HTTPException(status_code=503, detail="Servicio reiniciándose, reintenta en unos segundos", headers={"Retry-After": "5"})
+    if not request.messages or not request.messages[-1].content:
+        raise HTTPException(status_code=400, detail="Mensaje vacío")
+
+    # Lo que /chat toma de la petición se captura ahora: el job se ejecuta fuera de ella
+    request.idempotency_key = request.idempotency_key or http_request.headers.get(IDEMPOTENCY_HEADER)
+    context = {"client_id": _client_id(http_request), "debug": _debug_requested(http_request)}
+    try:
+        job = chat_jobs.submit(request, session_id=request.session_id, context=context)
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="Demasiados turnos en cola, reintenta en unos segundos", headers={"Retry-After": "2"})
+    return {"job_id": job.id, "status": job.status, "poll_url": f"/chat/jobs/{job.id}"}
+
+@app.get("/chat/jobs/{job_id}")
+async def get_chat_job(job_id: str, wait: float = 0):
+    """
+    Estado y resultado de un job
+    Con ?wait=N espera hasta N segundos (máx. CHAT_JOB_MAX_WAIT) a que termine antes de responder
+    """
+    job = await chat_jobs.wait(job_id, min(max(wait, 0), settings.chat_job_max_wait))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado o caducado")
+    return job.to_dict()
+
+@app.delete("/chat/jobs/{job_id}")
+async def cancel_chat_job(job_id: str):
+    """Cancela un job en cola o en ejecución"""
+    job = chat_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado o caducado")
+    return job.to_dict()
+
 @app.post("/chat/reset")
 async def reset_chat(session_id: Optional[str] = None):
     """
@@ -160,14 +397,49 @@ async def agents_status():
     
     return multi_agent_system.get_system_status()
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Métricas internas del sistema (contadores e histogramas)
+    Incluye bytes/tokens de resultados de tools antes y después del shaping
+    """
+    return metrics.snapshot()
+
+@app.get("/profiles")
+async def list_profiles(limit: int = 20):
+    """
+    Lista los perfiles de peticiones más recientes (sesión, agentes, duración)
+    Los .prof se pueden descargar en /profiles/{profile_id} y abrir con pstats o snakeviz
+    Solo con PROFILING_ENABLED (los metadatos incluyen IDs de sesión)
+    """
+    if not request_profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling desactivado")
+    return {
+        "enabled": request_profiler.enabled,
+        "sample_rate": request_profiler.sample_rate,
+        "profiles": await asyncio.to_thread(request_profiler.list_profiles, limit)
+    }
+
+@app.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """Descarga un perfil .prof (solo con PROFILING_ENABLED)"""
+    from fastapi.responses import FileResponse
+
+    path = request_profiler.profile_path(profile_id) if request_profiler.enabled else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
 @app.get("/menus")
 async def get_menus():
     """
     Obtener menús desde la API de Node.js para contexto del agente
     (Para futuras mejoras con tools)
     """
+    from mcp_tools import restaurante_tools
+
     try:
-        async with httpx.AsyncClient() as client:
+        async with restaurante_tools._client() as client:
             response = await client.get(f"{NODE_API_URL}/menus")
             response.raise_for_status()
             return response.json()
@@ -175,9 +447,9 @@ async def get_menus():
         raise HTTPException(status_code=500, detail=f"Error al obtener menús: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    host = os.getenv("HOST", "0.0.0.0")
+    from server import serve
+    port = settings.port
+    host = settings.host
     
     print("=" * 60)
     print("🚀 SISTEMA MULTI-AGENTE IA - RESTAURANTE")
@@ -191,4 +463,4 @@ if __name__ == "__main__":
     print("   - Info Agent: Información general")
     print("=" * 60)
     
-    uvicorn.run(app, host=host, port=port)
+    serve(host=host, port=port, workers=settings.workers)
@@ -1,23 +1,55 @@
 """
-MCP Server para el sistema de restaurante
+Tools MCP para el sistema de restaurante
 Proporciona tools para que el agente IA pueda interactuar con el backend
+(se ejecutan en cada worker o en el servidor compartido de tool_server.py)
 """
-import os
-import json
-import httpx
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
-from dotenv import load_dotenv
+from config import get_settings
+from idempotency import IDEMPOTENCY_HEADER
+from tracing import traced, tracing_transport
 
-load_dotenv()
+NODE_API_URL = get_settings().node_api_url
 
-NODE_API_URL = os.getenv("NODE_API_URL", "http://localhost:3000/api")
+# Pool de conexiones hacia la API Node (compartido por todas las tools del worker)
+POOL_LIMITS = {"max_connections": 100, "max_keepalive_connections": 20, "keepalive_expiry": 30.0}
 
 class RestauranteTools:
     """Herramientas para el agente del restaurante"""
     
     def __init__(self):
         self.api_url = NODE_API_URL
+        self._http = None
+        self._http_loop = None
+    
+    def _shared_client(self):
+        """
+        Cliente HTTP compartido con keep-alive (httpx se importa bajo demanda)
+        Se recrea si cambia el event loop (p. ej. tras un fork o en scripts con asyncio.run)
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop or self._http.is_closed:
+            import httpx
+            self._http = httpx.AsyncClient(
+                timeout=10.0,
+                transport=tracing_transport(limits=httpx.Limits(**POOL_LIMITS))
+            )
+            self._http_loop = loop
+        return self._http
+    
+    @asynccontextmanager
+    async def _client(self):
+        """Cliente hacia la API Node: reutiliza las conexiones del pool en lugar de abrir una por llamada"""
+        yield self._shared_client()
+    
+    async def aclose(self):
+        """Cierra las conexiones del pool (al apagar el worker)"""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
         
+    @traced("tool.get_menu_mas_valorado")
     async def get_menu_mas_valorado(self) -> Dict[str, Any]:
         """
         Obtiene el menú con mejor valoración promedio
@@ -26,7 +58,7 @@ class RestauranteTools:
             Información del menú más valorado
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client() as client:
                 # Obtener todos los menús
                 response = await client.get(f"{self.api_url}/menus")
                 response.raise_for_status()
@@ -52,6 +84,7 @@ class RestauranteTools:
         except Exception as e:
             return {"error": f"Error al obtener menús: {str(e)}"}
     
+    @traced("tool.crear_reserva")
     async def crear_reserva(
         self,
         nombre_cliente: str,
@@ -59,7 +92,8 @@ class RestauranteTools:
         email_cliente: str,
         fecha_reserva: str,
         num_personas: int,
-        notas: Optional[str] = None
+        notas: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Crea una nueva reserva en el sistema
@@ -71,6 +105,8 @@ class RestauranteTools:
             fecha_reserva: Fecha y hora en formato YYYY-MM-DDTHH:mm
             num_personas: Número de personas (1-20)
             notas: Notas adicionales opcionales
+            idempotency_key: Clave que la API recibe en la cabecera Idempotency-Key para no
+                duplicar la reserva si el POST se repite (la añade el registro de tools)
             
         Returns:
             Información de la reserva creada con el token
@@ -87,10 +123,12 @@ class RestauranteTools:
             if notas:
                 data["notas"] = notas
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            headers = {IDEMPOTENCY_HEADER: idempotency_key} if idempotency_key else None
+            async with self._client() as client:
                 response = await client.post(
                     f"{self.api_url}/reservas",
-                    json=data
+                    json=data,
+                    headers=headers
                 )
                 
                 if response.status_code == 201:
@@ -111,6 +149,7 @@ class RestauranteTools:
         except Exception as e:
             return {"success": False, "error": f"Error al crear reserva: {str(e)}"}
     
+    @traced("tool.modificar_fecha_reserva")
     async def modificar_fecha_reserva(
         self,
         token: str,
@@ -127,7 +166,7 @@ class RestauranteTools:
             Confirmación de la modificación
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client() as client:
                 # Modificar fecha usando el token directamente
                 response = await client.patch(
                     f"{self.api_url}/reservas/token/{token}/fecha",
@@ -151,6 +190,7 @@ class RestauranteTools:
         except Exception as e:
             return {"success": False, "error": f"Error al modificar fecha: {str(e)}"}
     
+    @traced("tool.cancelar_reserva")
     async def cancelar_reserva(self, token: str) -> Dict[str, Any]:
         """
         Cancela una reserva existente
@@ -162,7 +202,7 @@ class RestauranteTools:
             Confirmación de la cancelación
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client() as client:
                 # Cancelar reserva usando el token directamente
                 response = await client.post(
                     f"{self.api_url}/reservas/token/{token}/cancelar"
@@ -188,6 +228,7 @@ class RestauranteTools:
         except Exception as e:
             return {"success": False, "error": f"Error al cancelar reserva: {str(e)}"}
     
+    @traced("tool.consultar_reserva")
     async def consultar_reserva(self, token: str) -> Dict[str, Any]:
         """
         Consulta el estado de una reserva
@@ -199,7 +240,7 @@ class RestauranteTools:
             Información completa de la reserva
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client() as client:
                 response = await client.get(f"{self.api_url}/reservas/token/{token}")
                 
                 if response.status_code == 200:
@@ -217,6 +258,7 @@ class RestauranteTools:
         except Exception as e:
             return {"success": False, "error": f"Error al consultar reserva: {str(e)}"}
     
+    @traced("tool.listar_menus_disponibles")
     async def listar_menus_disponibles(self) -> Dict[str, Any]:
         """
         Lista todos los menús disponibles
@@ -225,7 +267,7 @@ class RestauranteTools:
             Lista de menús disponibles
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client() as client:
                 response = await client.get(f"{self.api_url}/menus")
                 response.raise_for_status()
                 menus = response.json()
@@ -242,12 +284,26 @@ class RestauranteTools:
         except Exception as e:
             return {"error": f"Error al listar menús: {str(e)}"}
 
-# Definición de tools para el agente
+# Definición de tools para el agente (se compila una vez en tool_registry.get_tool_registry)
+# `validation` declara las restricciones que se comprueban en local antes de llamar al backend
+# (ver tool_validation.validate_tool_args)
+# `result_shaping` controla cómo se reduce el resultado antes de enviarlo al modelo
+# (ver tool_shaping.shape_result): campos permitidos, truncado y codificación compacta
+# `timeout` (segundos), `cache_ttl` (segundos, 0 = sin caché), `read_only` (sin efectos: se puede
+# ejecutar de forma especulativa) e `idempotent` (repetirla no cambia el resultado: se reintenta
+# una vez si se agota el timeout; por defecto igual que read_only)
 TOOLS_DEFINITIONS = [
     {
         "name": "get_menu_mas_valorado",
         "description": "Obtiene el menú con la mejor valoración promedio del restaurante. Úsalo cuando el cliente pregunte por el menú más popular, mejor valorado o recomendado.",
-        "parameters": {}
+        "parameters": {},
+        "timeout": 5.0,
+        "cache_ttl": 60,
+        "read_only": True,
+        "result_shaping": {
+            "fields": {"menu": ["id", "nombre", "descripcion", "precio", "valoracion_promedio"]},
+            "max_text_length": 300
+        }
     },
     {
         "name": "crear_reserva",
@@ -281,6 +337,20 @@ TOOLS_DEFINITIONS = [
                 }
             },
             "required": ["nombre_cliente", "telefono_cliente", "email_cliente", "fecha_reserva", "num_personas"]
+        },
+        # Con clave de idempotencia y BACKEND_IDEMPOTENCY_KEYS el POST se puede reintentar:
+        # timeout corto y un reintento; si no, el timeout por defecto y sin reintento
+        "idempotency_key": True,
+        "keyed_timeout": 4.0,
+        "validation": {
+            "telefono_cliente": {"remove_chars": " -()", "pattern": r"^\+?\d{9,15}$", "message": "El teléfono debe tener entre 9 y 15 dígitos (puede empezar por +)"},
+            "email_cliente": {"strip": " ", "format": "email"},
+            "fecha_reserva": {"format": "reservation_datetime", "opening_hours": (9, 23), "future": True},
+            "num_personas": {"type": "integer", "minimum": 1, "maximum": 20, "message": "El número de personas debe estar entre 1 y 20"}
+        },
+        "result_shaping": {
+            "fields": {"reserva": ["token", "nombre_cliente", "fecha_reserva", "num_personas", "estado", "notas"]},
+            "max_text_length": 200
         }
     },
     {
@@ -299,6 +369,15 @@ TOOLS_DEFINITIONS = [
                 }
             },
             "required": ["token", "nueva_fecha"]
+        },
+        "timeout": 8.0,
+        "idempotent": True,
+        "validation": {
+            "nueva_fecha": {"format": "reservation_datetime", "opening_hours": (9, 23), "future": True}
+        },
+        "result_shaping": {
+            "fields": {"reserva": ["token", "nombre_cliente", "fecha_reserva", "num_personas", "estado", "notas"]},
+            "max_text_length": 200
         }
     },
     {
@@ -313,6 +392,11 @@ TOOLS_DEFINITIONS = [
                 }
             },
             "required": ["token"]
+        },
+        "timeout": 8.0,
+        "idempotent": True,
+        "result_shaping": {
+            "max_text_length": 200
         }
     },
     {
@@ -327,12 +411,26 @@ TOOLS_DEFINITIONS = [
                 }
             },
             "required": ["token"]
+        },
+        "timeout": 5.0,
+        "read_only": True,
+        "result_shaping": {
+            "fields": {"reserva": ["token", "nombre_cliente", "fecha_reserva", "num_personas", "estado", "notas"]},
+            "max_text_length": 200
         }
     },
     {
         "name": "listar_menus_disponibles",
         "description": "Lista todos los menús disponibles en el restaurante con sus precios, descripciones y valoraciones.",
-        "parameters": {}
+        "parameters": {},
+        "timeout": 5.0,
+        "cache_ttl": 60,
+        "read_only": True,
+        "result_shaping": {
+            "fields": {"menus": ["id", "nombre", "descripcion", "precio", "valoracion_promedio"]},
+            "max_text_length": 160,
+            "compact": ["menus"]
+        }
     }
 ]
 
@@ -0,0 +1,64 @@
+"""
+Caché local del catálogo de menús
+Permite responder preguntas de menús sin LLM ni backend (p. ej. en modo degradado).
+Si el backend falla se sigue sirviendo la última copia conocida.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from config import get_settings
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Espera tras un refresco fallido antes de volver a llamar al backend (segundos)
+RETRY_AFTER_ERROR = 30.0
+
+class MenuCache:
+    """Lista de menús disponibles con TTL y refresco bajo demanda"""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.menus: Optional[List[Dict[str, Any]]] = None
+        self.updated_at: Optional[float] = None
+        self._retry_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        return self.updated_at is not None and time.monotonic() - self.updated_at < self.ttl
+
+    async def refresh(self) -> bool:
+        """Recarga la lista desde el backend (True si se actualizó)"""
+        from mcp_tools import restaurante_tools
+
+        result = await restaurante_tools.listar_menus_disponibles()
+        if not result.get("success"):
+            self._retry_at = time.monotonic() + RETRY_AFTER_ERROR
+            metrics.inc("menu_cache_refresh", outcome="error")
+            logger.warning("⚠️ No se pudo refrescar la caché de menús: %s", result.get("error"))
+            return False
+
+        self.menus = result["menus"]
+        self.updated_at = time.monotonic()
+        metrics.inc("menu_cache_refresh", outcome="ok")
+        return True
+
+    async def get(self) -> Optional[List[Dict[str, Any]]]:
+        """Menús en caché, refrescando si han caducado (None si nunca se pudieron cargar)"""
+        if not self.fresh and time.monotonic() >= self._retry_at:
+            async with self._lock:
+                if not self.fresh and time.monotonic() >= self._retry_at:
+                    await self.refresh()
+        return self.menus
+
+    def best_rated(self) -> Optional[Dict[str, Any]]:
+        """Menú con mejor valoración de la copia en caché"""
+        if not self.menus:
+            return None
+        return max(self.menus, key=lambda m: m.get("valoracion_promedio") or 0)
+
+# Instancia global de la caché
+menu_cache = MenuCache(get_settings().menu_cache_ttl)
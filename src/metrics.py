@@ -0,0 +1,132 @@
+"""
+Métricas internas del sistema multi-agente
+Contadores e histogramas en memoria, expuestos en GET /metrics
+"""
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+
+# Buckets por defecto para histogramas (valores genéricos: ms, bytes, iteraciones...)
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """Normaliza las etiquetas a una clave ordenada y hashable"""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        """Registra una observación"""
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Aproxima un cuantil usando el límite superior del bucket"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, bound in enumerate(self.buckets):
+            seen += self.counts[i]
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación serializable del histograma"""
+        buckets = {str(bound): self.counts[i] for i, bound in enumerate(self.buckets)}
+        buckets["+Inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "buckets": buckets
+        }
+
+class MetricsRegistry:
+    """
+    Registro de métricas en memoria
+    Thread-safe para poder usarse desde hilos de trabajo además del event loop
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self.started_at = datetime.now()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Incrementa un contador"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        **labels
+    ):
+        """Registra un valor en un histograma"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Devuelve el valor actual de un contador"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def get_histogram(self, name: str, **labels) -> Optional[Histogram]:
+        """Devuelve un histograma (o None si no tiene observaciones)"""
+        with self._lock:
+            return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def reset(self):
+        """Borra todas las métricas (útil en tests y benchmarks)"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Obtiene una foto serializable de todas las métricas"""
+        def series_list(series: Dict[Tuple, Any], render) -> List[Dict[str, Any]]:
+            return [
+                {"labels": dict(key), "value": render(value)}
+                for key, value in series.items()
+            ]
+
+        with self._lock:
+            return {
+                "counters": {
+                    name: series_list(series, lambda v: v)
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: series_list(series, lambda h: h.to_dict())
+                    for name, series in self._histograms.items()
+                },
+                "started_at": self.started_at.isoformat(),
+                "timestamp": datetime.now().isoformat()
+            }
+
+# Instancia global de métricas
+metrics = MetricsRegistry()
@@ -2,15 +2,30 @@
 Sistema Multi-Agente para el restaurante
 Define agentes especializados y el orquestador que los coordina
 """
-import os
-import google.generativeai as genai
-from typing import Dict, Any, List, Optional
-from agent_runner import AgentRunner, MultiAgentRunner, AgentType
+import asyncio
+import json
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from agent_runner import AgentRunner, MultiAgentRunner, AgentType, SpeculationAborted
 from mcp_tools import TOOLS_DEFINITIONS
+from config import get_settings
+from metrics import metrics
+from tracing import tracer
+from progress import emit_progress
+from intents import INTENT_KEYWORDS, NAVIGATION_REPLIES, classify_intent, match_navigation
+from load_shedding import load_shedder
+from session_state import session_store
+from idempotency import idempotency_scope
+from fair_scheduler import SessionQueueFull, fair_scheduler
+from prompt_compiler import PROMPT_VARIANTS, compile_prompt
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Patrones por turno, compilados una sola vez
+NAVIGATION_PATTERN = re.compile(r'\[NAVEGAR:([^\]]+)\]')
+
 # Configuración de modelos
 GENERATION_CONFIG = {
     "temperature": 0.7,
@@ -19,6 +34,57 @@ GENERATION_CONFIG = {
     "max_output_tokens": 2048,
 }
 
+# Especialistas entre los que elige el orquestador
+ROUTING_AGENTS = ("reservas_agent", "menus_agent", "info_agent")
+
+# Salida estructurada del orquestador: Gemini genera directamente un JSON con este esquema
+ROUTING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "agents": {"type": "array", "items": {"type": "string", "format": "enum", "enum": list(ROUTING_AGENTS)}},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["agents", "reasoning"],
+}
+
+class RoutingParseError(ValueError):
+    """La respuesta del orquestador no cumple el esquema de routing"""
+
+    def __init__(self, reason: str, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+
+def parse_routing_decision(text: str) -> Tuple[List[str], str]:
+    """
+    Parser estricto de la decisión del orquestador: el texto completo debe ser el JSON
+    del esquema (solo se toleran las vallas ```json), sin buscar objetos dentro de prosa
+
+    Raises:
+        RoutingParseError: con reason = empty | invalid_json | not_object | missing_agents | unknown_agent
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    if not text:
+        raise RoutingParseError("empty", "Respuesta vacía del orquestador")
+    try:
+        decision = json.loads(text)
+    except json.JSONDecodeError as e:
+        # También cubre las respuestas cortadas por max_output_tokens
+        raise RoutingParseError("invalid_json", f"JSON no válido: {e}")
+    if not isinstance(decision, dict):
+        raise RoutingParseError("not_object", "La decisión no es un objeto JSON")
+
+    agents = decision.get("agents")
+    if not isinstance(agents, list) or not agents:
+        raise RoutingParseError("missing_agents", "La decisión no incluye agentes")
+    unknown = [agent for agent in agents if agent not in ROUTING_AGENTS]
+    if unknown:
+        raise RoutingParseError("unknown_agent", f"Agentes desconocidos: {unknown}")
+
+    reasoning = decision.get("reasoning")
+    return list(dict.fromkeys(agents)), reasoning if isinstance(reasoning, str) else ""
+
 SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
     {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
@@ -170,13 +236,8 @@ Analizar cada consulta del usuario y determinar qué agente(s) debe(n) responder
 - Puedes invocar múltiples agentes si la consulta requiere información de varios
 
 **RESPUESTA**:
-Debes responder SIEMPRE en formato JSON con esta estructura:
-```json
-{
-  "agents": ["agent_id1", "agent_id2"],
-  "reasoning": "Breve explicación de por qué elegiste estos agentes"
-}
-```
+Responde SOLO con un objeto JSON (sin texto adicional) con esta estructura:
+{"agents": ["agent_id1", "agent_id2"], "reasoning": "Breve explicación (una frase) de por qué elegiste estos agentes"}
 
 **EJEMPLOS**:
 Usuario: "Quiero hacer una reserva para mañana"
@@ -194,132 +255,301 @@ Usuario: "Hola"
 Sé preciso en tu análisis y routing de consultas.
 """
 
+FUSED_AGENT_PROMPT = """Eres el **Asistente Virtual** del restaurante. Atiendes tú solo todas las consultas:
+reservas, menús, información general y navegación por la aplicación.
+
+**FECHA Y HORA ACTUAL DEL SISTEMA**: {current_datetime}
+
+**RESERVAS** (crear_reserva, modificar_fecha_reserva, cancelar_reserva, consultar_reserva):
+- Antes de crear una reserva DEBES tener: nombre completo, teléfono (9-15 dígitos), email válido,
+  fecha y hora (YYYY-MM-DDTHH:mm) y número de personas (1-20). Pregunta amablemente lo que falte
+- Horario del restaurante: 9:00 AM - 11:00 PM. La fecha debe estar en el futuro
+- Fechas relativas desde la fecha actual: "el 24" → {current_year}-{current_month}-24,
+  "el 24 de diciembre" → {current_year}-12-24, "mañana", "este viernes"...
+- Al crear una reserva se devuelve un token único (también por email): explica que deben guardarlo
+- Modificar, cancelar y consultar requieren el token. Confirma los datos antes de ejecutar acciones
+
+**MENÚS** (get_menu_mas_valorado, listar_menus_disponibles):
+- Describe los menús de manera apetitosa, menciona valoraciones y ayuda a elegir
+
+**INFORMACIÓN GENERAL**:
+- Horario: 9:00 AM - 11:00 PM todos los días
+- Ambiente acogedor y familiar, cocina variada con menús valorados por clientes
+- Servicios: reservas en línea, consulta de menús, atención personalizada
+
+**⚠️ NAVEGACIÓN**:
+Si el usuario pide ir a una sección ("llévame", "ir a", "quiero ver", "navegar a", "página de"),
+responde brevemente e incluye al final el marcador EXACTO correspondiente, sin llamar a ninguna herramienta:
+- [NAVEGAR:consultar_reserva] - Consultar una reserva existente
+- [NAVEGAR:reserva] - Crear una nueva reserva
+- [NAVEGAR:menu] - Ver los menús disponibles
+- [NAVEGAR:valorar] - Dejar una valoración
+- [NAVEGAR:home] - Volver al inicio
+
+Ejemplo: "Llévame a ver mis reservas" → ¡Por supuesto! Te llevo a la consulta de reservas. [NAVEGAR:consultar_reserva]
+
+Sé cálido, claro y hospitalario, representa bien la imagen del restaurante.
+"""
+
+# ============= PROMPTS COMPACTOS (PROMPT_VARIANT=compact) =============
+# Mismas reglas en menos tokens: la fecha aparece una sola vez y al final (el prefijo del
+# prompt no cambia entre días) y no se repite la lista de tools, que ya llega en sus declaraciones
+
+RESERVAS_AGENT_PROMPT_COMPACT = """Eres el **Agente de Reservas** del restaurante: creas, modificas, cancelas y consultas reservas.
+
+**CREAR RESERVAS**: antes de llamar a crear_reserva necesitas nombre completo, teléfono (9-15 dígitos),
+email válido, fecha y hora (YYYY-MM-DDTHH:mm, entre 9:00 AM y 11:00 PM) y número de personas (1-20).
+Pregunta amablemente lo que falte.
+
+**FECHAS**: interprétalas desde la fecha actual (al final del prompt); deben quedar en el futuro:
+- "el 24" → {current_year}-{current_month}-24; "el 24 de diciembre" → {current_year}-12-24
+- "mañana a las 8 PM" → día siguiente T20:00; "este sábado a las 9 PM" → próximo sábado T21:00
+
+**TOKENS**: crear_reserva devuelve un token único (también llega por email): pide que lo guarden.
+Modificar, cancelar y consultar una reserva requieren el token.
+
+Sé amable, confirma los datos antes de ejecutar acciones y maneja los errores con empatía.
+
+**FECHA Y HORA ACTUAL**: {current_datetime}
+"""
+
+MENUS_AGENT_PROMPT_COMPACT = """Eres el **Agente de Menús** del restaurante: informas de los menús disponibles, sus platos,
+precios y disponibilidad, y recomiendas el más valorado.
+
+Describe los menús de forma apetitosa, menciona las valoraciones cuando ayuden a elegir y, si preguntan
+por reservas, indica que otro agente puede ayudarles. Sé entusiasta y conocedor de la oferta gastronómica.
+"""
+
+INFO_AGENT_PROMPT_COMPACT = """Eres el **Agente de Información General** del restaurante: horarios, ubicación, ambiente,
+servicios, políticas, preguntas frecuentes y navegación por la aplicación.
+
+**RESTAURANTE**: abierto todos los días de 9:00 AM a 11:00 PM; ambiente acogedor y familiar; cocina
+variada con menús valorados por los clientes; reservas en línea, consulta de menús y atención personalizada.
+
+**⚠️ NAVEGACIÓN**: si el usuario pide ir a una sección ("llévame", "ir a", "quiero ver", "navegar a",
+"página de"...), responde en una frase y termina SIEMPRE con el marcador EXACTO:
+- [NAVEGAR:consultar_reserva] - Consultar una reserva existente ("mis reservas")
+- [NAVEGAR:reserva] - Hacer una reserva nueva
+- [NAVEGAR:menu] - Ver los menús o la carta
+- [NAVEGAR:valorar] - Dejar una valoración
+- [NAVEGAR:home] - Volver al inicio
+
+Ejemplo: "Llévame a ver mis reservas" → ¡Por supuesto! Te llevo a la consulta de reservas. [NAVEGAR:consultar_reserva]
+
+Sé cálido y claro; si preguntan por reservas o menús concretos, sugiere que otro agente puede ayudarles mejor.
+"""
+
+ORCHESTRATOR_PROMPT_COMPACT = """Eres el **Orquestador** del restaurante: decide qué agente(s) responden a cada consulta.
+- reservas_agent: crear, modificar, cancelar o consultar reservas ("reserva", "reservar", "cancelar", "token")
+- menus_agent: menús, platos, comida, precios y recomendaciones
+- info_agent: horarios, ubicación, información general, saludos, consultas ambiguas y **NAVEGACIÓN**
+  ("llévame", "ir a", "navegar", "quiero ver", "página de")
+Elige varios agentes si la consulta lo necesita.
+
+Responde SOLO con un objeto JSON: {"agents": ["agent_id"], "reasoning": "Una frase"}
+Ejemplo: "¿Qué menú recomiendan y cuál es el horario?" → {"agents": ["menus_agent", "info_agent"], "reasoning": "Menús y horario"}
+"""
+
+# ID del agente único en modo fusionado
+FUSED_AGENT_ID = "assistant"
+
+# Plantilla de cada agente por variante (el prompt fusionado ya es compacto)
+AGENT_PROMPTS = {
+    "reservas_agent": {"full": RESERVAS_AGENT_PROMPT, "compact": RESERVAS_AGENT_PROMPT_COMPACT},
+    "menus_agent": {"full": MENUS_AGENT_PROMPT, "compact": MENUS_AGENT_PROMPT_COMPACT},
+    "info_agent": {"full": INFO_AGENT_PROMPT, "compact": INFO_AGENT_PROMPT_COMPACT},
+    "orchestrator": {"full": ORCHESTRATOR_PROMPT, "compact": ORCHESTRATOR_PROMPT_COMPACT},
+    FUSED_AGENT_ID: {"full": FUSED_AGENT_PROMPT, "compact": FUSED_AGENT_PROMPT},
+}
+
+# Tools de cada agente
+AGENT_TOOL_NAMES = {
+    "reservas_agent": ("crear_reserva", "modificar_fecha_reserva", "cancelar_reserva", "consultar_reserva"),
+    "menus_agent": ("get_menu_mas_valorado", "listar_menus_disponibles"),
+    "info_agent": (),
+    "orchestrator": (),
+    FUSED_AGENT_ID: tuple(tool["name"] for tool in TOOLS_DEFINITIONS),
+}
+
+# Modos de ejecución del sistema
+EXECUTION_MODES = ("multi", "fused")
+
 # ============= FACTORY DE AGENTES =============
 
+def _genai():
+    """Importa el SDK de Gemini solo al construir modelos"""
+    import google.generativeai as genai
+    return genai
+
 class AgentFactory:
     """Factory para crear agentes especializados"""
     
     @staticmethod
-    def create_reservas_agent(agent_id: str = "reservas_agent") -> AgentRunner:
-        """Crea el agente de reservas con contexto de fecha actual"""
+    def _function_declarations(tool_defs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Declaraciones de función de Gemini (precompiladas en el registro de tools)"""
+        from tool_registry import get_tool_registry
+        
+        return get_tool_registry().declarations(tool["name"] for tool in tool_defs)
+    
+    @staticmethod
+    def _date_context() -> Dict[str, str]:
+        """Fecha actual para inyectar en los prompts"""
         from datetime import datetime
         
-        # Obtener fecha y hora actual del sistema
         now = datetime.now()
-        current_datetime = now.strftime("%Y-%m-%d %H:%M:%S")
-        current_year = now.strftime("%Y")
-        current_month = now.strftime("%m")
-        
-        # Inyectar fecha actual en el prompt
-        prompt_with_context = RESERVAS_AGENT_PROMPT.format(
-            current_datetime=current_datetime,
-            current_year=current_year,
-            current_month=current_month
-        )
-        
+        return {
+            "current_datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "current_year": now.strftime("%Y"),
+            "current_month": now.strftime("%m")
+        }
+    
+    @staticmethod
+    def _agent_tools(agent_id: str) -> List[Dict[str, Any]]:
+        """Definiciones de las tools del agente"""
+        names = AGENT_TOOL_NAMES[agent_id]
+        return [tool for tool in TOOLS_DEFINITIONS if tool["name"] in names]
+    
+    @staticmethod
+    def system_prompt(agent_id: str, variant: Optional[str] = None) -> str:
+        """Prompt de sistema compilado del agente (variante de PROMPT_VARIANT por defecto)"""
+        variant = variant or get_settings().prompt_variant
+        if variant not in PROMPT_VARIANTS:
+            raise ValueError(f"Variante de prompt no válida: {variant} (usa {', '.join(PROMPT_VARIANTS)})")
+        return compile_prompt(AGENT_PROMPTS[agent_id][variant], AgentFactory._date_context())
+    
+    @staticmethod
+    def create_reservas_agent(agent_id: str = "reservas_agent", variant: Optional[str] = None) -> AgentRunner:
+        """Crea el agente de reservas con contexto de fecha actual"""
         # Tools relacionadas con reservas
-        reservas_tools = [
-            tool for tool in TOOLS_DEFINITIONS
-            if tool['name'] in ['crear_reserva', 'modificar_fecha_reserva', 'cancelar_reserva', 'consultar_reserva']
-        ]
-        
-        tools_for_gemini = []
-        for tool_def in reservas_tools:
-            func_declaration = {
-                "name": tool_def["name"],
-                "description": tool_def["description"]
-            }
-            if tool_def.get("parameters"):
-                func_declaration["parameters"] = tool_def["parameters"]
-            tools_for_gemini.append(func_declaration)
+        reservas_tools = AgentFactory._agent_tools("reservas_agent")
         
-        model = genai.GenerativeModel(
+        tools_for_gemini = AgentFactory._function_declarations(reservas_tools)
+        
+        model = _genai().GenerativeModel(
             model_name="gemini-2.5-flash",
             generation_config=GENERATION_CONFIG,
             safety_settings=SAFETY_SETTINGS,
-            system_instruction=prompt_with_context,
+            # Prompt con la fecha actual inyectada
+            system_instruction=AgentFactory.system_prompt("reservas_agent", variant),
             tools=[{"function_declarations": tools_for_gemini}]
         )
         
         return AgentRunner(agent_id, AgentType.RESERVAS, model, reservas_tools)
     
     @staticmethod
-    def create_menus_agent(agent_id: str = "menus_agent") -> AgentRunner:
+    def create_menus_agent(agent_id: str = "menus_agent", variant: Optional[str] = None) -> AgentRunner:
         """Crea el agente de menús"""
         # Tools relacionadas con menús
-        menus_tools = [
-            tool for tool in TOOLS_DEFINITIONS
-            if tool['name'] in ['get_menu_mas_valorado', 'listar_menus_disponibles']
-        ]
-        
-        tools_for_gemini = []
-        for tool_def in menus_tools:
-            func_declaration = {
-                "name": tool_def["name"],
-                "description": tool_def["description"]
-            }
-            if tool_def.get("parameters"):
-                func_declaration["parameters"] = tool_def["parameters"]
-            tools_for_gemini.append(func_declaration)
+        menus_tools = AgentFactory._agent_tools("menus_agent")
         
-        model = genai.GenerativeModel(
+        tools_for_gemini = AgentFactory._function_declarations(menus_tools)
+        
+        model = _genai().GenerativeModel(
             model_name="gemini-2.5-flash",
             generation_config=GENERATION_CONFIG,
             safety_settings=SAFETY_SETTINGS,
-            system_instruction=MENUS_AGENT_PROMPT,
+            system_instruction=AgentFactory.system_prompt("menus_agent", variant),
             tools=[{"function_declarations": tools_for_gemini}]
         )
         
         return AgentRunner(agent_id, AgentType.MENUS, model, menus_tools)
     
     @staticmethod
-    def create_info_agent(agent_id: str = "info_agent") -> AgentRunner:
+    def create_info_agent(agent_id: str = "info_agent", variant: Optional[str] = None) -> AgentRunner:
         """Crea el agente de información general"""
-        model = genai.GenerativeModel(
+        model = _genai().GenerativeModel(
             model_name="gemini-2.5-flash",
             generation_config=GENERATION_CONFIG,
             safety_settings=SAFETY_SETTINGS,
-            system_instruction=INFO_AGENT_PROMPT,
+            system_instruction=AgentFactory.system_prompt("info_agent", variant),
             tools=[]  # No necesita tools, solo información
         )
         
         return AgentRunner(agent_id, AgentType.INFO, model, [])
     
     @staticmethod
-    def create_orchestrator(agent_id: str = "orchestrator") -> AgentRunner:
+    def create_orchestrator(agent_id: str = "orchestrator", variant: Optional[str] = None) -> AgentRunner:
         """Crea el agente orquestador"""
-        model = genai.GenerativeModel(
+        model = _genai().GenerativeModel(
             model_name="gemini-2.5-flash",
             generation_config={
                 "temperature": 0.3,  # Más determinístico para routing
                 "top_p": 0.95,
                 "top_k": 40,
-                "max_output_tokens": 512,
+                # La decisión es un JSON corto: un límite bajo acota latencia y coste
+                "max_output_tokens": get_settings().routing_max_output_tokens,
+                "response_mime_type": "application/json",
+                "response_schema": ROUTING_SCHEMA,
             },
             safety_settings=SAFETY_SETTINGS,
-            system_instruction=ORCHESTRATOR_PROMPT,
+            system_instruction=AgentFactory.system_prompt("orchestrator", variant),
             tools=[]
         )
         
         return AgentRunner(agent_id, AgentType.ORCHESTRATOR, model, [])
+    
+    @staticmethod
+    def create_fused_agent(agent_id: str = FUSED_AGENT_ID, variant: Optional[str] = None) -> AgentRunner:
+        """Crea el agente único del modo fusionado (todas las tools e instrucciones combinadas)"""
+        model = _genai().GenerativeModel(
+            model_name="gemini-2.5-flash",
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
+            system_instruction=AgentFactory.system_prompt(FUSED_AGENT_ID, variant),
+            tools=[{"function_declarations": AgentFactory._function_declarations(TOOLS_DEFINITIONS)}]
+        )
+        
+        return AgentRunner(agent_id, AgentType.FUSED, model, list(TOOLS_DEFINITIONS))
 
 # ============= SISTEMA MULTI-AGENTE =============
 
 class RestauranteMultiAgentSystem:
     """Sistema completo multi-agente para el restaurante"""
     
-    def __init__(self):
-        self.runner = MultiAgentRunner()
-        self._initialize_agents()
-        logger.info("🎯 Sistema Multi-Agente del Restaurante inicializado")
+    def __init__(
+        self,
+        speculative: Optional[bool] = None,
+        mode: Optional[str] = None,
+        prompt_variant: Optional[str] = None,
+        navigation_fast_path: Optional[bool] = None,
+        runner: Optional[MultiAgentRunner] = None
+    ):
+        """
+        Args:
+            runner: Runner con los agentes ya registrados (tests y benchmarks); con None se
+                construyen los modelos de Gemini
+        """
+        settings = get_settings()
+        # "multi": orquestador + especialista; "fused": un único agente con todas las tools
+        self.mode = mode or settings.execution_mode
+        if self.mode not in EXECUTION_MODES:
+            raise ValueError(f"Modo de ejecución no válido: {self.mode} (usa {', '.join(EXECUTION_MODES)})")
+        # Ejecución especulativa del especialista en paralelo con el orquestador
+        self.speculative = settings.speculative_routing if speculative is None else speculative
+        self.speculative = self.speculative and self.mode == "multi"
+        # Navegación explícita respondida con el matcher local, sin llamar al LLM
+        self.navigation_fast_path = settings.navigation_fast_path if navigation_fast_path is None else navigation_fast_path
+        # Variante de los prompts de sistema ("full" o "compact", ver prompt_compiler.py)
+        self.prompt_variant = prompt_variant or settings.prompt_variant
+        if runner is None:
+            self.runner = MultiAgentRunner()
+            self._initialize_agents()
+        else:
+            self.runner = runner
+        logger.info("🎯 Sistema Multi-Agente del Restaurante inicializado (modo %s, prompts %s)", self.mode, self.prompt_variant)
     
     def _initialize_agents(self):
         """Inicializa todos los agentes del sistema"""
+        if self.mode == "fused":
+            self.runner.register_agent(AgentFactory.create_fused_agent(variant=self.prompt_variant))
+            logger.info("✅ Agente único (modo fusionado) inicializado y registrado")
+            return
+        
         # Crear agentes especializados
-        reservas_agent = AgentFactory.create_reservas_agent()
-        menus_agent = AgentFactory.create_menus_agent()
-        info_agent = AgentFactory.create_info_agent()
-        orchestrator = AgentFactory.create_orchestrator()
+        reservas_agent = AgentFactory.create_reservas_agent(variant=self.prompt_variant)
+        menus_agent = AgentFactory.create_menus_agent(variant=self.prompt_variant)
+        info_agent = AgentFactory.create_info_agent(variant=self.prompt_variant)
+        orchestrator = AgentFactory.create_orchestrator(variant=self.prompt_variant)
         
         # Registrar agentes
         self.runner.register_agent(reservas_agent)
@@ -332,7 +562,8 @@ class RestauranteMultiAgentSystem:
     async def process_message(
         self,
         user_message: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Procesa un mensaje del usuario usando el sistema multi-agente
@@ -340,68 +571,128 @@ class RestauranteMultiAgentSystem:
         Args:
             user_message: Mensaje del usuario
             session_id: ID de sesión opcional
+            history: Historial reconstruido desde la petición (modo sin estado, ver conversation.py);
+                con None se usa el historial guardado en cada agente
             
         Returns:
             Respuesta coordinada del sistema
         """
+        # Las escrituras del turno se deduplican por sesión (salvo que el cliente envíe su propia clave)
+        with tracer.span("process_message", session_id=session_id, stateless=history is not None) as span, \
+                idempotency_scope(session_id, override=False):
+            # Navegación clara: respuesta local inmediata; bajo sobrecarga, lo que no es de reservas tampoco usa el LLM
+            result = self._navigation_fast_path(user_message, session_id)
+            if result is None:
+                result = await load_shedder.try_degraded(user_message, session_id)
+            if result is None:
+                # El detector de sobrecarga cuenta también los turnos que esperan plaza (y su espera en el p95)
+                with load_shedder.track(ignore=(SessionQueueFull,)) as outcome:
+                    # Plaza del LLM repartida con justicia entre clientes y sesiones (un turno en curso por sesión)
+                    async with fair_scheduler.slot(session_id) as wait_ms:
+                        span.set("queue_wait_ms", round(wait_ms, 1))
+                        result = await self._process_message(user_message, session_id, history)
+                        outcome["success"] = result.get("success")
+                result.setdefault("served_mode", load_shedder.served_mode)
+                metrics.inc("chat_served", mode=result["served_mode"])
+            span.set("agents_used", result.get("agents_used"))
+            span.set("served_mode", result.get("served_mode"))
+            return result
+    
+    def _navigation_fast_path(self, user_message: str, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta de plantilla si el mensaje es una navegación con confianza suficiente
+
+        Returns:
+            Resultado con el mismo formato que process_message, o None para usar los agentes
+        """
+        if not self.navigation_fast_path:
+            return None
+        target, confidence = match_navigation(user_message)
+        if target is None:
+            return None
+        if confidence < get_settings().navigation_min_confidence:
+            metrics.inc("navigation_fast_path", target=target, outcome="fallback")
+            return None
+
+        metrics.inc("navigation_fast_path", target=target, outcome="served")
+        metrics.inc("chat_served", mode="fast_path")
+        logger.info("🧭 Navegación local a %s (confianza %.2f)", target, confidence, extra={"category": "routing"})
+        return {
+            "success": True,
+            "response": NAVIGATION_REPLIES[target],
+            "navigation_action": target,
+            "agents_used": [],
+            "routing_reasoning": f"Navegación local (confianza {confidence:.2f})",
+            "tools_used": [],
+            "usage": {"llm_calls": 0, "prompt_tokens": 0, "output_tokens": 0},
+            "served_mode": "fast_path",
+            "session_id": session_id
+        }
+    
+    async def _process_message(
+        self,
+        user_message: str,
+        session_id: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Cuerpo de process_message (dentro del span de la petición)"""
+        if self.mode == "fused":
+            return await self._process_fused(user_message, session_id, history)
+        
+        # 0. Arrancar el especialista más probable mientras decide el orquestador
+        # (la especulación usa el historial guardado de la sesión: no aplica al modo sin estado)
+        speculation = None
+        if self.speculative and history is None:
+            speculation = self._start_speculation(user_message, session_id)
+        
         try:
             # 1. Usar el orquestador para determinar qué agente(s) usar
-            orchestrator_result = await self.runner.execute_agent(
-                "orchestrator",
-                f"Analiza esta consulta y determina qué agente(s) deben responder:\n\n{user_message}"
-            )
+            emit_progress("routing")
+            with tracer.span("routing"):
+                orchestrator_result = await self.runner.execute_agent(
+                    "orchestrator",
+                    self._routing_prompt(user_message, history),
+                    history=[] if history is not None else None,
+                    session_id=session_id
+                )
+            routing_done = time.perf_counter()
             
             if not orchestrator_result.get("success"):
-                # Fallback: usar info_agent si el orquestador falla
-                logger.warning("⚠️ Orquestador falló, usando info_agent como fallback")
-                selected_agents = ["info_agent"]
-                reasoning = "Fallback a agente de información general"
+                logger.warning("⚠️ Orquestador falló, usando routing local como fallback")
+                selected_agents, reasoning = self._fallback_routing(user_message, "orchestrator_error")
             else:
-                # Parsear respuesta del orquestador
-                import json
-                import re
-                
-                orchestrator_response = orchestrator_result.get("response", "")
-                
-                # Extraer JSON de la respuesta
-                json_match = re.search(r'\{[^}]+\}', orchestrator_response)
-                if json_match:
-                    routing_decision = json.loads(json_match.group())
-                    selected_agents = routing_decision.get("agents", ["info_agent"])
-                    reasoning = routing_decision.get("reasoning", "")
-                else:
-                    selected_agents = ["info_agent"]
-                    reasoning = "No se pudo parsear decisión del orquestador"
-                
-                logger.info(f"🎯 Orquestador eligió: {selected_agents} - {reasoning}")
+                selected_agents, reasoning = self._parse_routing(orchestrator_result.get("response", ""), user_message)
+                logger.info("🎯 Orquestador eligió: %s - %s", selected_agents, reasoning, extra={"category": "routing"})
+            
+            if history is None:
+                self._remember_agents(session_id, selected_agents)
+            emit_progress("agents_selected", agents=selected_agents)
             
             # 2. Ejecutar los agentes seleccionados
             if len(selected_agents) == 1:
-                # Ejecutar un solo agente
-                result = await self.runner.execute_agent(
-                    selected_agents[0],
-                    user_message
-                )
+                # Reutilizar el turno especulativo si el routing coincide
+                result = None
+                if speculation:
+                    result = await self._resolve_speculation(speculation, selected_agents[0], routing_done)
+                    speculation = None
                 
-                # Extraer acción de navegación si existe
-                response_text = result.get("response", "")
-                navigation_action = self._extract_navigation_action(response_text)
-                
-                logger.info(f"📝 Respuesta del agente: {response_text[:100]}...")
-                logger.info(f"🧭 Acción de navegación detectada: {navigation_action}")
+                # Ejecutar un solo agente
+                if result is None:
+                    result = await self.runner.execute_agent(
+                        selected_agents[0],
+                        user_message,
+                        history=history,
+                        session_id=session_id
+                    )
                 
-                return {
-                    "success": True,
-                    "response": response_text.replace(f"[NAVEGAR:{navigation_action}]", "").strip() if navigation_action else response_text,
-                    "navigation_action": navigation_action,
-                    "agents_used": selected_agents,
-                    "routing_reasoning": reasoning,
-                    "session_id": session_id
-                }
+                return self._build_response(
+                    result.get("response", ""), selected_agents, reasoning, session_id,
+                    [orchestrator_result, result]
+                )
             else:
                 # Ejecutar múltiples agentes en paralelo
                 tasks = [
-                    {"agent_id": agent_id, "message": user_message}
+                    {"agent_id": agent_id, "message": user_message, "history": history, "session_id": session_id}
                     for agent_id in selected_agents
                 ]
                 
@@ -409,16 +700,11 @@ class RestauranteMultiAgentSystem:
                 
                 # Combinar respuestas
                 combined_response = self._combine_responses(results, selected_agents)
-                navigation_action = self._extract_navigation_action(combined_response)
                 
-                return {
-                    "success": True,
-                    "response": combined_response.replace(f"[NAVEGAR:{navigation_action}]", "").strip() if navigation_action else combined_response,
-                    "navigation_action": navigation_action,
-                    "agents_used": selected_agents,
-                    "routing_reasoning": reasoning,
-                    "session_id": session_id
-                }
+                return self._build_response(
+                    combined_response, selected_agents, reasoning, session_id,
+                    [orchestrator_result, *results]
+                )
         
         except Exception as e:
             logger.error(f"❌ Error en sistema multi-agente: {str(e)}")
@@ -427,6 +713,193 @@ class RestauranteMultiAgentSystem:
                 "error": str(e),
                 "session_id": session_id
             }
+        
+        finally:
+            # Routing distinto (o error): el turno especulativo se descarta sin tocar el historial
+            if speculation:
+                self._discard_speculation(speculation, "miss")
+    
+    async def _process_fused(
+        self,
+        user_message: str,
+        session_id: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Modo fusionado: un único agente responde en una sola llamada (más las de sus tools)"""
+        emit_progress("agents_selected", agents=[FUSED_AGENT_ID])
+        result = await self.runner.execute_agent(FUSED_AGENT_ID, user_message, history=history, session_id=session_id)
+        
+        if not result.get("success"):
+            logger.error(f"❌ Error en agente fusionado: {result.get('error')}")
+            return {
+                "success": False,
+                "error": result.get("error", "Error en el agente fusionado"),
+                "session_id": session_id
+            }
+        
+        return self._build_response(
+            result.get("response", ""), [FUSED_AGENT_ID], "Modo fusionado", session_id, [result]
+        )
+    
+    def _routing_prompt(self, user_message: str, history: Optional[List[Dict[str, Any]]]) -> str:
+        """
+        Mensaje para el orquestador
+        En modo sin estado el orquestador no tiene historial propio: se le pasa
+        el mensaje anterior del usuario para resolver continuaciones ("¿y el horario?")
+        """
+        prompt = f"Analiza esta consulta y determina qué agente(s) deben responder:\n\n{user_message}"
+        if history:
+            previous = next((item["parts"][0] for item in reversed(history) if item["role"] == "user"), None)
+            if previous:
+                prompt += f"\n\n(Mensaje anterior del usuario: {previous[:300]})"
+        return prompt
+    
+    def _build_response(
+        self,
+        response_text: str,
+        agents_used: List[str],
+        reasoning: str,
+        session_id: Optional[str],
+        agent_results: List[Any]
+    ) -> Dict[str, Any]:
+        """Extrae la navegación y construye la respuesta común a ambos modos"""
+        navigation_action = self._extract_navigation_action(response_text)
+        
+        logger.debug("📝 Respuesta del agente: %.100s...", response_text, extra={"category": "response"})
+        logger.debug("🧭 Acción de navegación detectada: %s", navigation_action, extra={"category": "response"})
+        
+        # Uso agregado de todas las llamadas del turno (orquestador incluido)
+        usage = {"llm_calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+        tools_used = []
+        for result in agent_results:
+            if isinstance(result, dict):
+                for key, value in (result.get("usage") or {}).items():
+                    usage[key] = usage.get(key, 0) + value
+                tools_used.extend(result.get("tools_used") or [])
+        
+        return {
+            "success": True,
+            "response": response_text.replace(f"[NAVEGAR:{navigation_action}]", "").strip() if navigation_action else response_text,
+            "navigation_action": navigation_action,
+            "agents_used": agents_used,
+            "routing_reasoning": reasoning,
+            "tools_used": tools_used,
+            "usage": usage,
+            "mode": self.mode,
+            "session_id": session_id
+        }
+    
+    def _guess_specialist(self, user_message: str, session_id: Optional[str]) -> Optional[str]:
+        """Adivina el especialista con reglas locales o el último agente de la sesión"""
+        agent_id, _ = classify_intent(user_message)
+        if agent_id:
+            return agent_id
+        
+        last_agents = session_store.last_agents(session_id) if session_id else None
+        if last_agents and len(last_agents) == 1:
+            return last_agents[0]
+        return None
+    
+    def _remember_agents(self, session_id: Optional[str], agents: List[str]):
+        """Guarda el último routing de la sesión"""
+        if session_id:
+            session_store.remember_agents(session_id, agents)
+    
+    def _start_speculation(self, user_message: str, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Lanza el turno especulativo del especialista más probable"""
+        agent_id = self._guess_specialist(user_message, session_id)
+        agent = self.runner.get_agent(agent_id) if agent_id else None
+        if not agent:
+            return None
+        
+        speculation = {"agent_id": agent_id, "started": time.perf_counter(), "ended": None}
+        
+        async def run():
+            try:
+                return await agent.execute_speculative(user_message, session_id)
+            finally:
+                speculation["ended"] = time.perf_counter()
+        
+        task = asyncio.create_task(run())
+        # Evita avisos de "exception was never retrieved" si el turno se descarta
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        speculation["task"] = task
+        
+        metrics.inc("speculation_started", agent=agent_id)
+        return speculation
+    
+    async def _resolve_speculation(
+        self,
+        speculation: Dict[str, Any],
+        routed_agent: str,
+        routing_done: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Confirma el turno especulativo si el routing coincide
+        
+        Returns:
+            Resultado del agente, o None si hay que ejecutarlo por el camino normal
+        """
+        agent_id = speculation["agent_id"]
+        if agent_id != routed_agent:
+            self._discard_speculation(speculation, "miss", routed=routed_agent)
+            return None
+        
+        try:
+            turn = await speculation["task"]
+        except SpeculationAborted:
+            metrics.inc("speculation_aborted", agent=agent_id, reason="write_tool")
+            return None
+        except Exception as e:
+            logger.warning("⚠️ Turno especulativo de %s falló: %s", agent_id, e, extra={"category": "routing"})
+            metrics.inc("speculation_aborted", agent=agent_id, reason="error")
+            return None
+        
+        # Tiempo ahorrado: lo que el especialista avanzó mientras decidía el orquestador
+        saved_ms = (min(routing_done, speculation["ended"]) - speculation["started"]) * 1000
+        metrics.inc("speculation_hit", agent=agent_id)
+        metrics.inc("speculation_saved_ms_total", saved_ms, agent=agent_id)
+        metrics.observe("speculation_saved_ms", saved_ms, agent=agent_id)
+        return turn.commit()
+    
+    def _discard_speculation(self, speculation: Dict[str, Any], reason: str, routed: Optional[str] = None):
+        """Cancela un turno especulativo (se ejecutó sobre una copia del chat, no hay nada que deshacer)"""
+        speculation["task"].cancel()
+        metrics.inc("speculation_miss", agent=speculation["agent_id"], routed=routed or "none")
+        logger.debug("🎲 Especulación descartada (%s): %s → %s", reason, speculation["agent_id"], routed,
+                     extra={"category": "routing"})
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """Tasa de acierto y latencia ahorrada por la ejecución especulativa"""
+        stats = {}
+        for agent_id in INTENT_KEYWORDS:
+            started = metrics.get_counter("speculation_started", agent=agent_id)
+            hits = metrics.get_counter("speculation_hit", agent=agent_id)
+            stats[agent_id] = {
+                "started": started,
+                "hits": hits,
+                "hit_rate": round(hits / started, 3) if started else None,
+                "saved_ms_total": round(metrics.get_counter("speculation_saved_ms_total", agent=agent_id), 1)
+            }
+        return {"enabled": self.speculative, "agents": stats}
+    
+    def _parse_routing(self, orchestrator_response: str, user_message: str = "") -> Tuple[List[str], str]:
+        """Extrae (agentes, razonamiento) del JSON del orquestador; si no es válido usa el routing local"""
+        try:
+            decision = parse_routing_decision(orchestrator_response)
+        except RoutingParseError as e:
+            metrics.inc("routing_parse", outcome="failed", reason=e.reason)
+            logger.warning("⚠️ Decisión del orquestador no válida (%s): %s", e.reason, e,
+                           extra={"category": "routing"})
+            return self._fallback_routing(user_message, e.reason)
+        metrics.inc("routing_parse", outcome="ok")
+        return decision
+    
+    def _fallback_routing(self, user_message: str, reason: str) -> Tuple[List[str], str]:
+        """Routing local (palabras clave) cuando el orquestador no da una decisión válida"""
+        agent = classify_intent(user_message)[0] or "info_agent"
+        metrics.inc("routing_fallback", reason=reason, agent=agent)
+        return [agent], f"Fallback local ({reason})"
     
     def _combine_responses(
         self,
@@ -452,17 +925,24 @@ class RestauranteMultiAgentSystem:
         Extrae la acción de navegación de la respuesta del agente
         Busca patrones como [NAVEGAR:ver_reserva]
         """
-        import re
-        match = re.search(r'\[NAVEGAR:([^\]]+)\]', response)
+        match = NAVIGATION_PATTERN.search(response)
         if match:
             return match.group(1)
         return None
     
     def reset_session(self, session_id: Optional[str] = None):
-        """Reinicia una sesión (todos los agentes)"""
-        self.runner.reset_all()
+        """Reinicia una sesión (su historial en todos los agentes)"""
+        session_store.reset(session_id)
         logger.info(f"🔄 Sesión reiniciada: {session_id}")
     
     def get_system_status(self) -> Dict[str, Any]:
         """Obtiene el estado del sistema"""
-        return self.runner.get_system_status()
+        status = self.runner.get_system_status()
+        status["mode"] = self.mode
+        status["load_shedding"] = {"enabled": load_shedder.enabled, **load_shedder.detector.status()}
+        status["speculation"] = self.get_speculation_stats()
+        status["sessions"] = session_store.status()
+        status["scheduler"] = fair_scheduler.status()
+        from tool_registry import get_tool_registry
+        status["tools"] = get_tool_registry().status()
+        return status
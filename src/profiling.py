@@ -0,0 +1,166 @@
+"""
+Profiler por petición bajo demanda
+Ejecuta un turno de /chat con cProfile cuando lo pide la cabecera X-Profile o por muestreo,
+y guarda el perfil (.prof) junto con sus metadatos (.json) en un directorio local.
+Con PROFILING_ENABLED=false el endpoint no hace ninguna comprobación adicional y
+/profiles no expone nada (los perfiles incluyen IDs de sesión).
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Cabecera que fuerza el profiling de una petición
+PROFILE_HEADER = "x-profile"
+
+# Número de funciones incluidas en el resumen de cada perfil
+TOP_FUNCTIONS = 15
+
+_annotations: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("profile_annotations", default=None)
+
+class RequestProfiler:
+    """
+    Gestiona el profiling de peticiones individuales
+    cProfile mide todo el hilo, así que solo se perfila una petición a la vez
+    (las peticiones concurrentes en el mismo event loop aparecen también en el perfil)
+    """
+
+    def __init__(self, enabled: bool, sample_rate: float, directory: str, max_files: int):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_files = max_files
+        self._active = threading.Lock()
+
+    def should_profile(self, header_value: Optional[str]) -> bool:
+        """Decide si perfilar la petición (cabecera explícita o muestreo)"""
+        if header_value is not None:
+            return header_value.strip().lower() in ("1", "true", "yes")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def annotate(self, **values):
+        """Añade metadatos (sesión, agentes...) al perfil en curso, si lo hay"""
+        annotations = _annotations.get()
+        if annotations is not None:
+            annotations.update(values)
+
+    async def run(self, coro, **metadata) -> Any:
+        """
+        Ejecuta la corrutina bajo cProfile y guarda el resultado
+
+        Si ya hay otro perfil activo, la petición se ejecuta sin perfilar.
+        """
+        if not self._active.acquire(blocking=False):
+            return await coro
+
+        annotations = dict(metadata)
+        token = _annotations.set(annotations)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                return await coro
+            finally:
+                profile.disable()
+        finally:
+            annotations["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            _annotations.reset(token)
+            self._active.release()
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self._save, profile, annotations)
+
+    def _save(self, profile: cProfile.Profile, annotations: Dict[str, Any]):
+        """Guarda el perfil desde el executor: nadie espera el resultado, así que los errores se registran aquí"""
+        try:
+            self._write(profile, annotations)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo guardar el perfil en %s: %s", self.directory, e, exc_info=True)
+
+    def _write(self, profile: cProfile.Profile, annotations: Dict[str, Any]):
+        """Escribe el .prof y un .json con metadatos y las funciones más costosas"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        created_at = datetime.now()
+        parts = [
+            created_at.strftime("%Y%m%d-%H%M%S-%f"),
+            annotations.get("session_id") or "anon",
+            "+".join(annotations.get("agents") or []) or "none"
+        ]
+        name = re.sub(r"[^A-Za-z0-9_.+-]", "_", "_".join(str(p) for p in parts))
+
+        profile.dump_stats(os.path.join(self.directory, f"{name}.prof"))
+
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        with open(os.path.join(self.directory, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "profile_id": name,
+                "created_at": created_at.isoformat(),
+                **annotations,
+                "top_functions": stream.getvalue()
+            }, f, ensure_ascii=False, indent=2, default=str)
+
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        """Elimina los perfiles más antiguos por encima de max_files"""
+        profiles = sorted(f[:-5] for f in os.listdir(self.directory) if f.endswith(".json"))
+        excess = len(profiles) - self.max_files
+        for name in profiles[:max(excess, 0)]:
+            for ext in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, name + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Metadatos de los perfiles más recientes (sin el resumen de funciones)"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        names = sorted((f for f in os.listdir(self.directory) if f.endswith(".json")), reverse=True)
+        profiles = []
+        for filename in names[:limit]:
+            with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                data = json.load(f)
+            data.pop("top_functions", None)
+            profiles.append(data)
+        return profiles
+
+    def profile_path(self, profile_id: str, ext: str = ".prof") -> Optional[str]:
+        """Ruta de un perfil guardado (None si no existe, el ID no es válido o resuelve fuera del directorio)"""
+        if not re.fullmatch(r"[A-Za-z0-9_.+-]+", profile_id) or ".." in profile_id:
+            return None
+        directory = os.path.realpath(self.directory)
+        path = os.path.realpath(os.path.join(directory, profile_id + ext))
+        if os.path.dirname(path) != directory or not os.path.isfile(path):
+            return None
+        return path
+
+def _build_profiler() -> RequestProfiler:
+    settings = get_settings()
+    return RequestProfiler(
+        enabled=settings.profiling_enabled,
+        sample_rate=settings.profile_sample_rate,
+        directory=settings.profile_dir,
+        max_files=settings.profile_max_files
+    )
+
+# Instancia global del profiler
+request_profiler = _build_profiler()
@@ -0,0 +1,33 @@
+"""
+Eventos de progreso de un turno de chat (routing, agentes, tools)
+Quien atiende el turno (p. ej. el WebSocket) registra un listener con progress_listener();
+sin listener, emit_progress() no hace nada.
+"""
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+_listener: contextvars.ContextVar[Optional[ProgressCallback]] = contextvars.ContextVar("progress_listener", default=None)
+
+@contextmanager
+def progress_listener(callback: ProgressCallback):
+    """
+    Envía los eventos de progreso del bloque al callback (debe ser síncrono y no bloquear)
+
+    Uso:
+        with progress_listener(queue_event):
+            await system.process_message(...)
+    """
+    token = _listener.set(callback)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+def emit_progress(stage: str, **data):
+    """Notifica una etapa del turno al listener actual, si lo hay"""
+    callback = _listener.get()
+    if callback is not None:
+        callback({"type": "progress", "stage": stage, **data})
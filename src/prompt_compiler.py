@@ -0,0 +1,64 @@
+"""
+Compilación de los prompts de sistema
+Cada agente tiene una plantilla por variante (`full`, la original, y `compact`, reescrita para
+ocupar menos). Al crear el modelo la plantilla se compila: se sustituyen los marcadores de
+contexto ({current_datetime}...), se quitan los elementos de lista repetidos y los espacios
+sobrantes. El prompt compilado y las declaraciones de tools se facturan en cada turno, así que
+aquí también se estima su coste en tokens (ver benchmarks/prompt_budget.py).
+"""
+import re
+from typing import Any, Dict, Iterable, List
+
+from tool_shaping import estimate_tokens, serialize_result
+
+# Variantes de prompt disponibles (PROMPT_VARIANT elige la activa)
+PROMPT_VARIANTS = ("full", "compact")
+
+# Solo {nombre}: los JSON de ejemplo de los prompts ({"agents": ...}) no se tocan
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+
+def render_template(template: str, context: Dict[str, str]) -> str:
+    """Sustituye los marcadores conocidos y deja intacto el resto de llaves"""
+    return PLACEHOLDER_PATTERN.sub(lambda match: context.get(match.group(1), match.group(0)), template)
+
+def dedupe_lines(text: str) -> str:
+    """Quita los elementos de lista repetidos, los espacios al final de línea y las líneas en blanco dobles"""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        item = line.strip()
+        if item.startswith(("-", "*")) and not item.startswith("**"):
+            if item in seen:
+                continue
+            seen.add(item)
+        lines.append(line)
+    return BLANK_LINES_PATTERN.sub("\n\n", "\n".join(lines)).strip() + "\n"
+
+def compile_prompt(template: str, context: Dict[str, str]) -> str:
+    """Prompt de sistema listo para el modelo"""
+    return dedupe_lines(render_template(template, context))
+
+def tool_tokens(declarations: Iterable[Dict[str, Any]]) -> int:
+    """Tokens estimados de las declaraciones de función que se envían con cada turno"""
+    declarations = list(declarations)
+    return estimate_tokens(serialize_result(declarations)) if declarations else 0
+
+def prompt_stats(template: str, context: Dict[str, str], declarations: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Coste estimado de un prompt
+
+    Returns:
+        {"template_tokens", "rendered_tokens", "compiled_tokens", "tool_tokens", "total_tokens"}
+        (rendered = plantilla con el contexto sustituido, antes de deduplicar)
+    """
+    compiled = compile_prompt(template, context)
+    tools = tool_tokens(declarations)
+    return {
+        "template_tokens": estimate_tokens(template),
+        "rendered_tokens": estimate_tokens(render_template(template, context)),
+        "compiled_tokens": estimate_tokens(compiled),
+        "tool_tokens": tools,
+        "total_tokens": estimate_tokens(compiled) + tools
+    }
@@ -0,0 +1,206 @@
+"""
+Lanzador de producción del Sistema Multi-Agente
+- Precarga la app y los agentes en el proceso padre antes del fork
+- Lanza N workers uvicorn que comparten el mismo socket
+- Calentamiento escalonado por worker
+- SIGTERM: los workers dejan de aceptar chats y drenan los que están en curso
+- Workers que caen al arrancar: relanzado con espera exponencial y límite de caídas seguidas
+"""
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+
+from config import configure_logging, get_settings, stop_logging
+
+# Un worker que aguantó este tiempo (segundos) arrancó bien: su caída no cuenta como fallo de arranque
+STABLE_UPTIME = 60.0
+
+# Espera máxima antes de relanzar un worker (segundos)
+MAX_RESTART_BACKOFF = 60.0
+
+class DrainingServer(uvicorn.Server):
+    """Servidor uvicorn que activa el drenado de chats al recibir la señal de salida"""
+
+    def handle_exit(self, sig, frame):
+        from main import chat_drain
+        chat_drain.begin()
+        super().handle_exit(sig, frame)
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    """Crea el socket de escucha compartido por todos los workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _build_config(app, host: str, port: int, graceful_timeout: float) -> uvicorn.Config:
+    """Configuración común de uvicorn para cada worker"""
+    return uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        timeout_graceful_shutdown=int(graceful_timeout),
+        log_level=get_settings().log_level.lower()
+    )
+
+def _wait_child(timeout: Optional[float]) -> Optional[Tuple[int, int]]:
+    """
+    os.wait con timeout (None = sin límite)
+
+    Returns:
+        (pid, status) del hijo que terminó, o None si no termina ninguno a tiempo
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            pid, status = os.waitpid(-1, 0 if deadline is None else os.WNOHANG)
+        except ChildProcessError:
+            if deadline is None:
+                raise
+            pid, status = 0, 0
+        if pid:
+            return pid, status
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        # Sondeo corto: una señal de apagado se atiende sin esperar al relanzado
+        time.sleep(min(0.05, remaining))
+
+def _run_worker(worker_id: int, sock: socket.socket, host: str, port: int, graceful_timeout: float):
+    """Cuerpo del proceso hijo: escalona el arranque y sirve la app precargada"""
+    import main
+
+    # Los handlers del padre no deben sobrevivir al fork (uvicorn instala los suyos)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    os.environ["WORKER_ID"] = str(worker_id)
+    # Listener de logs propio: el del padre no existe (ni su hilo sobreviviría al fork)
+    configure_logging()
+    time.sleep(worker_id * get_settings().worker_warmup_stagger)
+
+    try:
+        server = DrainingServer(_build_config(main.app, host, port, graceful_timeout))
+        server.run(sockets=[sock])
+    finally:
+        stop_logging()
+
+def serve(host: str, port: int, workers: int = 1, graceful_timeout: float = None):
+    """
+    Arranca el servicio en modo producción
+
+    Args:
+        host: Interfaz de escucha
+        port: Puerto de escucha
+        workers: Número de procesos worker
+        graceful_timeout: Segundos máximos para drenar chats en curso
+    """
+    import main
+
+    if graceful_timeout is None:
+        graceful_timeout = main.GRACEFUL_TIMEOUT
+
+    # Precarga antes del fork: los workers heredan app y agentes ya construidos
+    # (con varios workers el padre loguea sin hilo: cada worker arranca su listener)
+    forking = workers > 1 and hasattr(os, "fork")
+    configure_logging(threaded=not forking)
+    main.preload()
+
+    # Sin fork (Windows) se sirve en el propio proceso
+    if workers <= 1 or not hasattr(os, "fork"):
+        DrainingServer(_build_config(main.app, host, port, graceful_timeout)).run()
+        return
+
+    settings = get_settings()
+    sock = _bind_socket(host, port)
+    children: Dict[int, int] = {}
+    started_at: Dict[int, float] = {}
+    # Caídas seguidas al arrancar y momento del relanzado pendiente, por worker
+    failures: Dict[int, int] = {}
+    restarts: Dict[int, float] = {}
+    shutting_down = False
+    gave_up = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(worker_id, sock, host, port, graceful_timeout)
+            except BaseException:
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = worker_id
+        started_at[worker_id] = time.monotonic()
+        print(f"👷 Worker {worker_id} arrancado (pid {pid})")
+
+    def stop_children():
+        nonlocal shutting_down
+        shutting_down = True
+        restarts.clear()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def handle_signal(sig, frame):
+        print(f"🛑 Señal {signal.Signals(sig).name}: drenando {len(children)} workers...")
+        stop_children()
+
+    def schedule_restart(worker_id: int, status: int):
+        nonlocal gave_up
+        if time.monotonic() - started_at[worker_id] >= STABLE_UPTIME:
+            # Llevaba tiempo sirviendo: se relanza sin esperar y empieza una racha nueva
+            failures[worker_id] = 0
+            delay = 0.0
+        else:
+            failures[worker_id] = failures.get(worker_id, 0) + 1
+            if failures[worker_id] > settings.worker_max_restarts:
+                print(f"❌ Worker {worker_id} cayó {failures[worker_id]} veces seguidas al arrancar "
+                      f"(status {status}): parando el resto de workers")
+                gave_up = True
+                stop_children()
+                return
+            delay = min(settings.worker_restart_backoff * 2 ** (failures[worker_id] - 1), MAX_RESTART_BACKOFF)
+        print(f"⚠️ Worker {worker_id} terminó inesperadamente (status {status}), relanzando en {delay:.1f} s")
+        restarts[worker_id] = time.monotonic() + delay
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    # Supervisar workers: relanzar los que mueran salvo durante el apagado
+    while children or restarts:
+        now = time.monotonic()
+        for worker_id, due in list(restarts.items()):
+            if due <= now:
+                del restarts[worker_id]
+                spawn(worker_id)
+        timeout = max(min(restarts.values()) - now, 0) if restarts else None
+        try:
+            waited = _wait_child(timeout)
+        except ChildProcessError:
+            break
+        if waited is None:
+            continue
+        pid, status = waited
+        worker_id = children.pop(pid, None)
+        if worker_id is not None and not shutting_down:
+            schedule_restart(worker_id, status)
+
+    sock.close()
+    if gave_up:
+        print("❌ Lanzador detenido: los workers no consiguen arrancar")
+        raise SystemExit(1)
+    print("✅ Todos los workers terminados")
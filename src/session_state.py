@@ -0,0 +1,157 @@
+"""
+Estado compacto de las sesiones de chat
+Cada sesión guarda una única copia de su historial (texto de cada turno por agente) en
+registros con __slots__ y roles/agentes internados. Las ChatSession de Gemini se crean
+por turno a partir de este historial y se descartan al terminar, así que el historial
+no se duplica entre el agente y el SDK.
+
+Cada sesión memoriza además los resultados de las tools de lectura (por tool y argumentos)
+hasta que una tool de escritura los invalida.
+"""
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from config import get_settings
+from metrics import metrics
+
+# Resultados de tools memorizados como máximo por sesión (se descartan los más antiguos)
+MAX_TOOL_RESULTS = 16
+
+# Roles de Gemini (una sola instancia de cada cadena para todos los turnos)
+USER = sys.intern("user")
+MODEL = sys.intern("model")
+
+class Turn:
+    """Un mensaje del historial de un agente en una sesión"""
+
+    __slots__ = ("agent", "role", "text")
+
+    def __init__(self, agent: str, role: str, text: str):
+        self.agent = agent
+        self.role = role
+        self.text = text
+
+class SessionState:
+    """Historial, último routing y resultados de tools de lectura de una sesión"""
+
+    __slots__ = ("turns", "last_agents", "tool_results")
+
+    def __init__(self):
+        self.turns: List[Turn] = []
+        self.last_agents: Optional[Tuple[str, ...]] = None
+        # {(tool, argumentos JSON): (caduca, resultado)}; None hasta la primera tool
+        self.tool_results: Optional[Dict[Tuple[str, str], Tuple[float, Any]]] = None
+
+class SessionStore:
+    """
+    Sesiones en memoria (LRU acotado)
+    La clave None es la sesión compartida de los clientes que no envían session_id
+    """
+
+    def __init__(self, max_sessions: int = 50000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Hashable, SessionState]" = OrderedDict()
+        # Mensajes guardados por agente (para el estado sin recorrer todas las sesiones)
+        self._agent_turns: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _get(self, session_id: Optional[str], create: bool = False) -> Optional[SessionState]:
+        state = self._sessions.get(session_id)
+        if state is None and create:
+            state = self._sessions[session_id] = SessionState()
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._forget(evicted.turns)
+                metrics.inc("sessions_evicted")
+        if state is not None:
+            self._sessions.move_to_end(session_id)
+        return state
+
+    def history(self, session_id: Optional[str], agent_id: str) -> List[Dict[str, Any]]:
+        """Historial del agente en la sesión, en el formato de start_chat de Gemini"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return []
+        return [{"role": turn.role, "parts": [turn.text]} for turn in state.turns if turn.agent == agent_id]
+
+    def history_length(self, agent_id: str) -> int:
+        """Mensajes guardados de un agente en todas las sesiones"""
+        return self._agent_turns.get(agent_id, 0)
+
+    def _forget(self, turns: Iterable[Turn]):
+        for turn in turns:
+            self._agent_turns[turn.agent] -= 1
+
+    def record(self, session_id: Optional[str], agent_id: str, user_message: str, response_text: str):
+        """Añade un turno (mensaje del usuario y respuesta) al historial del agente"""
+        agent_id = sys.intern(agent_id)
+        turns = self._get(session_id, create=True).turns
+        turns.append(Turn(agent_id, USER, user_message))
+        turns.append(Turn(agent_id, MODEL, response_text))
+        self._agent_turns[agent_id] = self._agent_turns.get(agent_id, 0) + 2
+
+    def last_agents(self, session_id: Optional[str]) -> Optional[Tuple[str, ...]]:
+        state = self._sessions.get(session_id)
+        return state.last_agents if state else None
+
+    def remember_agents(self, session_id: Optional[str], agents: List[str]):
+        """Guarda el último routing de la sesión"""
+        self._get(session_id, create=True).last_agents = tuple(sys.intern(a) for a in agents)
+
+    def tool_result(self, session_id: Optional[str], key: Tuple[str, str]) -> Any:
+        """Resultado memorizado de una tool de lectura en la sesión (None si no hay o caducó)"""
+        state = self._sessions.get(session_id)
+        if state is None or not state.tool_results:
+            return None
+        entry = state.tool_results.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[0]:
+            del state.tool_results[key]
+            return None
+        return entry[1]
+
+    def remember_tool_result(self, session_id: Optional[str], key: Tuple[str, str], result: Any, ttl: float):
+        state = self._get(session_id, create=True)
+        if state.tool_results is None:
+            state.tool_results = {}
+        state.tool_results.pop(key, None)
+        state.tool_results[key] = (time.monotonic() + ttl, result)
+        if len(state.tool_results) > MAX_TOOL_RESULTS:
+            del state.tool_results[next(iter(state.tool_results))]
+
+    def invalidate_tool_results(self, session_id: Optional[str]):
+        """Olvida los resultados memorizados (tras una tool de escritura)"""
+        state = self._sessions.get(session_id)
+        if state is not None:
+            state.tool_results = None
+
+    def reset(self, session_id: Optional[str] = None):
+        """Olvida una sesión"""
+        state = self._sessions.pop(session_id, None)
+        if state is not None:
+            self._forget(state.turns)
+
+    def clear_agent(self, agent_id: str):
+        """Borra el historial de un agente en todas las sesiones"""
+        for state in self._sessions.values():
+            state.turns = [turn for turn in state.turns if turn.agent != agent_id]
+        self._agent_turns.pop(agent_id, None)
+
+    def clear(self):
+        self._sessions.clear()
+        self._agent_turns.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "turns": sum(self._agent_turns.values())
+        }
+
+# Sesiones del proceso (compartidas por todos los agentes)
+session_store = SessionStore(get_settings().max_sessions)
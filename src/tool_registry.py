@@ -0,0 +1,241 @@
+"""
+Registro de tools
+Compila una sola vez TOOLS_DEFINITIONS en una tabla de despacho: por cada tool, su
+declaración para Gemini, el método que la ejecuta y sus políticas (validación, timeout,
+caché con TTL, idempotencia, claves de idempotencia y shaping del resultado). El runner de
+agentes, las métricas y la caché de resultados usan esta tabla en lugar de buscar métodos
+por nombre en cada turno.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import get_settings
+from idempotency import IdempotencyStore, current_scope
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Timeout por defecto de una tool que no declara el suyo (segundos)
+DEFAULT_TIMEOUT = 10.0
+
+# Entradas máximas de la caché de resultados (todas las tools cacheables)
+MAX_CACHE_ENTRIES = 256
+
+class ToolSpec:
+    """Entrada compilada de la tabla de despacho"""
+
+    __slots__ = (
+        "name", "handler", "signature", "declaration", "validation", "shaping",
+        "timeout", "cache_ttl", "read_only", "idempotent", "idempotency_key"
+    )
+
+    def __init__(self, definition: Dict[str, Any], handler: Callable[..., Awaitable[Dict[str, Any]]]):
+        from tool_validation import compile_rules
+
+        self.name: str = definition["name"]
+        self.handler = handler
+        # Para comprobar los argumentos del modelo sin llamar a la tool
+        self.signature = inspect.signature(handler)
+        # Solo nombre, descripción y parámetros llegan al modelo
+        self.declaration: Dict[str, Any] = {"name": self.name, "description": definition["description"]}
+        if definition.get("parameters"):
+            self.declaration["parameters"] = definition["parameters"]
+        self.validation = compile_rules(definition.get("validation"))
+        self.shaping: Optional[Dict[str, Any]] = definition.get("result_shaping")
+        self.cache_ttl: float = definition.get("cache_ttl", 0)
+        self.read_only: bool = definition.get("read_only", False)
+        self.idempotency_key: bool = definition.get("idempotency_key", False)
+        # Una escritura con clave solo se puede reintentar si la API Node deduplica por ella
+        # (BACKEND_IDEMPOTENCY_KEYS); entonces usa su timeout corto (keyed_timeout)
+        keyed_retry = self.idempotency_key and get_settings().backend_idempotency_keys
+        self.timeout: float = definition.get("timeout", DEFAULT_TIMEOUT)
+        if keyed_retry:
+            self.timeout = definition.get("keyed_timeout", self.timeout)
+        self.idempotent: bool = definition.get("idempotent", self.read_only or keyed_retry)
+
+    def policies(self) -> Dict[str, Any]:
+        return {
+            "timeout": self.timeout,
+            "cache_ttl": self.cache_ttl,
+            "read_only": self.read_only,
+            "idempotent": self.idempotent,
+            "idempotency_key": self.idempotency_key,
+            "validation": sorted(self.validation or {}),
+        }
+
+class ToolRegistry:
+    """Tabla de despacho de tools con caché de resultados"""
+
+    def __init__(self, definitions: Iterable[Dict[str, Any]], tools: Any):
+        self.tools: Dict[str, ToolSpec] = {}
+        for definition in definitions:
+            handler = getattr(tools, definition["name"], None)
+            if handler is None:
+                raise ValueError(f"La tool {definition['name']} no tiene implementación en {type(tools).__name__}")
+            self.tools[definition["name"]] = ToolSpec(definition, handler)
+        self.read_only = frozenset(name for name, spec in self.tools.items() if spec.read_only)
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], "asyncio.Future"] = {}
+        self._idempotency = IdempotencyStore(get_settings().idempotency_window)
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self.tools.get(name)
+
+    def declarations(self, names: Iterable[str]) -> List[Dict[str, Any]]:
+        """Declaraciones de función de Gemini para las tools indicadas"""
+        return [self.tools[name].declaration for name in names]
+
+    async def dispatch(self, name: str, args: Dict[str, Any], scope: Optional[str] = None) -> Any:
+        """
+        Ejecuta una llamada del modelo aplicando las políticas de la tool
+
+        Args:
+            scope: Ámbito de las claves de idempotencia (por defecto el del turno en curso)
+
+        Returns:
+            Resultado ya reducido (shaping), listo para enviarlo al modelo; los errores de
+            validación se devuelven completos
+        """
+        from tool_validation import validate_args, validation_error_result
+
+        spec = self.tools.get(name)
+        if spec is None:
+            metrics.inc("tool_calls", tool=name, outcome="unknown")
+            return {"error": f"Función {name} no encontrada"}
+
+        # Validar en local antes de llamar al backend
+        args, errors = validate_args(spec.validation, args)
+        if errors:
+            logger.info("🚫 Argumentos rechazados en local para %s: %s", name,
+                        [e["field"] for e in errors], extra={"category": "tool", "tool": name})
+            metrics.inc("tool_calls", tool=name, outcome="invalid")
+            # Sin shaping: truncar la lista cortaría los errores que el modelo tiene que corregir
+            return validation_error_result(name, errors)
+
+        scope = scope or current_scope()
+        if spec.idempotency_key:
+            key = self._idempotency.key(scope, name, args)
+            return await self._idempotency.run(key, name, lambda: self._execute_keyed(spec, args, key), scope)
+
+        if spec.cache_ttl <= 0:
+            shaped, outcome = await self._execute(spec, args, with_outcome=True)
+            if outcome == "ok" and not spec.read_only:
+                # Tras cancelar o modificar, la misma reserva en el ámbito ya no es una repetición
+                self._idempotency.forget_scope(scope)
+            return shaped
+
+        cache_key = (name, json.dumps(args, sort_keys=True, default=str))
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            metrics.inc("tool_cache", tool=name, outcome="hit")
+            metrics.inc("tool_calls", tool=name, outcome="cached")
+            return cached
+
+        # Las llamadas iguales que llegan mientras otra está en curso esperan su resultado
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            metrics.inc("tool_cache", tool=name, outcome="coalesced")
+            metrics.inc("tool_calls", tool=name, outcome="cached")
+            return await asyncio.shield(inflight)
+
+        metrics.inc("tool_cache", tool=name, outcome="miss")
+        future = self._inflight[cache_key] = asyncio.get_running_loop().create_future()
+        try:
+            shaped, outcome = await self._execute(spec, args, with_outcome=True)
+            if outcome == "ok":
+                self._cache_put(cache_key, shaped, spec.cache_ttl)
+            future.set_result(shaped)
+            return shaped
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Evita el aviso si nadie más la esperaba
+            raise
+        finally:
+            del self._inflight[cache_key]
+
+    async def _execute(self, spec: ToolSpec, args: Dict[str, Any], with_outcome: bool = False) -> Any:
+        """Ejecuta la tool, registra latencia y resultado y aplica el shaping"""
+        from tool_shaping import shape_result_for
+
+        started = time.perf_counter()
+        result, outcome = await self._run(spec, args)
+        metrics.observe("tool_latency_ms", (time.perf_counter() - started) * 1000, tool=spec.name)
+        metrics.inc("tool_calls", tool=spec.name, outcome=outcome)
+
+        shaped = shape_result_for(spec, result)
+        return (shaped, outcome) if with_outcome else shaped
+
+    async def _execute_keyed(self, spec: ToolSpec, args: Dict[str, Any], key: str) -> Tuple[Any, bool]:
+        """Ejecuta una escritura con su clave; solo un resultado correcto es definitivo"""
+        shaped, outcome = await self._execute(spec, {**args, "idempotency_key": key}, with_outcome=True)
+        return shaped, outcome == "ok"
+
+    async def _run(self, spec: ToolSpec, args: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Ejecuta la tool con su timeout; las idempotentes se reintentan una vez si se agota"""
+        try:
+            spec.signature.bind(**args)
+        except TypeError as e:
+            # El modelo envió argumentos que la tool no acepta; un TypeError dentro de la tool
+            # es un fallo interno y sigue el camino normal de errores
+            return {"error": f"Argumentos no válidos para {spec.name}: {e}"}, "error"
+
+        attempts = 2 if spec.idempotent else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                result = await asyncio.wait_for(spec.handler(**args), spec.timeout)
+            except asyncio.TimeoutError:
+                metrics.inc("tool_timeouts", tool=spec.name)
+                logger.warning("⏱️ Timeout de %s (intento %d/%d)", spec.name, attempt, attempts,
+                               extra={"category": "tool", "tool": spec.name})
+                continue
+            failed = not isinstance(result, dict) or "error" in result or result.get("success") is False
+            return result, "error" if failed else "ok"
+
+        if spec.idempotent:
+            error = "El sistema de reservas no responde, inténtalo de nuevo en unos minutos"
+        else:
+            error = "El sistema de reservas no respondió a tiempo: no se sabe si la operación se completó, consulta antes de repetirla"
+        return {"success": False, "error": error}, "timeout"
+
+    def _cache_get(self, key: Tuple[str, str]) -> Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._cache[key]
+            return None
+        return value
+
+    def _cache_put(self, key: Tuple[str, str], value: Any, ttl: float):
+        self._cache[key] = (time.monotonic() + ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > MAX_CACHE_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._idempotency.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "tools": {name: spec.policies() for name, spec in self.tools.items()},
+            "cache_entries": len(self._cache),
+            "idempotency_entries": len(self._idempotency)
+        }
+
+@lru_cache(maxsize=1)
+def get_tool_registry() -> ToolRegistry:
+    """Registro compilado de las tools del restaurante (se construye una sola vez)"""
+    from mcp_tools import TOOLS_DEFINITIONS, restaurante_tools
+
+    return ToolRegistry(TOOLS_DEFINITIONS, restaurante_tools)
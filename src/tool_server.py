@@ -0,0 +1,253 @@
+"""
+Servidor de tools independiente (MCP sobre JSON-RPC 2.0)
+Expone las tools de RestauranteTools a todos los workers de chat desde un único proceso,
+así el pool de conexiones hacia la API Node y la caché de resultados se comparten y la
+E/S del backend escala por separado de los workers LLM.
+
+Transportes:
+    python src/tool_server.py --stdio               # JSON-RPC por líneas en stdin/stdout
+    python src/tool_server.py --port 8100           # HTTP local: POST /mcp
+
+Métodos MCP: initialize, ping, tools/list, tools/call ({"name": ..., "arguments": {...}})
+
+Los workers de chat lo usan con TOOL_SERVER_URL=http://127.0.0.1:8100/mcp
+(sin TOOL_SERVER_URL las tools se ejecutan en el propio proceso).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from typing import Any, Dict, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2025-03-26"
+SERVER_INFO = {"name": "restaurante-tools", "version": "1.0.0"}
+
+# Códigos de error JSON-RPC
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+def _tool_result(result: Any) -> Dict[str, Any]:
+    """Resultado de tools/call: texto JSON para clientes MCP genéricos y el dict estructurado"""
+    is_error = isinstance(result, dict) and ("error" in result or result.get("success") is False)
+    return {
+        "content": [{"type": "text", "text": json.dumps(result, ensure_ascii=False, default=str)}],
+        "structuredContent": result,
+        "isError": is_error
+    }
+
+async def handle_request(message: Any) -> Optional[Dict[str, Any]]:
+    """
+    Atiende un mensaje JSON-RPC con el registro de tools del proceso
+
+    Returns:
+        Respuesta JSON-RPC, o None si el mensaje era una notificación
+    """
+    from tool_registry import get_tool_registry
+
+    if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or not isinstance(message.get("method"), str):
+        return _error(message.get("id") if isinstance(message, dict) else None, INVALID_REQUEST, "Petición JSON-RPC no válida")
+
+    request_id = message.get("id")
+    method = message["method"]
+    params = message.get("params") or {}
+    if not isinstance(params, dict):
+        return _error(request_id, INVALID_PARAMS, "params debe ser un objeto")
+    registry = get_tool_registry()
+
+    if method == "initialize":
+        result = {"protocolVersion": PROTOCOL_VERSION, "capabilities": {"tools": {}}, "serverInfo": SERVER_INFO}
+    elif method == "ping":
+        result = {}
+    elif method == "tools/list":
+        result = {"tools": [
+            {
+                "name": spec.name,
+                "description": spec.declaration["description"],
+                "inputSchema": spec.declaration.get("parameters") or {"type": "object", "properties": {}},
+                "annotations": {"readOnlyHint": spec.read_only, "idempotentHint": spec.idempotent}
+            }
+            for spec in registry.tools.values()
+        ]}
+    elif method == "tools/call":
+        name = params.get("name")
+        arguments = params.get("arguments") or {}
+        if not isinstance(name, str) or not isinstance(arguments, dict):
+            return _error(request_id, INVALID_PARAMS, "tools/call necesita name y arguments")
+        metrics.inc("tool_server_calls", tool=name)
+        # El worker envía el ámbito de idempotencia de su turno (clave del cliente o sesión)
+        meta = params.get("_meta")
+        scope = meta.get("idempotency_scope") if isinstance(meta, dict) else None
+        result = _tool_result(await registry.dispatch(name, arguments, scope=scope))
+    elif method.startswith("notifications/"):
+        return None
+    else:
+        return _error(request_id, METHOD_NOT_FOUND, f"Método no soportado: {method}")
+
+    if request_id is None:
+        return None
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+async def serve_stdio():
+    """Transporte stdio: un mensaje JSON por línea, atendidos de forma concurrente"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    write_lock = asyncio.Lock()
+    pending = set()
+
+    async def respond(line: bytes):
+        try:
+            response = await handle_request(json.loads(line))
+        except json.JSONDecodeError:
+            response = _error(None, PARSE_ERROR, "JSON no válido")
+        if response is not None:
+            async with write_lock:
+                sys.stdout.write(json.dumps(response, ensure_ascii=False, default=str) + "\n")
+                sys.stdout.flush()
+
+    while line := await reader.readline():
+        if line.strip():
+            task = asyncio.create_task(respond(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+
+def create_http_app():
+    """App HTTP local (POST /mcp); cada petición se atiende de forma concurrente"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, Response
+
+    app = FastAPI(title="Servidor de tools del restaurante")
+
+    @app.post("/mcp")
+    async def mcp_endpoint(request: Request):
+        try:
+            message = json.loads(await request.body())
+        except json.JSONDecodeError:
+            return JSONResponse(_error(None, PARSE_ERROR, "JSON no válido"))
+        response = await handle_request(message)
+        if response is None:
+            return Response(status_code=202)
+        return JSONResponse(response)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return metrics.snapshot()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        from mcp_tools import restaurante_tools
+        await restaurante_tools.aclose()
+
+    return app
+
+class RemoteToolClient:
+    """
+    Cliente JSON-RPC del servidor de tools (mismo contrato que ToolRegistry.dispatch)
+    Las políticas (validación, timeout, caché, shaping) se aplican en el servidor
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self._http = None
+        self._http_loop = None
+        self._next_id = 0
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop or self._http.is_closed:
+            import httpx
+            from tracing import tracing_transport
+            self._http = httpx.AsyncClient(timeout=self.timeout, transport=tracing_transport())
+            self._http_loop = loop
+        return self._http
+
+    async def dispatch(self, name: str, args: Dict[str, Any], scope: Optional[str] = None) -> Any:
+        """Llama a tools/call en el servidor y devuelve el resultado ya reducido"""
+        from idempotency import current_scope
+
+        self._next_id += 1
+        params = {"name": name, "arguments": args}
+        scope = scope or current_scope()
+        if scope:
+            params["_meta"] = {"idempotency_scope": scope}
+        message = {
+            "jsonrpc": "2.0",
+            "id": self._next_id,
+            "method": "tools/call",
+            "params": params
+        }
+        try:
+            response = await self._client().post(self.url, json=message)
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            metrics.inc("tool_server_errors", tool=name)
+            logger.warning("⚠️ Servidor de tools no disponible: %s", e, extra={"category": "tool", "tool": name})
+            return {"success": False, "error": "El servicio de herramientas no está disponible, inténtalo de nuevo en unos minutos"}
+
+        if "error" in body:
+            return {"success": False, "error": body["error"].get("message", "Error del servidor de tools")}
+        return body["result"]["structuredContent"]
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+_remote_client: Optional[RemoteToolClient] = None
+
+def get_tool_dispatcher():
+    """
+    Ejecutor de tools de los agentes: el servidor remoto si hay TOOL_SERVER_URL,
+    si no el registro local del proceso
+    """
+    global _remote_client
+    from config import get_settings
+    from tool_registry import get_tool_registry
+
+    settings = get_settings()
+    if not settings.tool_server_url:
+        return get_tool_registry()
+    if _remote_client is None:
+        _remote_client = RemoteToolClient(settings.tool_server_url, settings.tool_server_timeout)
+    return _remote_client
+
+def main():
+    from config import configure_logging, get_settings
+
+    parser = argparse.ArgumentParser(description="Servidor de tools del restaurante (MCP / JSON-RPC)")
+    parser.add_argument("--stdio", action="store_true", help="Atender por stdin/stdout en lugar de HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=get_settings().tool_server_port)
+    args = parser.parse_args()
+
+    if args.stdio:
+        # stdout es el canal del protocolo: el log va a stderr
+        logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+        asyncio.run(serve_stdio())
+        return
+
+    import uvicorn
+
+    configure_logging()
+    print(f"🧰 Servidor de tools en http://{args.host}:{args.port}/mcp")
+    uvicorn.run(create_http_app(), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Modelado (shaping) de resultados de tools antes de enviarlos al modelo
+Aplica listas blancas de campos, truncado de textos largos y codificación
+compacta de listas según la configuración `result_shaping` de TOOLS_DEFINITIONS
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from metrics import metrics
+
+# Longitud máxima de texto si la tool no define otra
+DEFAULT_MAX_TEXT_LENGTH = 500
+
+# Aproximación de caracteres por token (Gemini ronda los 4 caracteres/token)
+CHARS_PER_TOKEN = 4
+
+def serialize_result(result: Any) -> str:
+    """Serializa un resultado de tool tal y como ocuparía en el contexto"""
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def estimate_tokens(text: str) -> int:
+    """Estima el número de tokens de un texto sin llamar a la API"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def measure_result(result: Any) -> Tuple[int, int]:
+    """Devuelve (bytes, tokens estimados) de un resultado serializado"""
+    serialized = serialize_result(result)
+    return len(serialized.encode("utf-8")), estimate_tokens(serialized)
+
+def _truncate(value: Any, max_length: int) -> Any:
+    """Trunca recursivamente los strings que superen max_length"""
+    if isinstance(value, str):
+        if len(value) > max_length:
+            return value[:max_length].rstrip() + "…"
+        return value
+    if isinstance(value, dict):
+        return {k: _truncate(v, max_length) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_truncate(v, max_length) for v in value]
+    return value
+
+def _project(value: Any, fields: List[str]) -> Any:
+    """
+    Filtra un dict (o lista de dicts) dejando solo los campos permitidos
+    Si el dict no contiene ninguno (p.ej. el backend cambió el formato) se deja intacto
+    """
+    if isinstance(value, dict):
+        projected = {k: value[k] for k in fields if k in value}
+        return projected if projected else value
+    if isinstance(value, list):
+        return [_project(item, fields) for item in value]
+    return value
+
+def _drop_empty(value: Any) -> Any:
+    """Elimina recursivamente claves con valor None o string vacío"""
+    if isinstance(value, dict):
+        return {
+            k: _drop_empty(v) for k, v in value.items()
+            if v is not None and v != ""
+        }
+    if isinstance(value, list):
+        return [_drop_empty(v) for v in value]
+    return value
+
+def _compact_list(items: Any) -> Any:
+    """
+    Codifica una lista de dicts como tabla {"columns": [...], "rows": [[...]]}
+    para no repetir los nombres de campo en cada elemento
+    """
+    if not isinstance(items, list) or not items or not all(isinstance(i, dict) for i in items):
+        return items
+
+    columns: List[str] = []
+    for item in items:
+        for key in item:
+            if key not in columns:
+                columns.append(key)
+
+    return {
+        "columns": columns,
+        "rows": [[item.get(col) for col in columns] for item in items]
+    }
+
+def shape_result(result: Any, shaping: Optional[Dict[str, Any]]) -> Any:
+    """
+    Aplica una configuración de shaping a un resultado de tool
+
+    Args:
+        result: Diccionario devuelto por RestauranteTools
+        shaping: Configuración con claves opcionales:
+            - fields: {clave: [campos permitidos]} para dicts o listas de dicts
+            - max_text_length: longitud máxima de los textos
+            - compact: claves cuyas listas de dicts se codifican como tabla
+            - drop_empty: elimina valores None/vacíos (por defecto True)
+
+    Returns:
+        Resultado reducido, listo para enviarse al modelo
+    """
+    if not isinstance(result, dict):
+        return result
+
+    shaping = shaping or {}
+    shaped = dict(result)
+
+    for key, allowed in shaping.get("fields", {}).items():
+        if key in shaped:
+            shaped[key] = _project(shaped[key], allowed)
+
+    if shaping.get("drop_empty", True):
+        shaped = _drop_empty(shaped)
+
+    shaped = _truncate(shaped, shaping.get("max_text_length", DEFAULT_MAX_TEXT_LENGTH))
+
+    for key in shaping.get("compact", []):
+        if key in shaped:
+            shaped[key] = _compact_list(shaped[key])
+
+    return shaped
+
+def shape_result_for(spec: Any, result: Any) -> Any:
+    """
+    Aplica el shaping de una tool del registro y registra métricas
+    de bytes y tokens antes/después
+    """
+    raw_bytes, raw_tokens = measure_result(result)
+    shaped = shape_result(result, spec.shaping)
+    shaped_bytes, shaped_tokens = measure_result(shaped)
+
+    metrics.inc("tool_result_bytes_raw", raw_bytes, tool=spec.name)
+    metrics.inc("tool_result_bytes_shaped", shaped_bytes, tool=spec.name)
+    metrics.inc("tool_result_tokens_raw", raw_tokens, tool=spec.name)
+    metrics.inc("tool_result_tokens_shaped", shaped_tokens, tool=spec.name)
+    metrics.observe("tool_result_shaped_bytes", shaped_bytes, tool=spec.name)
+
+    return shaped
@@ -0,0 +1,143 @@
+"""
+Validación local de los argumentos de las tools antes de llamar al backend
+Aplica las restricciones declaradas en el bloque `validation` de TOOLS_DEFINITIONS
+(teléfono, email, horario 9:00-23:00, fecha futura, número de personas...) y devuelve
+los errores en un formato que el modelo puede usar para pedir la corrección al cliente.
+"""
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+# Formatos de fecha aceptados (el backend espera YYYY-MM-DDTHH:mm)
+DATETIME_FORMATS = ("%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S")
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _check_datetime(value: Any, rule: Dict[str, Any]) -> Optional[str]:
+    """Fecha con formato YYYY-MM-DDTHH:mm, futura y dentro del horario del restaurante"""
+    parsed = None
+    for fmt in DATETIME_FORMATS:
+        try:
+            parsed = datetime.strptime(str(value), fmt)
+            break
+        except ValueError:
+            continue
+    if parsed is None:
+        return "Formato de fecha no válido, usa YYYY-MM-DDTHH:mm (ej: 2025-11-25T19:30)"
+
+    opening, closing = rule.get("opening_hours", (9, 23))
+    minutes = parsed.hour * 60 + parsed.minute
+    if not opening * 60 <= minutes <= closing * 60:
+        return f"La hora debe estar entre las {opening}:00 y las {closing}:00"
+
+    if rule.get("future") and parsed <= datetime.now():
+        return "La fecha debe ser posterior a la fecha y hora actual"
+    return None
+
+def _check_email(value: Any, rule: Dict[str, Any]) -> Optional[str]:
+    if not EMAIL_PATTERN.match(str(value)):
+        return "El email no tiene un formato válido (ej: nombre@dominio.com)"
+    return None
+
+# Comprobaciones de formato disponibles en los bloques `validation`
+FORMAT_CHECKS: Dict[str, Callable[[Any, Dict[str, Any]], Optional[str]]] = {
+    "reservation_datetime": _check_datetime,
+    "email": _check_email,
+}
+
+def _check_field(value: Any, rule: Dict[str, Any]) -> Tuple[Any, Optional[str]]:
+    """Normaliza y valida un argumento; devuelve (valor normalizado, error o None)"""
+    if isinstance(value, str):
+        # "strip": caracteres que se recortan en los extremos; "remove_chars": separadores que se
+        # quitan en cualquier posición (solo para campos como el teléfono)
+        if rule.get("remove_chars"):
+            value = value.translate({ord(c): None for c in rule["remove_chars"]})
+        if rule.get("strip"):
+            value = value.strip(rule["strip"])
+
+    if rule.get("type") == "integer":
+        try:
+            # Gemini devuelve los enteros como float (4.0)
+            if float(value) != int(float(value)):
+                raise ValueError
+            value = int(float(value))
+        except (TypeError, ValueError):
+            return value, "Debe ser un número entero"
+
+    if ("minimum" in rule and value < rule["minimum"]) or ("maximum" in rule and value > rule["maximum"]):
+        return value, rule.get("message") or f"Debe estar entre {rule.get('minimum')} y {rule.get('maximum')}"
+
+    if "pattern" in rule and not rule["compiled"].match(str(value)):
+        return value, rule.get("message") or "Formato no válido"
+
+    check = FORMAT_CHECKS.get(rule.get("format"))
+    if check:
+        return value, check(value, rule)
+    return value, None
+
+def compile_rules(validation: Optional[Dict[str, Dict[str, Any]]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Prepara un bloque `validation` (patrones ya compilados); lo usa el registro de tools"""
+    if not validation:
+        return None
+    return {
+        field: {**rule, "compiled": re.compile(rule["pattern"])} if "pattern" in rule else dict(rule)
+        for field, rule in validation.items()
+    }
+
+def get_validation_rules(tool_name: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Reglas compiladas de una tool (desde el registro de tools)"""
+    from tool_registry import get_tool_registry
+
+    spec = get_tool_registry().get(tool_name)
+    return spec.validation if spec else None
+
+def validate_args(
+    rules: Optional[Dict[str, Dict[str, Any]]],
+    args: Dict[str, Any]
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Valida argumentos contra unas reglas compiladas
+
+    Returns:
+        (argumentos normalizados, lista de errores {field, value, message})
+    """
+    if not rules:
+        return args, []
+
+    normalized = dict(args)
+    errors = []
+    for field, rule in rules.items():
+        if field not in normalized or normalized[field] in (None, ""):
+            continue  # Los obligatorios los exige ya la declaración de la tool
+        value, error = _check_field(normalized[field], rule)
+        normalized[field] = value
+        if error:
+            errors.append({"field": field, "value": args[field], "message": error})
+    return normalized, errors
+
+def validate_tool_args(tool_name: str, args: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Valida los argumentos de una llamada a tool con las reglas declaradas en TOOLS_DEFINITIONS"""
+    return validate_args(get_validation_rules(tool_name), args)
+
+def validation_error_result(tool_name: str, errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Resultado de tool para argumentos rechazados localmente
+    Incluye todos los errores a la vez para que el modelo los pida en un solo turno
+    """
+    metrics.inc("tool_validation_rejected", tool=tool_name)
+    # Cada rechazo local evita la llamada al backend; informar de todos los campos a la vez
+    # evita además los turnos de corrección de uno en uno (el backend solo devuelve el primero)
+    metrics.inc("backend_calls_avoided", tool=tool_name)
+    if len(errors) > 1:
+        metrics.inc("llm_turns_avoided", len(errors) - 1, tool=tool_name)
+    for error in errors:
+        metrics.inc("tool_validation_errors", tool=tool_name, field=error["field"])
+
+    return {
+        "success": False,
+        "error": "Datos no válidos: " + "; ".join(f"{e['field']}: {e['message']}" for e in errors),
+        "validation_errors": errors,
+        "instrucciones": "No se ha enviado nada al sistema. Pide al cliente que corrija estos datos y vuelve a llamar a la herramienta."
+    }
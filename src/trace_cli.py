@@ -0,0 +1,146 @@
+"""
+CLI para analizar las trazas exportadas por tracing.py
+
+Uso (desde src/):
+    python trace_cli.py                  # Lista las últimas trazas
+    python trace_cli.py <trace_id>       # Árbol de spans y ruta crítica
+    python trace_cli.py --last           # Analiza la última traza
+    python trace_cli.py --file otra.jsonl <trace_id>
+"""
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, List, Any, Tuple
+
+# Margen para comparar tiempos de spans contiguos (segundos)
+EPSILON = 0.0005
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Carga el fichero JSONL agrupando los spans por trace_id (en orden de aparición)"""
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            span = json.loads(line)
+            traces.setdefault(span["trace_id"], []).append(span)
+    return traces
+
+def _index(spans: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, List[Dict[str, Any]]]]:
+    """Devuelve (span raíz, hijos por span_id)"""
+    children = defaultdict(list)
+    root = None
+    for span in spans:
+        if span["parent_id"] is None:
+            root = span
+        else:
+            children[span["parent_id"]].append(span)
+    for items in children.values():
+        items.sort(key=lambda s: s["start"])
+    return root, children
+
+def critical_path(span: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], int, float]]:
+    """
+    Calcula la ruta crítica bajo un span
+
+    Recorre los hijos hacia atrás desde el final del span, eligiendo en cada paso
+    el hijo que termina más tarde antes del cursor (el que "bloqueaba" al padre).
+
+    Returns:
+        Lista de (span, profundidad, tiempo propio en ms) en orden cronológico
+    """
+    def walk(node: Dict[str, Any], depth: int) -> List[Tuple[Dict[str, Any], int, float]]:
+        blocking = []
+        cursor = node["end"]
+        for child in sorted(children.get(node["span_id"], []), key=lambda s: s["end"], reverse=True):
+            if child["end"] <= cursor + EPSILON:
+                blocking.append(child)
+                cursor = child["start"]
+        blocking.reverse()
+
+        self_ms = node["duration_ms"] - sum(c["duration_ms"] for c in blocking)
+        result = [(node, depth, max(self_ms, 0.0))]
+        for child in blocking:
+            result.extend(walk(child, depth + 1))
+        return result
+
+    return walk(span, 0)
+
+def _label(span: Dict[str, Any]) -> str:
+    attrs = span.get("attributes") or {}
+    details = " ".join(f"{k}={v}" for k, v in attrs.items() if v is not None)
+    return f"{span['name']} {details}".strip()
+
+def print_tree(spans: List[Dict[str, Any]]):
+    """Imprime el árbol completo de spans de una traza"""
+    root, children = _index(spans)
+    if root is None:
+        print("⚠️ Traza sin span raíz")
+        return
+
+    def walk(node: Dict[str, Any], depth: int):
+        offset = (node["start"] - root["start"]) * 1000
+        print(f"{'  ' * depth}- {_label(node)}  [{node['duration_ms']:.1f} ms @ +{offset:.1f} ms]")
+        for child in children.get(node["span_id"], []):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+
+def print_critical_path(spans: List[Dict[str, Any]]):
+    """Imprime el desglose de la ruta crítica con el tiempo propio de cada span"""
+    root, children = _index(spans)
+    if root is None:
+        return
+
+    total = root["duration_ms"] or 1.0
+    print(f"\n🧭 Ruta crítica ({root['duration_ms']:.1f} ms)")
+    print(f"{'tiempo propio':>14} {'%':>6}  span")
+    for span, depth, self_ms in critical_path(root, children):
+        print(f"{self_ms:>11.1f} ms {self_ms / total * 100:>5.1f}%  {'  ' * depth}{_label(span)}")
+
+def list_traces(traces: Dict[str, List[Dict[str, Any]]], limit: int):
+    """Lista las últimas trazas con su duración"""
+    for trace_id, spans in list(traces.items())[-limit:]:
+        root, _ = _index(spans)
+        if root:
+            print(f"{trace_id}  {root['duration_ms']:>9.1f} ms  {len(spans):>3} spans  {_label(root)}")
+
+def main(argv=None):
+    from config import get_settings
+
+    parser = argparse.ArgumentParser(description="Análisis de trazas del sistema multi-agente")
+    parser.add_argument("trace_id", nargs="?", help="ID de la traza a analizar")
+    parser.add_argument("--file", default=get_settings().trace_file, help="Fichero JSONL de trazas")
+    parser.add_argument("--last", action="store_true", help="Analiza la última traza")
+    parser.add_argument("--limit", type=int, default=20, help="Número de trazas a listar")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.file):
+        print(f"❌ No existe el fichero de trazas: {args.file}")
+        return 1
+
+    traces = load_traces(args.file)
+    if not traces:
+        print("⚠️ No hay trazas registradas")
+        return 0
+
+    trace_id = args.trace_id or (list(traces)[-1] if args.last else None)
+    if trace_id is None:
+        list_traces(traces, args.limit)
+        return 0
+
+    spans = traces.get(trace_id)
+    if not spans:
+        print(f"❌ Traza {trace_id} no encontrada")
+        return 1
+
+    print(f"🔎 Traza {trace_id}\n")
+    print_tree(spans)
+    print_critical_path(spans)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Tracing ligero del sistema multi-agente
+Spans anidados (routing, agentes, llamadas al LLM, tools y HTTP) propagados con contextvars
+y exportados a un fichero JSONL local. Ver trace_cli.py para analizar las trazas.
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from config import get_settings
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """Unidad de trabajo con tiempo de inicio/fin y atributos"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "root", "finished")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        # El span raíz acumula los spans terminados de toda la traza
+        self.root: "Span" = parent.root if parent else self
+        self.finished: List["Span"] = []
+
+    def set(self, key: str, value: Any):
+        """Añade o actualiza un atributo del span"""
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.time()
+        return (end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes
+        }
+
+class _NoopSpan:
+    """Span vacío cuando el tracing está desactivado"""
+
+    trace_id = None
+
+    def set(self, key: str, value: Any):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class JsonlExporter:
+    """
+    Exporta trazas completas a un fichero JSONL (una línea por span)
+    La escritura se hace en un hilo aparte para no bloquear el event loop. Solo se guarda la
+    fracción `sample_rate` de las trazas (por trace_id, igual en todos los workers) y el fichero
+    rota al superar `max_bytes`, conservando `backups` ficheros anteriores (.1, .2...)
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = 3, sample_rate: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def sampled(self, trace_id: str) -> bool:
+        """La traza entra en la muestra (decisión estable por trace_id)"""
+        return self.sample_rate >= 1 or int(trace_id[:8], 16) < self.sample_rate * 0x100000000
+
+    def export(self, spans: List[Span]):
+        """Encola los spans de una traza terminada (si entra en la muestra)"""
+        if not spans or not self.sampled(spans[0].trace_id):
+            return
+        self._ensure_thread()
+        self._queue.put([span.to_dict() for span in spans])
+
+    def flush(self):
+        """Espera a que se escriban las trazas pendientes"""
+        if self._thread:
+            self._queue.join()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _rotate_if_needed(self):
+        """traces.jsonl → traces.jsonl.1 → ... → .N (el más antiguo se borra)"""
+        if self.max_bytes <= 0:
+            return
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _worker(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            spans = self._queue.get()
+            try:
+                self._rotate_if_needed()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for span in spans:
+                        f.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+            except OSError:
+                # Sin disco o sin permisos se pierde la traza, pero el hilo sigue vivo
+                pass
+            finally:
+                self._queue.task_done()
+
+class Tracer:
+    """Crea spans y exporta cada traza cuando termina su span raíz"""
+
+    def __init__(self, enabled: bool, exporter: Optional[JsonlExporter]):
+        self.enabled = enabled
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Abre un span hijo del span actual (o una traza nueva si no hay ninguno)
+
+        Uso:
+            with tracer.span("tool.crear_reserva", num_personas=4) as span:
+                ...
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end = time.time()
+            _current_span.reset(token)
+            span.root.finished.append(span)
+            if span.root is span and self.exporter:
+                self.exporter.export(span.finished)
+
+    def current_trace_id(self) -> Optional[str]:
+        """ID de la traza en curso (None si no hay)"""
+        current = _current_span.get()
+        return current.trace_id if current else None
+
+def traced(name: str):
+    """Decorador que envuelve una corrutina en un span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@functools.lru_cache(maxsize=1)
+def _tracing_transport_class():
+    """Define el transporte httpx con tracing (httpx se importa aquí para mantener la carga diferida)"""
+    import httpx
+
+    class TracingTransport(httpx.AsyncBaseTransport):
+        """Transporte httpx que crea un span por cada petición HTTP"""
+
+        def __init__(self, **kwargs):
+            self._inner = httpx.AsyncHTTPTransport(**kwargs)
+
+        async def handle_async_request(self, request):
+            with tracer.span(f"http.{request.method}", path=request.url.path) as span:
+                response = await self._inner.handle_async_request(request)
+                span.set("status_code", response.status_code)
+                return response
+
+        async def aclose(self):
+            await self._inner.aclose()
+
+    return TracingTransport
+
+def tracing_transport(**kwargs):
+    """Crea un transporte httpx que traza cada petición HTTP (kwargs: opciones de AsyncHTTPTransport)"""
+    return _tracing_transport_class()(**kwargs)
+
+def _build_tracer() -> Tracer:
+    settings = get_settings()
+    exporter = None
+    if settings.tracing_enabled:
+        exporter = JsonlExporter(
+            settings.trace_file,
+            max_bytes=settings.trace_max_bytes,
+            backups=settings.trace_backups,
+            sample_rate=settings.trace_sample_rate
+        )
+    return Tracer(settings.tracing_enabled, exporter)
+
+# Instancia global del tracer
+tracer = _build_tracer()
@@ -0,0 +1,112 @@
+"""
+Calentamiento del worker y refresco en segundo plano
+Al arrancar resuelve DNS, abre las conexiones del pool hacia la API Node cargando el catálogo
+de menús y, opcionalmente, hace una inferencia mínima por agente para abrir el canal con Gemini.
+Después mantiene la caché de menús fresca con una tarea periódica.
+"""
+import asyncio
+import logging
+import socket
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from menu_cache import menu_cache
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """Estado del calentamiento del worker (consultado por /health)"""
+
+    def __init__(self):
+        self.ready = False
+        self.report: Dict[str, Dict[str, Any]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def _step(self, name: str, coro: Awaitable[Any]):
+        """Ejecuta un paso registrando su duración; los fallos no bloquean el arranque"""
+        started = time.perf_counter()
+        try:
+            await coro
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e)
+            logger.warning("⚠️ Warmup '%s' fallido: %s", name, e)
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.report[name] = {"ok": ok, "duration_ms": duration_ms, **({"error": error} if error else {})}
+        metrics.observe("warmup_step_ms", duration_ms, step=name)
+
+    async def _resolve_hosts(self, hosts: List[Tuple[Optional[str], int]]):
+        loop = asyncio.get_running_loop()
+        for host, port in hosts:
+            if host:
+                await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+
+    async def _load_menus(self):
+        if not await menu_cache.refresh():
+            raise RuntimeError("No se pudo cargar el catálogo de menús")
+
+    async def _warm_agents(self, system):
+        """Una inferencia mínima por agente (sin tocar su historial)"""
+        async def ping(agent):
+            await agent.model.generate_content_async(
+                "ping",
+                generation_config={"max_output_tokens": 1, "temperature": 0}
+            )
+        await asyncio.gather(*(ping(agent) for agent in system.runner.agents.values()))
+
+    async def run(
+        self,
+        system,
+        hosts: List[Tuple[Optional[str], int]],
+        inference: bool = False,
+        timeout: float = 30.0
+    ):
+        """Ejecuta todos los pasos (como mucho `timeout` segundos) y marca el worker como listo"""
+        steps = [
+            self._step("dns", self._resolve_hosts(hosts)),
+            self._step("menus", self._load_menus()),
+        ]
+        if inference and system is not None:
+            steps.append(self._step("inference", self._warm_agents(system)))
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.gather(*steps), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Warmup incompleto tras %.0f s, el worker pasa a estar listo igualmente", timeout)
+            self.report["timeout"] = {"ok": False, "duration_ms": timeout * 1000}
+        self.ready = True
+        logger.info("🔥 Warmup completado en %.0f ms", (time.perf_counter() - started) * 1000)
+
+    async def _refresh_loop(self, interval: float):
+        """Refresca la caché de menús cada `interval` segundos"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await menu_cache.refresh()
+            except Exception as e:
+                logger.warning("⚠️ Refresco de menús fallido: %s", e)
+
+    def start(
+        self,
+        system,
+        hosts: List[Tuple[Optional[str], int]],
+        inference: bool = False,
+        timeout: float = 30.0,
+        refresh_interval: float = 0
+    ):
+        """Lanza el calentamiento y el refresco periódico de menús en segundo plano"""
+        self._tasks.append(asyncio.create_task(self.run(system, hosts, inference, timeout)))
+        if refresh_interval > 0:
+            self._tasks.append(asyncio.create_task(self._refresh_loop(refresh_interval)))
+
+    async def stop(self):
+        """Cancela las tareas en segundo plano"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+# Estado global del calentamiento del worker
+warmup = Warmup()
@@ -0,0 +1,264 @@
+"""
+Chat por WebSocket (/ws/chat)
+Una conexión por sesión: evita repetir CORS, parseo y preparación de la petición en cada turno,
+y permite enviar eventos de progreso mientras el turno está en curso.
+
+La respuesta no se genera en streaming: se trocea cuando el turno ya ha terminado (entrega por
+fragmentos), así que el primer `chunk` llega a la vez que la respuesta completa de POST /chat.
+Lo único que el cliente recibe antes son los eventos `progress`.
+
+Protocolo (mensajes JSON):
+    Cliente → servidor:
+        {"type": "message", "content": "...", "id": "opcional"}
+        {"type": "reset"} | {"type": "ping"} | {"type": "pong"}
+    Servidor → cliente:
+        {"type": "session", "session_id": "..."}
+        {"type": "progress", "id": ..., "stage": "routing" | "agents_selected" | "tool", ...}
+        {"type": "chunk", "id": ..., "content": "..."}
+        {"type": "done", "id": ..., "navigation_action": ..., "agents_used": [...], "served_mode": ...}
+        {"type": "error", "id": ..., "error": "...", "retryable": bool}
+        {"type": "ping"} | {"type": "pong"}
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from config import get_settings
+from fair_scheduler import CLIENT_HEADER, SessionQueueFull, client_scope
+from log_pipeline import log_context
+from metrics import metrics
+from progress import progress_listener
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Tamaño aproximado de cada fragmento de respuesta
+CHUNK_CHARS = 80
+
+# Mensajes pendientes de envío por conexión (los eventos de progreso se descartan si se llena)
+SEND_QUEUE_SIZE = 64
+
+# Tiempo máximo para entregar un mensaje a un cliente que no lee
+SEND_TIMEOUT = 10.0
+
+# Mensajes guardados por conexión para reconstruir el contexto en modo sin estado
+MAX_STORED_MESSAGES = 100
+
+def chunk_text(text: str, size: int = CHUNK_CHARS) -> List[str]:
+    """Divide el texto en fragmentos de ~size caracteres cortando en espacios"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start, end)
+            if space > start:
+                end = space + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+class ChatSocket:
+    """Atiende una conexión WebSocket: un turno en curso a la vez, con cola acotada"""
+
+    def __init__(self, websocket: WebSocket, system, drain):
+        settings = get_settings()
+        self.websocket = websocket
+        self.system = system
+        self.drain = drain
+        self.heartbeat_interval = settings.ws_heartbeat_interval
+        self.idle_timeout = settings.ws_idle_timeout
+        self.session_id = websocket.query_params.get("session_id") or uuid.uuid4().hex
+        self.inbox: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=settings.ws_max_pending)
+        self.outbox: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.messages: List[Tuple[str, str]] = []
+        self.busy = False
+        self.last_seen = time.monotonic()
+        self.last_activity = self.last_seen
+        self.close_code = 1000
+        self.close_reason = ""
+
+    def _origin_allowed(self) -> bool:
+        """Los navegadores envían Origin: se valida contra CORS_ORIGINS (sin Origin se acepta)"""
+        origin = self.websocket.headers.get("origin")
+        return origin is None or origin in get_settings().cors_origins
+
+    async def run(self):
+        """Ciclo de vida completo de la conexión"""
+        if not self._origin_allowed():
+            await self.websocket.close(code=1008)
+            return
+        if self.system is None or self.drain.draining:
+            await self.websocket.close(code=1012 if self.drain.draining else 1011)
+            return
+
+        await self.websocket.accept()
+        metrics.inc("ws_connections_opened")
+        logger.info("🔌 WebSocket conectado", extra={"category": "ws", "session_id": self.session_id})
+        await self.outbox.put({"type": "session", "session_id": self.session_id})
+
+        tasks = [
+            asyncio.create_task(self._receive_loop()),
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._turn_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.websocket.close(code=self.close_code, reason=self.close_reason)
+            except RuntimeError:
+                pass  # El cliente ya cerró
+            metrics.inc("ws_connections_closed", reason=self.close_reason or "client")
+            logger.info("🔌 WebSocket cerrado (%s)", self.close_reason or "cliente",
+                        extra={"category": "ws", "session_id": self.session_id})
+
+    def _close(self, code: int, reason: str):
+        self.close_code = code
+        self.close_reason = reason
+
+    def _emit(self, frame: Dict[str, Any]):
+        """Encola un mensaje descartable (progreso, ping): si el cliente va lento se pierde"""
+        try:
+            self.outbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            metrics.inc("ws_frames_dropped", type=frame.get("type"))
+
+    async def _receive_loop(self):
+        """Lee los mensajes del cliente y encola los turnos"""
+        while True:
+            try:
+                raw = await self.websocket.receive_text()
+            except WebSocketDisconnect:
+                return
+            self.last_seen = time.monotonic()
+
+            try:
+                frame = json.loads(raw)
+            except json.JSONDecodeError:
+                await self.outbox.put({"type": "error", "error": "JSON no válido", "retryable": False})
+                continue
+
+            frame_type = frame.get("type")
+            if frame_type == "ping":
+                self._emit({"type": "pong"})
+            elif frame_type == "pong":
+                pass
+            elif frame_type == "reset":
+                self.messages.clear()
+                self.system.reset_session(self.session_id)
+            elif frame_type == "message" and str(frame.get("content") or "").strip():
+                self.last_activity = self.last_seen
+                try:
+                    self.inbox.put_nowait(frame)
+                except asyncio.QueueFull:
+                    # Backpressure: demasiados mensajes sin atender en esta conexión
+                    metrics.inc("ws_messages_rejected")
+                    await self.outbox.put({
+                        "type": "error", "id": frame.get("id"),
+                        "error": "Demasiados mensajes pendientes, espera la respuesta", "retryable": True
+                    })
+            else:
+                await self.outbox.put({"type": "error", "id": frame.get("id"), "error": "Mensaje no válido", "retryable": False})
+
+    async def _send_loop(self):
+        """Entrega los mensajes encolados; un cliente que no lee acaba desconectado"""
+        while True:
+            frame = await self.outbox.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(json.dumps(frame, ensure_ascii=False)), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._close(1008, "send timeout")
+                return
+            except (WebSocketDisconnect, RuntimeError):
+                return
+
+    async def _heartbeat_loop(self):
+        """Ping periódico, cierre si el cliente no responde o la conversación está inactiva"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            if now - self.last_seen > 2 * self.heartbeat_interval:
+                self._close(1001, "heartbeat timeout")
+                return
+            if not self.busy and self.inbox.empty() and now - self.last_activity > self.idle_timeout:
+                self._close(1000, "idle timeout")
+                return
+            if self.drain.draining and not self.busy:
+                self._close(1012, "draining")
+                return
+            self._emit({"type": "ping"})
+
+    async def _turn_loop(self):
+        """Procesa los turnos de la conexión en orden, uno a la vez"""
+        while True:
+            frame = await self.inbox.get()
+            self.busy = True
+            try:
+                await self._process_turn(frame)
+            finally:
+                self.busy = False
+                self.last_activity = time.monotonic()
+            if self.drain.draining:
+                self._close(1012, "draining")
+                return
+
+    async def _process_turn(self, frame: Dict[str, Any]):
+        """Ejecuta un turno y envía progreso y, al terminar, la respuesta en fragmentos y el resultado final"""
+        turn_id = frame.get("id")
+        content = str(frame["content"])
+        if self.drain.draining:
+            await self.outbox.put({"type": "error", "id": turn_id, "error": "Servicio reiniciándose", "retryable": True})
+            return
+
+        started = time.perf_counter()
+        metrics.inc("ws_messages")
+        with log_context(session_id=self.session_id), tracer.span("ws.turn", session_id=self.session_id):
+            async with self.drain.track():
+                result = await self._run_system(content, turn_id)
+
+        if not result.get("success"):
+            await self.outbox.put({"type": "error", "id": turn_id, "error": result.get("error", "Error al procesar mensaje"), "retryable": True})
+            return
+
+        response = result.get("response", "")
+        self.messages.append(("assistant", response))
+        del self.messages[:-MAX_STORED_MESSAGES]
+
+        # Estas escrituras esperan si la cola está llena: un cliente lento frena su propio turno
+        for chunk in chunk_text(response):
+            await self.outbox.put({"type": "chunk", "id": turn_id, "content": chunk})
+        await self.outbox.put({
+            "type": "done",
+            "id": turn_id,
+            "navigation_action": result.get("navigation_action"),
+            "agents_used": result.get("agents_used"),
+            "served_mode": result.get("served_mode")
+        })
+        metrics.observe("ws_turn_latency_ms", (time.perf_counter() - started) * 1000)
+
+    async def _run_system(self, content: str, turn_id: Optional[str]) -> Dict[str, Any]:
+        settings = get_settings()
+        self.messages.append(("user", content))
+
+        history = None
+        user_message = content
+        if settings.stateless_chat:
+            from conversation import build_history
+            history, user_message = build_history(self.messages, settings.history_window, settings.history_max_chars)
+
+        client_id = self.websocket.headers.get(CLIENT_HEADER) or (self.websocket.client.host if self.websocket.client else None)
+        try:
+            with progress_listener(lambda event: self._emit({**event, "id": turn_id})), client_scope(client_id):
+                return await self.system.process_message(user_message, session_id=self.session_id, history=history)
+        except SessionQueueFull:
+            return {"success": False, "error": "Demasiados mensajes seguidos, espera a la respuesta anterior"}
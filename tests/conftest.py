@@ -0,0 +1,100 @@
+"""
+Dobles compartidos por los tests de agentes (modelo, chat y dispatcher de tools simulados, sin API)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import tool_server
+from agent_runner import AgentRunner, AgentType
+from metrics import metrics
+from session_state import session_store
+
+def model_response(function_call=None, text: str = ""):
+    """Respuesta de Gemini con una sola parte: una llamada a función o el texto final"""
+    part = SimpleNamespace(function_call=function_call)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))], text=text)
+
+class ScriptedChat:
+    """
+    Chat que pide las tools del guion en orden y después responde con texto
+    Con tool_config (tools prohibidas) responde con texto, salvo que sea desobediente;
+    `delay` simula la latencia de cada llamada al modelo
+    """
+
+    def __init__(self, calls=(), text: str = "Hecho.", obey_tool_config: bool = True, delay: float = 0.0):
+        self.calls = iter(calls)
+        self.text = text
+        self.obey_tool_config = obey_tool_config
+        self.delay = delay
+        self.results = []
+        self.tool_configs = []
+
+    async def send_message_async(self, content, tool_config=None):
+        self.tool_configs.append(tool_config)
+        if isinstance(content, tuple):
+            self.results.append(content[1])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if not (tool_config and self.obey_tool_config):
+            call = next(self.calls, None)
+            if call is not None:
+                name, args = call
+                return model_response(SimpleNamespace(name=name, args=args))
+        return model_response(text=self.text)
+
+class FakeModel:
+    """GenerativeModel simulado: cada start_chat abre un ScriptedChat con el mismo guion"""
+
+    def __init__(self, calls=(), text: str = "Hecho.", delay: float = 0.0):
+        self.calls = list(calls)
+        self.text = text
+        self.delay = delay
+        self.chats = []
+
+    def start_chat(self, history=None, **kwargs):
+        chat = ScriptedChat(self.calls, self.text, delay=self.delay)
+        self.chats.append(chat)
+        return chat
+
+class FakeDispatcher:
+    """Dispatcher de tools que registra las llamadas y devuelve un resultado fijo por tool"""
+
+    def __init__(self):
+        self.results = {}
+        self.default = {"success": True}
+        self.calls = []
+
+    async def dispatch(self, name, args):
+        self.calls.append(name)
+        return self.results.get(name, self.default)
+
+@pytest.fixture
+def fake_llm():
+    """Clases del modelo simulado: fake_llm.chat(calls, text...) y fake_llm.model(calls, text...)"""
+    return SimpleNamespace(chat=ScriptedChat, model=FakeModel)
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """FakeDispatcher instalado como dispatcher de tools del proceso"""
+    fake = FakeDispatcher()
+    monkeypatch.setattr(tool_server, "get_tool_dispatcher", lambda: fake)
+    return fake
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    """Fábrica de AgentRunner con el modelo indicado; los resultados de tools llegan al chat como (tool, resultado)"""
+    def factory(agent_id: str = "reservas_agent", agent_type: AgentType = AgentType.RESERVAS, model=None) -> AgentRunner:
+        agent = AgentRunner(agent_id, agent_type, model=model)
+        # El resultado que recibe el modelo, sin construir protos del SDK
+        monkeypatch.setattr(agent, "_function_response", lambda name, result: (name, result))
+        return agent
+    return factory
+
+@pytest.fixture
+def agent(make_agent, dispatcher):
+    """Agente de reservas sin modelo (los tests le pasan el chat), con métricas y sesiones limpias"""
+    metrics.reset()
+    session_store.clear()
+    return make_agent()
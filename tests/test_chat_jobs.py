@@ -0,0 +1,124 @@
+"""
+Test de la cola de turnos asíncronos /chat/jobs (no necesita servicio ni API)
+"""
+import asyncio
+
+import httpx
+
+import fair_scheduler
+import main
+from chat_jobs import CANCELLED, DONE, FAILED, ChatJobQueue, JobQueueFull
+from idempotency import current_scope
+from log_pipeline import debug_enabled
+
+async def _turno(payload):
+    await asyncio.sleep(payload.get("delay", 0.05))
+    if payload.get("fail"):
+        raise RuntimeError("fallo del agente")
+    return {"response": payload["msg"]}
+
+def test_cola_acotada_y_long_polling():
+    """Un worker, cola de 1: el tercer job se rechaza y el long polling devuelve el resultado"""
+    async def scenario():
+        queue = ChatJobQueue(_turno, workers=1, max_queued=1, ttl=60)
+        queue.start()
+        first = queue.submit({"msg": "uno"})
+        await asyncio.sleep(0)  # el worker toma el primero
+        second = queue.submit({"msg": "dos"})
+        try:
+            queue.submit({"msg": "tres"})
+            raise AssertionError("La cola debería estar llena")
+        except JobQueueFull:
+            pass
+
+        job = await queue.wait(second.id, timeout=2)
+        assert job.status == DONE and job.result == {"response": "dos"}
+        data = job.to_dict()
+        assert data["queue_wait_ms"] >= 40 and "processing_ms" in data
+        assert first.status == DONE
+        await queue.stop()
+    asyncio.run(scenario())
+
+def test_cancelacion_errores_y_ttl():
+    """Cancelación en ejecución y en cola, errores del turno y caducidad de los resultados"""
+    async def scenario():
+        queue = ChatJobQueue(_turno, workers=1, max_queued=10, ttl=0.05)
+        queue.start()
+        running = queue.submit({"msg": "largo", "delay": 5})
+        queued = queue.submit({"msg": "en cola"})
+        failing = queue.submit({"msg": "x", "fail": True})
+        await asyncio.sleep(0.01)
+
+        assert queue.cancel(running.id).status == CANCELLED
+        assert queue.cancel(queued.id).status == CANCELLED
+        job = await queue.wait(failing.id, timeout=2)
+        assert job.status == FAILED and "fallo del agente" in job.error
+
+        await asyncio.sleep(0.1)
+        assert queue.get(failing.id) is None
+        await queue.stop()
+    asyncio.run(scenario())
+
+def test_cancelados_en_cola_liberan_hueco():
+    """Un job cancelado mientras espera no cuenta para el límite de la cola"""
+    async def scenario():
+        queue = ChatJobQueue(_turno, workers=1, max_queued=1, ttl=60)
+        queue.start()
+        running = queue.submit({"msg": "largo", "delay": 5})
+        await asyncio.sleep(0)  # el worker toma el primero
+        for i in range(3):
+            queued = queue.submit({"msg": f"cancelado {i}"})
+            assert queue.cancel(queued.id).status == CANCELLED
+            assert queue.queued == 0
+        last = queue.submit({"msg": "último"})
+        assert queue.status()["queued"] == 1
+
+        queue.cancel(running.id)
+        job = await queue.wait(last.id, timeout=2)
+        assert job.status == DONE and queue.queued == 0
+        await queue.stop()
+    asyncio.run(scenario())
+
+class ContextSystem:
+    """Sistema simulado que anota el contexto con el que se ejecuta el turno"""
+
+    def __init__(self):
+        self.seen = []
+
+    async def process_message(self, user_message, session_id=None, history=None):
+        self.seen.append({"client": fair_scheduler._client.get(), "scope": current_scope(), "debug": debug_enabled()})
+        return {"success": True, "response": "Hecho.", "agents_used": ["reservas_agent"]}
+
+def test_job_con_el_contexto_de_la_peticion():
+    """Cliente, Idempotency-Key y X-Debug-Log de la petición llegan al turno encolado, como en /chat"""
+    system = ContextSystem()
+    saved = main.chat_jobs, main.multi_agent_system
+
+    async def scenario():
+        main.chat_jobs = ChatJobQueue(main._run_chat_job, workers=1, max_queued=10, ttl=60)
+        main.multi_agent_system = system
+        main.chat_jobs.start()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/chat/jobs",
+                json={"messages": [{"role": "user", "content": "Reserva para 2"}], "session_id": "s-job"},
+                headers={"X-Client-Id": "app-movil", "Idempotency-Key": "clave-1", "X-Debug-Log": "1"}
+            )
+            assert response.status_code == 202
+            job = await main.chat_jobs.wait(response.json()["job_id"], timeout=2)
+        assert job.status == DONE
+        await main.chat_jobs.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        main.chat_jobs, main.multi_agent_system = saved
+    assert system.seen == [{"client": "app-movil", "scope": "clave-1", "debug": True}]
+
+if __name__ == "__main__":
+    test_cola_acotada_y_long_polling()
+    test_cancelacion_errores_y_ttl()
+    test_cancelados_en_cola_liberan_hueco()
+    test_job_con_el_contexto_de_la_peticion()
+    print("✅ Tests de jobs de chat completados")
@@ -0,0 +1,50 @@
+"""
+Test de la reconstrucción de contexto del modo sin estado (no necesita servicio ni API)
+"""
+from conversation import build_history
+
+def _conversation(turns: int):
+    messages = [("assistant", "¡Hola! ¿En qué puedo ayudarte?")]
+    for i in range(turns):
+        messages.append(("user", f"Pregunta {i}"))
+        messages.append(("assistant", f"Respuesta {i}"))
+    return messages
+
+def test_historial_alterno():
+    """El saludo inicial se descarta y el historial alterna usuario/modelo"""
+    history, current = build_history(_conversation(2) + [("user", "¿Y el horario?")], window=10, max_chars=8000)
+
+    assert current == "¿Y el horario?"
+    assert [item["role"] for item in history] == ["user", "model", "user", "model"]
+    assert history[0]["parts"] == ["Pregunta 0"]
+
+def test_ventana_y_resumen():
+    """Los mensajes fuera de la ventana se compactan en un resumen"""
+    history, _ = build_history(_conversation(10) + [("user", "Gracias")], window=4, max_chars=8000)
+
+    assert history[0]["role"] == "user"
+    assert "Resumen" in history[0]["parts"][0]
+    assert "Pregunta 0" in history[0]["parts"][0]
+    assert history[-1]["parts"] == ["Respuesta 9"]
+    assert len(history) == 4
+
+def test_presupuesto_de_caracteres():
+    """Los mensajes antiguos se recortan hasta caber en el presupuesto"""
+    messages = [("user", "x" * 5000), ("assistant", "y" * 5000), ("user", "¿Algo más?")]
+    history, _ = build_history(messages, window=10, max_chars=1000)
+
+    assert sum(len(item["parts"][0]) for item in history) <= 1000
+
+def test_turno_sin_respuesta():
+    """Un mensaje de usuario sin respuesta se une al mensaje actual"""
+    history, current = build_history([("user", "Quiero reservar"), ("user", "para 4")], window=10, max_chars=8000)
+
+    assert history == []
+    assert current == "Quiero reservar\n\npara 4"
+
+if __name__ == "__main__":
+    test_historial_alterno()
+    test_ventana_y_resumen()
+    test_presupuesto_de_caracteres()
+    test_turno_sin_respuesta()
+    print("✅ Tests de contexto sin estado completados")
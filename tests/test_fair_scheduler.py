@@ -0,0 +1,121 @@
+"""
+Test del planificador justo de turnos (no necesita servicio ni API)
+"""
+import asyncio
+
+import pytest
+
+import multi_agents
+from agent_runner import MultiAgentRunner
+from fair_scheduler import FairScheduler, SessionQueueFull
+from load_shedding import LoadShedder, OverloadDetector
+
+async def _turn(scheduler, order, session, client, hold=0.01):
+    async with scheduler.slot(session, client):
+        order.append((client, session))
+        await asyncio.sleep(hold)
+
+def test_reparto_entre_clientes():
+    """Un cliente que inunda la cola no retrasa los turnos de otro más allá de su parte"""
+    async def run():
+        scheduler = FairScheduler(capacity=1)
+        order = []
+        flood = [asyncio.create_task(_turn(scheduler, order, f"a{i}", "abusivo")) for i in range(8)]
+        await asyncio.sleep(0)
+        normal = [asyncio.create_task(_turn(scheduler, order, f"b{i}", "normal")) for i in range(2)]
+        await asyncio.gather(*flood, *normal)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    clients = [client for client, _ in order]
+    # El primer turno del abusivo ya tenía la plaza; en la cola los clientes se alternan
+    assert clients[:5] == ["abusivo", "abusivo", "normal", "abusivo", "normal"]
+    assert scheduler.in_flight == 0 and not scheduler._queues and not scheduler._clients
+
+def test_un_turno_en_curso_por_sesion_en_orden():
+    """Los turnos de una sesión se ejecutan de uno en uno y en orden de llegada"""
+    async def run():
+        scheduler = FairScheduler(capacity=4)
+        running = {"now": 0, "max": 0}
+        order = []
+
+        async def turn(n):
+            async with scheduler.slot("s1") as wait_ms:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+                order.append(n)
+                await asyncio.sleep(0.02)
+                running["now"] -= 1
+                return wait_ms
+
+        waits = await asyncio.gather(*(turn(n) for n in range(3)))
+        return running["max"], order, waits, scheduler.session_wait("s1")
+
+    max_running, order, waits, stats = asyncio.run(run())
+    assert max_running == 1 and order == [0, 1, 2]
+    assert waits[2] >= 30 and stats["turns"] == 3 and stats["max_wait_ms"] >= 30
+
+def test_cola_de_sesion_llena_y_cancelacion():
+    """Más turnos en espera de los permitidos se rechazan; un turno cancelado en cola no deja rastro"""
+    async def run():
+        scheduler = FairScheduler(capacity=1, max_queued_per_session=1)
+        order = []
+        first = asyncio.create_task(_turn(scheduler, order, "s1", "c", hold=0.05))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(_turn(scheduler, order, "s1", "c"))
+        other = asyncio.create_task(_turn(scheduler, order, "s2", "d"))
+        await asyncio.sleep(0)
+        with pytest.raises(SessionQueueFull):
+            await _turn(scheduler, order, "s1", "c")
+        queued.cancel()
+        await asyncio.gather(first, other, return_exceptions=True)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    assert order == [("c", "s1"), ("d", "s2")]
+    assert scheduler.in_flight == 0 and not scheduler._queues and not scheduler._clients
+
+class BlockedRunner(MultiAgentRunner):
+    """Runner cuyos turnos esperan a que el test los libere"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def execute_agent(self, agent_id, message, history=None, session_id=None):
+        await self.release.wait()
+        if agent_id == "orchestrator":
+            return {"success": True, "response": '{"agents": ["reservas_agent"], "reasoning": "Reserva"}'}
+        return {"success": True, "response": "Reserva cancelada"}
+
+def test_turnos_en_cola_activan_el_modo_degradado(monkeypatch):
+    """Los turnos que esperan plaza cuentan como en curso: la cola llena dispara la sobrecarga"""
+    shedder = LoadShedder(True, OverloadDetector(max_in_flight=3, p95_latency_ms=10000, max_error_rate=0.5, min_samples=5))
+    monkeypatch.setattr(multi_agents, "fair_scheduler", FairScheduler(capacity=1, max_queued_per_session=1))
+    monkeypatch.setattr(multi_agents, "load_shedder", shedder)
+
+    async def run():
+        runner = BlockedRunner()
+        system = multi_agents.RestauranteMultiAgentSystem(
+            speculative=False, mode="multi", navigation_fast_path=False, runner=runner
+        )
+        turns = [asyncio.create_task(system.process_message("Quiero cancelar mi reserva", f"s{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        # Uno con plaza y dos en cola (capacidad 1): el umbral de 3 turnos ya se alcanza
+        assert multi_agents.fair_scheduler.in_flight == 1 and shedder.detector.in_flight == 3
+        degraded = await system.process_message("¿Qué horario tenéis?", "otra")
+
+        # Un turno rechazado por la cola de su sesión (s1 ya tiene uno esperando) no cuenta como error
+        with pytest.raises(SessionQueueFull):
+            await system.process_message("Quiero cancelar mi reserva", "s1")
+        runner.release.set()
+        return degraded, await asyncio.gather(*turns)
+
+    degraded, results = asyncio.run(run())
+    assert degraded["served_mode"] == "degraded"
+    assert all(result["success"] for result in results)
+    assert shedder.detector.in_flight == 0 and len(shedder.detector._samples) == 3
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,126 @@
+"""
+Test de las claves de idempotencia de crear_reserva contra una API Node simulada
+(httpx.MockTransport, no necesita servicio ni API)
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from config import get_settings
+from idempotency import IDEMPOTENCY_HEADER, idempotency_scope
+from mcp_tools import TOOLS_DEFINITIONS, RestauranteTools
+from tool_registry import ToolRegistry
+
+ARGS = {
+    "nombre_cliente": "Laura Martín",
+    "telefono_cliente": "612 345 678",
+    "email_cliente": "laura@example.com",
+    "fecha_reserva": "2030-01-10T20:00",
+    "num_personas": 4,
+}
+
+class FakeBackend:
+    """POST /reservas que deduplica por Idempotency-Key (puede tardar en responder) y cancelación"""
+
+    def __init__(self, delays=()):
+        self.delays = list(delays)
+        self.posts = []
+        self.reservas = {}
+        self.cancelled = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/cancelar"):
+            self.cancelled.append(request.url.path.split("/")[-2])
+            return httpx.Response(200, json={})
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        self.posts.append(key)
+        if key not in self.reservas:
+            self.reservas[key] = f"TOKEN{len(self.reservas) + 1}"
+        # La reserva ya existe aunque la respuesta llegue tarde (o nunca)
+        await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+        token = self.reservas[key]
+        return httpx.Response(201, json={"reserva": {"token": token}, "token": token})
+
+@pytest.fixture
+def backend_dedup(monkeypatch):
+    """La API Node simulada deduplica por Idempotency-Key"""
+    monkeypatch.setattr(get_settings(), "backend_idempotency_keys", True)
+
+def _registry(backend: FakeBackend, timeout: float = 1.0) -> ToolRegistry:
+    tools = RestauranteTools()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(backend.handle))
+    tools._shared_client = lambda: client
+    registry = ToolRegistry(TOOLS_DEFINITIONS, tools)
+    registry.get("crear_reserva").timeout = timeout
+    return registry
+
+def test_repeticion_devuelve_el_resultado_original():
+    """Misma sesión y argumentos: un solo POST con la clave y el mismo token"""
+    backend = FakeBackend()
+    registry = _registry(backend)
+
+    async def run():
+        with idempotency_scope("sesion-a"):
+            first = await registry.dispatch("crear_reserva", dict(ARGS))
+            # El teléfono con otro formato se normaliza antes de calcular la clave
+            again = await registry.dispatch("crear_reserva", {**ARGS, "telefono_cliente": "612-345-678"})
+        with idempotency_scope("sesion-b"):
+            other = await registry.dispatch("crear_reserva", dict(ARGS))
+        return first, again, other
+
+    first, again, other = asyncio.run(run())
+    assert first["token"] == again["token"] == "TOKEN1"
+    assert other["token"] == "TOKEN2"
+    assert len(backend.posts) == 2 and all(backend.posts)
+
+def test_reintento_tras_timeout_y_duplicados_concurrentes(backend_dedup):
+    """El reintento tras un timeout reutiliza la clave y las llamadas simultáneas esperan a la primera"""
+    backend = FakeBackend(delays=[0.3])
+    registry = _registry(backend, timeout=0.1)
+
+    async def run():
+        with idempotency_scope("sesion-a"):
+            return await asyncio.gather(*(registry.dispatch("crear_reserva", dict(ARGS)) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert [r["token"] for r in results] == ["TOKEN1"] * 3
+    # Primer POST agotado + reintento con la misma clave: una sola reserva
+    assert len(backend.posts) == 2 and backend.posts[0] == backend.posts[1]
+    assert len(backend.reservas) == 1
+
+def test_sin_deduplicacion_del_backend_no_se_reintenta():
+    """Por defecto un POST agotado no se reenvía: podría duplicar la reserva"""
+    backend = FakeBackend(delays=[0.3])
+    registry = _registry(backend, timeout=0.1)
+    assert registry.get("crear_reserva").idempotent is False
+
+    async def run():
+        with idempotency_scope("sesion-a"):
+            return await registry.dispatch("crear_reserva", dict(ARGS))
+
+    result = asyncio.run(run())
+    assert result["success"] is False and "no se sabe" in result["error"]
+    assert len(backend.posts) == 1
+
+def test_reservar_de_nuevo_tras_cancelar(backend_dedup):
+    """Cancelar y repetir la misma reserva en la sesión crea una reserva nueva (otra clave)"""
+    backend = FakeBackend()
+    registry = _registry(backend)
+
+    async def run():
+        with idempotency_scope("sesion-a"):
+            first = await registry.dispatch("crear_reserva", dict(ARGS))
+            cancelled = await registry.dispatch("cancelar_reserva", {"token": first["token"]})
+            again = await registry.dispatch("crear_reserva", dict(ARGS))
+            repeated = await registry.dispatch("crear_reserva", dict(ARGS))
+        return first, cancelled, again, repeated
+
+    first, cancelled, again, repeated = asyncio.run(run())
+    assert cancelled["success"] is True and backend.cancelled == ["TOKEN1"]
+    assert first["token"] == "TOKEN1" and again["token"] == repeated["token"] == "TOKEN2"
+    assert len(backend.posts) == 2 and backend.posts[0] != backend.posts[1]
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,68 @@
+"""
+Test de presupuesto de tiempo de importación (python -X importtime)
+Verifica que los módulos del servicio no cargan SDKs pesados al importarse
+y que el arranque en frío se mantiene dentro del presupuesto
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Presupuesto de importación en milisegundos (tiempo acumulado del módulo)
+BUDGETS_MS = {
+    "main": float(os.getenv("IMPORT_BUDGET_MAIN_MS", 1000)),
+    "multi_agents": float(os.getenv("IMPORT_BUDGET_MODULE_MS", 150)),
+    "agent_runner": float(os.getenv("IMPORT_BUDGET_MODULE_MS", 150)),
+    "mcp_tools": float(os.getenv("IMPORT_BUDGET_MODULE_MS", 150)),
+}
+
+# Módulos que nunca deben cargarse al importar el servicio
+LAZY_MODULES = ["google.generativeai", "httpx", "grpc"]
+
+def import_profile(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Importa un módulo en un proceso limpio con -X importtime
+
+    Returns:
+        (ms acumulados del módulo, {módulo importado: ms acumulados})
+    """
+    env = dict(os.environ)
+    env.pop("GEMINI_API_KEY", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    assert proc.returncode == 0, f"No se pudo importar {module}:\n{proc.stderr[-2000:]}"
+
+    imported = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported[name.strip()] = int(cumulative) / 1000
+
+    return imported.get(module, 0.0), imported
+
+def test_import_budget():
+    """Cada módulo se importa dentro de su presupuesto y sin SDKs pesados"""
+    for module, budget_ms in BUDGETS_MS.items():
+        elapsed_ms, imported = import_profile(module)
+        print(f"⏱️ {module}: {elapsed_ms:.1f} ms (presupuesto {budget_ms:.0f} ms)")
+
+        loaded = [m for m in LAZY_MODULES if m in imported]
+        assert not loaded, f"{module} importa módulos pesados al cargarse: {loaded}"
+        assert elapsed_ms <= budget_ms, f"{module} tarda {elapsed_ms:.1f} ms en importarse (> {budget_ms:.0f} ms)"
+
+def test_import_sin_api_key():
+    """Importar main no debe fallar aunque falte GEMINI_API_KEY (se valida al arrancar)"""
+    import_profile("main")
+
+if __name__ == "__main__":
+    test_import_budget()
+    test_import_sin_api_key()
+    print("✅ Presupuesto de importación respetado")
@@ -0,0 +1,76 @@
+"""
+Test del modo degradado bajo sobrecarga (no necesita servicio ni API)
+"""
+import asyncio
+import time
+
+from load_shedding import LoadShedder, OverloadDetector
+from menu_cache import menu_cache
+from session_state import session_store
+
+MENUS = [
+    {"id": 1, "nombre": "Menú del día", "precio": 14.5, "valoracion_promedio": 4.1},
+    {"id": 2, "nombre": "Menú degustación", "precio": 45.0, "valoracion_promedio": 4.8},
+]
+
+def _shedder(**thresholds) -> LoadShedder:
+    config = {"max_in_flight": 100, "p95_latency_ms": 10000, "max_error_rate": 0.5, "min_samples": 5}
+    config.update(thresholds)
+    return LoadShedder(True, OverloadDetector(**config))
+
+def test_disparadores():
+    """Cada disparador activa el modo degradado por separado"""
+    shedder = _shedder(max_in_flight=2)
+    assert not shedder.detector.is_overloaded()
+    with shedder.track(), shedder.track():
+        assert shedder.detector.is_overloaded()
+        assert shedder.detector.reason == "queue_depth"
+
+    slow = _shedder()
+    for _ in range(10):
+        slow.detector.record(20000, True)
+    assert slow.detector.is_overloaded() and slow.detector.reason == "latency"
+
+    failing = _shedder()
+    for _ in range(10):
+        failing.detector.record(100, False)
+    assert failing.detector.is_overloaded() and failing.detector.reason == "error_rate"
+
+def test_respuestas_degradadas():
+    """Navegación, información y menús se responden sin LLM; reservas no"""
+    shedder = _shedder(max_in_flight=0)
+    menu_cache.menus = MENUS
+    menu_cache.updated_at = time.monotonic()
+    session_store.reset("s-degradada")
+
+    navigation = asyncio.run(shedder.try_degraded("Llévame a ver mis reservas", "s-degradada"))
+    assert navigation["navigation_action"] == "consultar_reserva"
+    assert navigation["served_mode"] == "degraded"
+
+    info = asyncio.run(shedder.try_degraded("¿Qué horario tenéis?", "s-degradada"))
+    assert "9:00" in info["response"]
+
+    menus = asyncio.run(shedder.try_degraded("¿Qué menú me recomiendas?", "s-degradada"))
+    assert "Menú degustación" in menus["response"]
+
+    assert asyncio.run(shedder.try_degraded("Quiero cancelar mi reserva", "s-degradada")) is None
+    assert shedder.served_mode == "overload_llm"
+
+def test_reservas_en_curso_y_mensajes_sin_clasificar():
+    """Los seguimientos de una reserva y lo que no se clasifica siguen yendo al LLM"""
+    shedder = _shedder(max_in_flight=0)
+    for message in ("Sí, a las 9", "laura@example.com", "Laura Martín"):
+        assert asyncio.run(shedder.try_degraded(message, "s-nueva")) is None
+
+    session_store.remember_agents("s-reserva", ["reservas_agent"])
+    assert asyncio.run(shedder.try_degraded("Hola, ¿qué horario tenéis?", "s-reserva")) is None
+    session_store.remember_agents("s-info", ["info_agent"])
+    assert asyncio.run(shedder.try_degraded("Hola, ¿qué horario tenéis?", "s-info"))["served_mode"] == "degraded"
+    session_store.reset("s-reserva")
+    session_store.reset("s-info")
+
+if __name__ == "__main__":
+    test_disparadores()
+    test_respuestas_degradadas()
+    test_reservas_en_curso_y_mensajes_sin_clasificar()
+    print("✅ Tests de modo degradado completados")
@@ -0,0 +1,39 @@
+"""
+Test del pipeline de logs con workers creados por fork (no necesita servicio ni API)
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Reproduce el lanzador de producción: el padre configura el logging sin hilo, hace fork
+# y el worker arranca su propio listener antes de loguear
+FORK_SCRIPT = """
+import logging, os
+from config import configure_logging, stop_logging
+
+configure_logging(threaded=False)
+logging.getLogger("padre").warning("log del padre")
+pid = os.fork()
+if pid == 0:
+    configure_logging()
+    logging.getLogger("worker").warning("log del worker")
+    stop_logging()
+    os._exit(0)
+os.waitpid(pid, 0)
+"""
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requiere fork")
+def test_logs_de_workers_tras_fork():
+    """Los logs del worker llegan a stderr (su cola tiene un hilo que la vacía)"""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, LOG_SAMPLING="", LOG_LEVEL="INFO")
+    result = subprocess.run([sys.executable, "-c", FORK_SCRIPT], env=env, capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert "log del padre" in result.stderr
+    assert "log del worker" in result.stderr
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
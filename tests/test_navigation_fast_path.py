@@ -0,0 +1,79 @@
+"""
+Test de la vía rápida de navegación (no necesita servicio ni API)
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from intents import match_navigation
+from metrics import metrics
+from multi_agents import RestauranteMultiAgentSystem
+
+PHRASES_FILE = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "navigation_phrases.json")
+THRESHOLD = 0.8
+
+class NoLLMRunner:
+    """Runner que falla si el turno llega a los agentes"""
+
+    async def execute_agent(self, *args, **kwargs):
+        raise AssertionError("El turno no debería llegar al LLM")
+
+def _system() -> RestauranteMultiAgentSystem:
+    return RestauranteMultiAgentSystem(speculative=False, mode="multi", navigation_fast_path=True, runner=NoLLMRunner())
+
+def test_precision_y_cobertura():
+    """Sobre el conjunto etiquetado: casi nunca navega mal y resuelve la mayoría sin LLM"""
+    with open(PHRASES_FILE, encoding="utf-8") as f:
+        phrases = json.load(f)
+
+    served = correct = 0
+    for phrase in phrases:
+        target, confidence = match_navigation(phrase["text"])
+        if confidence >= THRESHOLD:
+            served += 1
+            correct += target == phrase["target"]
+    expected = sum(1 for phrase in phrases if phrase["target"])
+    assert correct / served >= 0.95
+    assert correct / expected >= 0.85
+
+# Reservas y preguntas sobre el contenido de una sección: siempre a los agentes
+NOT_NAVIGATION = (
+    "Quiero hacer una reserva",
+    "quiero reservar",
+    "ver los precios de los menús",
+    "quiero ver el menú más valorado",
+    "muéstrame el menú del día",
+    "consultar disponibilidad de menús",
+    "abre la carta de vinos",
+    "quiero dejar una reseña del menú degustación",
+)
+
+@pytest.mark.parametrize("message", NOT_NAVIGATION)
+def test_reservas_y_contenido_no_son_navegacion(message):
+    assert match_navigation(message)[1] < THRESHOLD
+
+def test_confianza():
+    """Peticiones cortas y explícitas superan el umbral; con detalles o preguntas, no"""
+    assert match_navigation("Llévame a la carta") == ("menu", 0.9)
+    assert match_navigation("mis reservas")[0] == "consultar_reserva"
+    assert match_navigation("Quiero valorar un menú")[0] == "valorar"
+    assert match_navigation("Quiero reservar para el viernes a las 21:00")[1] < THRESHOLD
+    assert match_navigation("Consultar mi reserva ABC123XYZ")[1] < THRESHOLD
+    assert match_navigation("¿Qué menú me recomiendas?")[1] < THRESHOLD
+    assert match_navigation("¿A qué hora abrís?") == (None, 0.0)
+
+def test_process_message_sin_llm():
+    """La navegación se responde con plantilla y sin llamadas al modelo"""
+    metrics.reset()
+    result = asyncio.run(_system().process_message("Volver al inicio", "s1"))
+    assert result["navigation_action"] == "home"
+    assert result["served_mode"] == "fast_path"
+    assert result["usage"]["llm_calls"] == 0
+    assert "[NAVEGAR" not in result["response"]
+    assert metrics.get_counter("navigation_fast_path", target="home", outcome="served") == 1
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
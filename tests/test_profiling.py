@@ -0,0 +1,77 @@
+"""
+Test del profiler por petición y de los endpoints /profiles (no necesita servicio ni API)
+"""
+import asyncio
+import logging
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from profiling import RequestProfiler
+
+def _profiler(directory, enabled=True) -> RequestProfiler:
+    return RequestProfiler(enabled=enabled, sample_rate=0.0, directory=str(directory), max_files=2)
+
+async def _turn():
+    await asyncio.sleep(0)
+    return sum(range(1000))
+
+def _profile(profiler, **metadata):
+    # asyncio.run espera al executor, así que el perfil ya está guardado al volver
+    return asyncio.run(profiler.run(_turn(), **metadata))
+
+def test_perfil_guardado_y_retencion(tmp_path):
+    """Cada perfil deja .prof y .json anotados; solo se conservan max_files"""
+    profiler = _profiler(tmp_path)
+    for session in ("s1", "s2", "s3"):
+        assert _profile(profiler, session_id=session) == sum(range(1000))
+
+    profiles = profiler.list_profiles()
+    assert [p["session_id"] for p in profiles] == ["s3", "s2"]
+    assert "top_functions" not in profiles[0] and profiles[0]["duration_ms"] >= 0
+    assert profiler.profile_path(profiles[0]["profile_id"]).endswith(".prof")
+
+def test_ids_fuera_del_directorio(tmp_path):
+    """Ni rutas relativas ni enlaces que salen del directorio de perfiles"""
+    directory = tmp_path / "profiles"
+    directory.mkdir()
+    secret = tmp_path / "secret.prof"
+    secret.write_text("x")
+    os.symlink(secret, directory / "fuera.prof")
+    profiler = _profiler(directory)
+
+    assert profiler.profile_path("../secret") is None
+    assert profiler.profile_path("..") is None
+    assert profiler.profile_path("fuera") is None
+    assert profiler.profile_path("no-existe") is None
+
+def test_error_al_guardar_se_registra(tmp_path, caplog):
+    """Un fallo en el executor no se pierde: queda en el log"""
+    not_a_directory = tmp_path / "fichero"
+    not_a_directory.write_text("x")
+    profiler = _profiler(not_a_directory)
+
+    with caplog.at_level(logging.WARNING, logger="profiling"):
+        assert _profile(profiler, session_id="s1") == sum(range(1000))
+    assert any("No se pudo guardar el perfil" in record.getMessage() for record in caplog.records)
+
+def test_endpoints_solo_con_profiling_activado(tmp_path, monkeypatch):
+    """Con PROFILING_ENABLED=false /profiles y /profiles/{id} responden 404"""
+    profiler = _profiler(tmp_path)
+    _profile(profiler, session_id="s1")
+    profile_id = profiler.list_profiles()[0]["profile_id"]
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main, "request_profiler", profiler)
+    assert client.get("/profiles").json()["profiles"][0]["session_id"] == "s1"
+    assert client.get(f"/profiles/{profile_id}").status_code == 200
+
+    monkeypatch.setattr(main, "request_profiler", _profiler(tmp_path, enabled=False))
+    assert client.get("/profiles").status_code == 404
+    assert client.get(f"/profiles/{profile_id}").status_code == 404
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
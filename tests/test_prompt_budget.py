@@ -0,0 +1,46 @@
+"""
+Test del compilador de prompts y del presupuesto de tokens (no necesita servicio ni API)
+"""
+import json
+import os
+
+import pytest
+
+from multi_agents import AGENT_PROMPTS, AgentFactory
+from prompt_compiler import PROMPT_VARIANTS, compile_prompt, prompt_stats
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "prompt_budget.json")
+CONTEXT = {"current_datetime": "2030-01-10 12:00:00", "current_year": "2030", "current_month": "01"}
+
+def test_compilacion():
+    """Sustituye el contexto sin tocar los JSON de ejemplo y quita elementos repetidos"""
+    template = 'Fecha: {current_datetime}\n- Horario 9-23\n- Horario 9-23   \n\n\n\nEjemplo: {"agents": []} {otro}\n'
+    assert compile_prompt(template, CONTEXT) == (
+        'Fecha: 2030-01-10 12:00:00\n- Horario 9-23\n\nEjemplo: {"agents": []} {otro}\n'
+    )
+
+@pytest.mark.parametrize("agent_id", list(AGENT_PROMPTS))
+def test_presupuesto(agent_id):
+    """Cada variante cabe en el presupuesto del agente y la compacta no ocupa más que la original"""
+    with open(BUDGET_FILE, encoding="utf-8") as f:
+        budget = json.load(f)["budgets"][agent_id]
+    declarations = AgentFactory._function_declarations(AgentFactory._agent_tools(agent_id))
+    stats = {variant: prompt_stats(AGENT_PROMPTS[agent_id][variant], CONTEXT, declarations) for variant in PROMPT_VARIANTS}
+    assert all(s["total_tokens"] <= budget for s in stats.values())
+    assert stats["compact"]["total_tokens"] <= stats["full"]["total_tokens"]
+
+def test_variante_compacta_conserva_las_reglas():
+    """Marcadores de navegación, agentes del routing y fecha siguen en los prompts compactos"""
+    info = AgentFactory.system_prompt("info_agent", "compact")
+    for target in ("consultar_reserva", "reserva", "menu", "valorar", "home"):
+        assert f"[NAVEGAR:{target}]" in info
+    orchestrator = AgentFactory.system_prompt("orchestrator", "compact")
+    assert all(agent in orchestrator for agent in ("reservas_agent", "menus_agent", "info_agent"))
+    # Todos los marcadores de fecha quedan sustituidos
+    assert "{" not in AgentFactory.system_prompt("reservas_agent", "compact")
+    with pytest.raises(ValueError):
+        AgentFactory.system_prompt("info_agent", "mini")
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
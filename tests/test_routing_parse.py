@@ -0,0 +1,48 @@
+"""
+Test del parser estricto de la decisión del orquestador (no necesita servicio ni API)
+"""
+import pytest
+
+from agent_runner import MultiAgentRunner
+from metrics import metrics
+from multi_agents import RestauranteMultiAgentSystem, RoutingParseError, parse_routing_decision
+
+def test_decision_valida():
+    """JSON del esquema, con o sin vallas ```json; los agentes repetidos se quitan"""
+    assert parse_routing_decision('{"agents": ["menus_agent", "info_agent"], "reasoning": "Menús y horario"}') == (
+        ["menus_agent", "info_agent"], "Menús y horario"
+    )
+    assert parse_routing_decision('```json\n{"agents": ["reservas_agent", "reservas_agent"]}\n```') == (
+        ["reservas_agent"], ""
+    )
+
+@pytest.mark.parametrize("text, reason", [
+    ("", "empty"),
+    ('Te paso con reservas: {"agents": ["reservas_agent"]}', "invalid_json"),
+    ('{"agents": ["reservas_agent"], "reas', "invalid_json"),  # Cortada por max_output_tokens
+    ('["reservas_agent"]', "not_object"),
+    ('{"agents": [], "reasoning": "?"}', "missing_agents"),
+    ('{"agents": ["pagos_agent"], "reasoning": "?"}', "unknown_agent"),
+])
+def test_decision_no_valida(text, reason):
+    with pytest.raises(RoutingParseError) as excinfo:
+        parse_routing_decision(text)
+    assert excinfo.value.reason == reason
+
+def test_fallback_local_contabilizado():
+    """Si la decisión no es válida se usa el routing por palabras clave y se cuenta en /metrics"""
+    metrics.reset()
+    system = RestauranteMultiAgentSystem(mode="multi", runner=MultiAgentRunner())
+
+    agents, _ = system._parse_routing("no es JSON", "Quiero cancelar mi reserva")
+    assert agents == ["reservas_agent"]
+    agents, _ = system._parse_routing('{"agents": ["menus_agent"], "reasoning": "Carta"}', "¿Qué platos hay?")
+    assert agents == ["menus_agent"]
+
+    assert metrics.get_counter("routing_parse", outcome="failed", reason="invalid_json") == 1
+    assert metrics.get_counter("routing_parse", outcome="ok") == 1
+    assert metrics.get_counter("routing_fallback", reason="invalid_json", agent="reservas_agent") == 1
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
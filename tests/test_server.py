@@ -0,0 +1,109 @@
+"""
+Test del lanzador de producción: drenado con SIGTERM y relanzado de workers que no arrancan
+Arranca server.serve en un proceso aparte con un sistema simulado (no necesita servicio ni API)
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Lanzador con 2 workers; el sistema tarda CHAT_DELAY segundos por turno y el calentamiento no sale a la red
+LAUNCHER = """
+import asyncio, sys
+import main, server
+
+class SlowSystem:
+    async def process_message(self, user_message, session_id=None, history=None):
+        await asyncio.sleep(float(sys.argv[2]))
+        return {"success": True, "response": "Hecho.", "agents_used": ["reservas_agent"]}
+
+main.multi_agent_system = SlowSystem()
+main.warmup.start = lambda *args, **kwargs: None
+if sys.argv[3] == "crash":
+    def crash(*args):
+        raise RuntimeError("fallo al arrancar")
+    server._run_worker = crash
+server.serve("127.0.0.1", int(sys.argv[1]), workers=2, graceful_timeout=10)
+"""
+
+CHAT_DELAY = 1.0
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _launch(tmp_path, mode: str, **env):
+    script = tmp_path / "launcher.py"
+    script.write_text(LAUNCHER)
+    port = _free_port()
+    environment = {**os.environ, "PYTHONPATH": SRC_DIR, "WORKER_WARMUP_STAGGER": "0",
+                   "TRACING_ENABLED": "false", "GEMINI_API_KEY": "test", **env}
+    process = subprocess.Popen(
+        [sys.executable, "-u", str(script), str(port), str(CHAT_DELAY), mode],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=environment
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+def _wait_until_up(process, url: str, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stdout.read()
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise AssertionError("El lanzador no llegó a responder")
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="El lanzador multi-worker necesita fork")
+def test_sigterm_drena_los_chats_en_curso(tmp_path):
+    """Con SIGTERM los chats en curso terminan con 200 y el lanzador sale limpio"""
+    process, url = _launch(tmp_path, "ok")
+    try:
+        _wait_until_up(process, url)
+        responses = []
+
+        def chat():
+            body = {"messages": [{"role": "user", "content": "Hola"}], "session_id": "s-drenado"}
+            responses.append(httpx.post(f"{url}/chat", json=body, timeout=10))
+
+        thread = threading.Thread(target=chat)
+        thread.start()
+        time.sleep(CHAT_DELAY / 3)  # el turno ya está en curso
+        process.send_signal(signal.SIGTERM)
+        thread.join(timeout=10)
+        output, _ = process.communicate(timeout=15)
+    finally:
+        process.kill()
+
+    assert [r.status_code for r in responses] == [200]
+    assert responses[0].json()["response"] == "Hecho."
+    assert process.returncode == 0
+    assert "drenando 2 workers" in output and "Todos los workers terminados" in output
+    assert "inesperadamente" not in output
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="El lanzador multi-worker necesita fork")
+def test_workers_que_no_arrancan_agotan_los_relanzados(tmp_path):
+    """Un worker que cae al arrancar se relanza con espera creciente y el lanzador acaba saliendo con 1"""
+    process, _ = _launch(tmp_path, "crash", WORKER_RESTART_BACKOFF="0.1", WORKER_MAX_RESTARTS="2")
+    try:
+        output, _ = process.communicate(timeout=20)
+    finally:
+        process.kill()
+
+    assert process.returncode == 1
+    assert "relanzando en 0.1 s" in output and "relanzando en 0.2 s" in output
+    assert "relanzando en 0.4 s" not in output
+    assert "veces seguidas al arrancar" in output and "no consiguen arrancar" in output
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,43 @@
+"""
+Test del estado compacto de sesiones (no necesita servicio ni API)
+"""
+from session_state import MODEL, USER, SessionStore
+
+def test_historial_por_sesion_y_agente():
+    """Cada sesión tiene su propio historial por agente, con roles internados"""
+    store = SessionStore(max_sessions=10)
+    store.record("a", "menus_agent", "¿Qué menús hay?", "El menú del día")
+    store.record("a", "info_agent", "¿Horario?", "De 9:00 a 23:00")
+    store.record("b", "menus_agent", "Hola", "Hola")
+
+    assert store.history("a", "menus_agent") == [
+        {"role": "user", "parts": ["¿Qué menús hay?"]},
+        {"role": "model", "parts": ["El menú del día"]},
+    ]
+    assert store.history("c", "menus_agent") == []
+    assert store.history_length("menus_agent") == 4
+
+    roles = [turn.role for turn in store._sessions["a"].turns]
+    assert roles[0] is USER and roles[1] is MODEL
+
+    store.reset("a")
+    assert store.history("a", "info_agent") == []
+    assert store.history_length("menus_agent") == 2
+
+def test_lru_acotado():
+    """Al superar max_sessions se olvidan las sesiones menos usadas"""
+    store = SessionStore(max_sessions=2)
+    store.record("a", "info_agent", "1", "1")
+    store.record("b", "info_agent", "2", "2")
+    store.remember_agents("a", ["info_agent"])  # "a" pasa a ser la más reciente
+    store.record("c", "info_agent", "3", "3")
+
+    assert len(store) == 2
+    assert store.history("b", "info_agent") == []
+    assert store.last_agents("a") == ("info_agent",)
+    assert store.status()["turns"] == 4
+
+if __name__ == "__main__":
+    test_historial_por_sesion_y_agente()
+    test_lru_acotado()
+    print("✅ Tests de estado de sesiones completados")
@@ -0,0 +1,107 @@
+"""
+Test del routing especulativo: acierto, fallo y tool de escritura (modelos simulados, sin API)
+"""
+import asyncio
+import json
+
+import pytest
+
+from agent_runner import AgentType, MultiAgentRunner, SpeculationAborted
+from metrics import metrics
+from multi_agents import RestauranteMultiAgentSystem
+from session_state import session_store
+
+MESSAGE = "Quiero cancelar mi reserva ABC123"
+CANCELAR = ("cancelar_reserva", {"token": "ABC123"})
+
+def _routing(agent_id: str) -> str:
+    return json.dumps({"agents": [agent_id], "reasoning": "test"})
+
+@pytest.fixture
+def build(make_agent, dispatcher, fake_llm, monkeypatch):
+    """
+    Sistema con orquestador y especialistas simulados; el mensaje hace especular con reservas_agent
+
+    Devuelve una función (routed, reservas_model) -> (sistema, especulaciones lanzadas)
+    """
+    metrics.reset()
+    session_store.clear()
+
+    def factory(routed: str, reservas_model, orchestrator_delay: float = 0.0):
+        runner = MultiAgentRunner()
+        runner.register_agent(make_agent("orchestrator", AgentType.ORCHESTRATOR,
+                                         fake_llm.model(text=_routing(routed), delay=orchestrator_delay)))
+        runner.register_agent(make_agent("reservas_agent", AgentType.RESERVAS, reservas_model))
+        runner.register_agent(make_agent("menus_agent", AgentType.MENUS, fake_llm.model(text="Carta.")))
+        system = RestauranteMultiAgentSystem(speculative=True, mode="multi", runner=runner)
+
+        speculations = []
+        start = system._start_speculation
+
+        def spy(*args):
+            speculation = start(*args)
+            speculations.append(speculation)
+            return speculation
+        monkeypatch.setattr(system, "_start_speculation", spy)
+        return system, speculations
+    return factory
+
+def _reservas_history(session_id: str):
+    return [(turn["role"], turn["parts"][0]) for turn in session_store.history(session_id, "reservas_agent")]
+
+def test_acierto_confirma_el_turno_una_sola_vez(build, fake_llm):
+    """El routing coincide: se usa el turno especulativo y el historial se escribe una vez"""
+    reservas = fake_llm.model(text="Reserva cancelada.")
+    system, speculations = build("reservas_agent", reservas, orchestrator_delay=0.02)
+
+    result = asyncio.run(system.process_message(MESSAGE, session_id="s1"))
+
+    assert result["success"] and result["response"] == "Reserva cancelada."
+    assert len(speculations) == 1 and speculations[0]["agent_id"] == "reservas_agent"
+    assert len(reservas.chats) == 1  # No se repite por el camino normal
+    assert _reservas_history("s1") == [("user", MESSAGE), ("model", "Reserva cancelada.")]
+    assert metrics.get_counter("speculation_hit", agent="reservas_agent") == 1
+
+def test_fallo_cancela_la_tarea_sin_tocar_el_historial(build, fake_llm):
+    """El routing elige otro agente: la tarea especulativa se cancela y la sesión no cambia"""
+    session_store.record("s1", "reservas_agent", "Hola", "¿En qué puedo ayudarte?")
+    before = _reservas_history("s1")
+    reservas = fake_llm.model(text="Reserva cancelada.", delay=5)
+    system, speculations = build("menus_agent", reservas)
+
+    async def run():
+        result = await system.process_message(MESSAGE, session_id="s1")
+        # Cancelada al terminar el turno, no al cerrar el loop (el especialista tardaría 5 s)
+        task = speculations[0]["task"]
+        await asyncio.wait([task], timeout=1)
+        return result, task.cancelled()
+
+    result, cancelled = asyncio.run(run())
+
+    assert result["response"] == "Carta."
+    assert cancelled
+    assert _reservas_history("s1") == before
+    assert metrics.get_counter("speculation_miss", agent="reservas_agent", routed="menus_agent") == 1
+
+def test_tool_de_escritura_aborta_sin_efectos(build, make_agent, dispatcher, fake_llm):
+    """Una tool con efectos en el turno especulativo lo aborta antes de ejecutarla"""
+    agent = make_agent("reservas_agent", AgentType.RESERVAS, fake_llm.model([CANCELAR], text="Cancelada."))
+    with pytest.raises(SpeculationAborted):
+        asyncio.run(agent.execute_speculative(MESSAGE, "s1"))
+    assert dispatcher.calls == []
+    assert _reservas_history("s1") == []
+
+    # En el sistema: el turno se repite por el camino normal y la escritura se ejecuta una sola vez
+    reservas = fake_llm.model([CANCELAR], text="Cancelada.")
+    system, _ = build("reservas_agent", reservas)
+    result = asyncio.run(system.process_message(MESSAGE, session_id="s1"))
+
+    assert result["response"] == "Cancelada."
+    assert dispatcher.calls == ["cancelar_reserva"]
+    assert len(reservas.chats) == 2
+    assert _reservas_history("s1") == [("user", MESSAGE), ("model", "Cancelada.")]
+    assert metrics.get_counter("speculation_aborted", agent="reservas_agent", reason="write_tool") == 1
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,50 @@
+"""
+Test del presupuesto del bucle de tools por turno (modelo y tools simulados, sin API)
+"""
+import asyncio
+import itertools
+
+import pytest
+
+from agent_runner import TOOL_LIMIT_REPLY, TurnStats
+from config import get_settings
+from metrics import metrics
+
+def _looping_chat(fake_llm, obey_tool_config=True):
+    """Chat que pide tools sin parar (cada vez otro token) salvo cuando se le prohíben (tool_config mode NONE)"""
+    calls = (("consultar_reserva", {"token": f"TOKEN{n}"}) for n in itertools.count(1))
+    return fake_llm.chat(calls, text="Esto es lo que he encontrado.", obey_tool_config=obey_tool_config)
+
+@pytest.fixture
+def runner(agent, dispatcher):
+    dispatcher.default = {"success": True, "menus": ["x" * 100]}
+    return agent
+
+def test_limite_de_iteraciones(runner, dispatcher, fake_llm, monkeypatch):
+    """Al llegar al máximo de llamadas se pide la respuesta final sin tools"""
+    monkeypatch.setattr(get_settings(), "tool_loop_max_iterations", 3)
+    chat = _looping_chat(fake_llm)
+    stats = TurnStats()
+
+    text = asyncio.run(runner._run_turn(chat, "¿Cómo está mi reserva?", stats))
+
+    assert text == "Esto es lo que he encontrado."
+    assert len(dispatcher.calls) == 3
+    assert chat.tool_configs[-1] == {"function_calling_config": {"mode": "NONE"}}
+    assert metrics.get_counter("tool_loop_limit", agent="reservas_agent", limit="iterations") == 1
+    assert metrics.get_histogram("tool_loop_depth", agent="reservas_agent").count == 1
+
+def test_limite_de_bytes_y_modelo_desobediente(runner, dispatcher, fake_llm, monkeypatch):
+    """El límite de bytes corta el bucle; si el modelo insiste en tools se responde con un texto fijo"""
+    monkeypatch.setattr(get_settings(), "tool_loop_max_result_bytes", 150)
+    chat = _looping_chat(fake_llm, obey_tool_config=False)
+
+    text = asyncio.run(runner._run_turn(chat, "¿Cómo está mi reserva?", TurnStats()))
+
+    assert text == TOOL_LIMIT_REPLY
+    assert len(dispatcher.calls) == 2
+    assert metrics.get_counter("tool_loop_limit", agent="reservas_agent", limit="bytes") == 1
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
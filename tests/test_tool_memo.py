@@ -0,0 +1,52 @@
+"""
+Test de la memoización por sesión de las tools de lectura (modelo y tools simulados, sin API)
+"""
+import asyncio
+
+import pytest
+
+from agent_runner import SAME_RESULT, TurnStats
+from metrics import metrics
+
+RESERVA = {"success": True, "reserva": {"token": "ABC123", "estado": "confirmada", "notas": "Terraza " * 40}}
+
+@pytest.fixture
+def turn(agent, dispatcher, fake_llm):
+    """Ejecuta un turno del agente de reservas con el guion de tools y devuelve los resultados que vio el modelo"""
+    dispatcher.results["consultar_reserva"] = RESERVA
+
+    def run(calls, session_id="s1"):
+        chat = fake_llm.chat(calls)
+        asyncio.run(agent._run_turn(chat, "Mi reserva", TurnStats(), session_id=session_id))
+        return chat.results
+    return run
+
+CONSULTAR = ("consultar_reserva", {"token": "ABC123"})
+
+def test_lectura_repetida_en_el_mismo_chat(turn, dispatcher):
+    """La segunda lectura igual no vuelve al backend ni reenvía el resultado"""
+    results = turn([CONSULTAR, CONSULTAR])
+
+    assert dispatcher.calls == ["consultar_reserva"]
+    assert results == [RESERVA, SAME_RESULT]
+    assert metrics.get_counter("tool_memo", tool="consultar_reserva", outcome="same_as_before") == 1
+    assert metrics.get_counter("tool_memo_tokens_saved", tool="consultar_reserva") >= 90
+
+def test_memoria_de_sesion_e_invalidacion(turn, dispatcher):
+    """Entre turnos se reutiliza el resultado (completo) hasta que una escritura lo invalida"""
+    turn([CONSULTAR])
+    assert turn([CONSULTAR]) == [RESERVA]
+    assert dispatcher.calls == ["consultar_reserva"]
+
+    turn([("cancelar_reserva", {"token": "ABC123"}), CONSULTAR])
+    assert dispatcher.calls == ["consultar_reserva", "cancelar_reserva", "consultar_reserva"]
+
+    # Otra sesión y la sesión compartida (sin session_id) no ven lo memorizado
+    turn([CONSULTAR], session_id="s2")
+    turn([CONSULTAR], session_id=None)
+    turn([CONSULTAR], session_id=None)
+    assert dispatcher.calls.count("consultar_reserva") == 5
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,114 @@
+"""
+Test del registro de tools y su tabla de despacho (no necesita servicio ni API)
+"""
+import asyncio
+
+from metrics import metrics
+from tool_registry import ToolRegistry, get_tool_registry
+
+DEFINITIONS = [
+    {"name": "listar", "description": "Lista", "parameters": {}, "cache_ttl": 60, "read_only": True,
+     "result_shaping": {"fields": {"menus": ["nombre"]}}},
+    {"name": "lenta", "description": "Lenta", "parameters": {}, "timeout": 0.05, "read_only": True},
+    {"name": "escribir", "description": "Escribe", "parameters": {}, "timeout": 0.05,
+     "validation": {"num": {"type": "integer", "minimum": 1, "maximum": 5}}},
+    {"name": "rota", "description": "Falla por dentro", "parameters": {}},
+]
+
+class FakeTools:
+    def __init__(self):
+        self.calls = {"listar": 0, "lenta": 0, "escribir": 0, "rota": 0}
+
+    async def listar(self):
+        self.calls["listar"] += 1
+        return {"success": True, "menus": [{"nombre": "Menú del día", "precio": 14.5}]}
+
+    async def lenta(self):
+        self.calls["lenta"] += 1
+        await asyncio.sleep(1)
+
+    async def escribir(self, num):
+        self.calls["escribir"] += 1
+        await asyncio.sleep(1)
+
+    async def rota(self, fecha):
+        self.calls["rota"] += 1
+        return fecha + 1  # TypeError de la propia tool, no de los argumentos
+
+def test_cache_y_shaping():
+    """Las tools cacheables solo llaman al backend una vez dentro del TTL"""
+    tools = FakeTools()
+    registry = ToolRegistry(DEFINITIONS, tools)
+    first = asyncio.run(registry.dispatch("listar", {}))
+    second = asyncio.run(registry.dispatch("listar", {}))
+    assert first == second == {"success": True, "menus": [{"nombre": "Menú del día"}]}
+    assert tools.calls["listar"] == 1
+    assert metrics.get_counter("tool_cache", tool="listar", outcome="hit") >= 1
+
+def test_timeout_e_idempotencia():
+    """Las idempotentes se reintentan una vez; las de escritura no"""
+    tools = FakeTools()
+    registry = ToolRegistry(DEFINITIONS, tools)
+    slow = asyncio.run(registry.dispatch("lenta", {}))
+    write = asyncio.run(registry.dispatch("escribir", {"num": 2}))
+    assert slow["success"] is False and tools.calls["lenta"] == 2
+    assert "no se sabe" in write["error"] and tools.calls["escribir"] == 1
+
+def test_validacion_y_tool_desconocida():
+    """Los argumentos inválidos no llegan a la tool; las tools desconocidas devuelven error"""
+    tools = FakeTools()
+    registry = ToolRegistry(DEFINITIONS, tools)
+    result = asyncio.run(registry.dispatch("escribir", {"num": 9}))
+    assert result["validation_errors"][0]["field"] == "num"
+    assert tools.calls["escribir"] == 0
+    assert "no encontrada" in asyncio.run(registry.dispatch("borrar_todo", {}))["error"]
+
+def test_argumentos_no_aceptados_y_errores_internos():
+    """Los argumentos se comprueban contra la firma; un TypeError dentro de la tool no se disfraza"""
+    tools = FakeTools()
+    registry = ToolRegistry(DEFINITIONS, tools)
+    result = asyncio.run(registry.dispatch("rota", {"fecha": "hoy", "hora": "21:00"}))
+    assert result["error"].startswith("Argumentos no válidos para rota") and tools.calls["rota"] == 0
+
+    try:
+        asyncio.run(registry.dispatch("rota", {"fecha": "hoy"}))
+        raise AssertionError("El error interno debería propagarse")
+    except TypeError as e:
+        assert "Argumentos no válidos" not in str(e)
+    assert tools.calls["rota"] == 1
+
+def test_errores_de_validacion_sin_truncar():
+    """El shaping no corta la lista de errores: el modelo recibe todos los campos a corregir"""
+    registry = get_tool_registry()
+    args = {
+        "nombre_cliente": "Laura Martín",
+        "telefono_cliente": "12345",
+        "email_cliente": "laura@",
+        "fecha_reserva": "25/12/2030 20:00",
+        "num_personas": 25
+    }
+    result = asyncio.run(registry.dispatch("crear_reserva", args))
+    fields = [e["field"] for e in result["validation_errors"]]
+    assert fields == ["telefono_cliente", "email_cliente", "fecha_reserva", "num_personas"]
+    assert len(result["error"]) > registry.get("crear_reserva").shaping["max_text_length"]
+    assert all(e["message"] in result["error"] for e in result["validation_errors"])
+
+def test_registro_del_restaurante():
+    """Todas las tools declaradas tienen implementación y declaración para Gemini"""
+    registry = get_tool_registry()
+    assert registry.read_only == {"get_menu_mas_valorado", "listar_menus_disponibles", "consultar_reserva"}
+    declaration = registry.declarations(["crear_reserva"])[0]
+    assert set(declaration) == {"name", "description", "parameters"}
+    assert registry.get("cancelar_reserva").idempotent
+    # crear_reserva lleva clave, pero solo se reintenta si el backend deduplica (ver test_idempotency.py)
+    crear = registry.get("crear_reserva")
+    assert crear.idempotency_key and not crear.idempotent and crear.timeout == 10.0
+
+if __name__ == "__main__":
+    test_cache_y_shaping()
+    test_timeout_e_idempotencia()
+    test_validacion_y_tool_desconocida()
+    test_argumentos_no_aceptados_y_errores_internos()
+    test_errores_de_validacion_sin_truncar()
+    test_registro_del_restaurante()
+    print("✅ Tests del registro de tools completados")
@@ -0,0 +1,47 @@
+"""
+Test del servidor de tools por JSON-RPC (no necesita servicio ni API)
+"""
+import asyncio
+
+from tool_server import INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, handle_request
+
+def _rpc(method, params=None, request_id=1):
+    return asyncio.run(handle_request({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}))
+
+def test_initialize_y_lista_de_tools():
+    """initialize y tools/list siguen el formato MCP"""
+    assert _rpc("initialize")["result"]["capabilities"] == {"tools": {}}
+    tools = {tool["name"]: tool for tool in _rpc("tools/list")["result"]["tools"]}
+    assert tools["consultar_reserva"]["annotations"]["readOnlyHint"] is True
+    assert tools["crear_reserva"]["inputSchema"]["required"][0] == "nombre_cliente"
+
+def test_tools_call_aplica_politicas():
+    """tools/call pasa por el registro (aquí, la validación local sin tocar el backend)"""
+    response = _rpc("tools/call", {"name": "modificar_fecha_reserva",
+                                   "arguments": {"token": "T", "nueva_fecha": "2020-01-01T20:00"}})
+    result = response["result"]
+    assert result["isError"] is True
+    assert result["structuredContent"]["validation_errors"][0]["field"] == "nueva_fecha"
+
+def test_errores_de_protocolo():
+    """Métodos desconocidos y notificaciones"""
+    assert _rpc("resources/list")["error"]["code"] == METHOD_NOT_FOUND
+    assert _rpc("notifications/initialized", request_id=None) is None
+
+def test_peticiones_mal_formadas():
+    """Un method que no es texto o unos params que no son objeto no rompen el servidor"""
+    for method in (5, None, ["tools/list"]):
+        response = asyncio.run(handle_request({"jsonrpc": "2.0", "id": 7, "method": method}))
+        assert response == {"jsonrpc": "2.0", "id": 7, "error": {"code": INVALID_REQUEST, "message": "Petición JSON-RPC no válida"}}
+    response = asyncio.run(handle_request({"jsonrpc": "2.0", "id": 8, "method": "tools/call", "params": ["consultar_reserva"]}))
+    assert response["error"]["code"] == INVALID_PARAMS
+    response = _rpc("tools/call", {"name": "modificar_fecha_reserva", "_meta": "sesion",
+                                   "arguments": {"token": "T", "nueva_fecha": "2020-01-01T20:00"}})
+    assert response["result"]["structuredContent"]["validation_errors"][0]["field"] == "nueva_fecha"
+
+if __name__ == "__main__":
+    test_initialize_y_lista_de_tools()
+    test_tools_call_aplica_politicas()
+    test_errores_de_protocolo()
+    test_peticiones_mal_formadas()
+    print("✅ Tests del servidor de tools completados")
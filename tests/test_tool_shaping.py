@@ -0,0 +1,63 @@
+"""
+Test del shaping de resultados de tools (no necesita servicio ni API)
+"""
+from tool_shaping import shape_result, measure_result
+
+MENUS_RESULT = {
+    "success": True,
+    "menus": [
+        {
+            "id": i,
+            "nombre": f"Menú {i}",
+            "descripcion": "Entrante, principal y postre de temporada. " * 10,
+            "precio": 25.5 + i,
+            "valoracion_promedio": 4.2,
+            "disponible": True,
+            "imagen_url": f"https://example.com/img/{i}.jpg",
+            "created_at": "2025-01-01T00:00:00.000Z",
+            "updated_at": None
+        }
+        for i in range(8)
+    ],
+    "total": 8
+}
+
+MENUS_SHAPING = {
+    "fields": {"menus": ["id", "nombre", "descripcion", "precio", "valoracion_promedio"]},
+    "max_text_length": 160,
+    "compact": ["menus"]
+}
+
+def test_shaping_menus():
+    """Comprueba whitelist, truncado y codificación compacta"""
+    shaped = shape_result(MENUS_RESULT, MENUS_SHAPING)
+
+    assert shaped["success"] is True
+    assert shaped["total"] == 8
+    assert shaped["menus"]["columns"] == ["id", "nombre", "descripcion", "precio", "valoracion_promedio"]
+    assert len(shaped["menus"]["rows"]) == 8
+    assert all(len(row[2]) <= 161 for row in shaped["menus"]["rows"])
+
+    raw_bytes, raw_tokens = measure_result(MENUS_RESULT)
+    shaped_bytes, shaped_tokens = measure_result(shaped)
+    assert shaped_bytes < raw_bytes
+    assert shaped_tokens < raw_tokens
+
+    print(f"✅ Menús: {raw_bytes} → {shaped_bytes} bytes, {raw_tokens} → {shaped_tokens} tokens")
+
+def test_shaping_errores_intactos():
+    """Los errores no se alteran salvo truncado"""
+    error = {"success": False, "error": "Reserva no encontrada con ese token"}
+    assert shape_result(error, {"fields": {"reserva": ["token"]}}) == error
+
+def test_shaping_formato_desconocido():
+    """Si el dict no contiene ningún campo permitido se mantiene intacto"""
+    result = {"success": True, "reserva": {"message": "ok", "data": {"token": "ABC"}}}
+    shaped = shape_result(result, {"fields": {"reserva": ["token", "estado"]}})
+    assert shaped["reserva"] == result["reserva"]
+
+if __name__ == "__main__":
+    test_shaping_menus()
+    test_shaping_errores_intactos()
+    test_shaping_formato_desconocido()
+    print("✅ Tests de shaping completados")
@@ -0,0 +1,75 @@
+"""
+Test de la validación local de argumentos de reservas (no necesita servicio ni API)
+"""
+from datetime import datetime, timedelta
+
+from tool_validation import validate_tool_args, validation_error_result
+
+MANANA = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+RESERVA_VALIDA = {
+    "nombre_cliente": "Laura Martín",
+    "telefono_cliente": "+34 612-345-678",
+    "email_cliente": "laura@example.com",
+    "fecha_reserva": f"{MANANA}T20:30",
+    "num_personas": 4.0
+}
+
+def _campos_con_error(tool: str, args: dict) -> set:
+    _, errors = validate_tool_args(tool, args)
+    return {e["field"] for e in errors}
+
+def test_reserva_valida_normalizada():
+    """Los datos válidos pasan y se normalizan (teléfono sin separadores, entero)"""
+    args, errors = validate_tool_args("crear_reserva", RESERVA_VALIDA)
+    assert errors == []
+    assert args["telefono_cliente"] == "+34612345678"
+    assert args["num_personas"] == 4
+
+def test_strip_solo_en_los_extremos():
+    """El email solo se recorta: un espacio en medio no se borra en silencio, se rechaza"""
+    args, errors = validate_tool_args("crear_reserva", {**RESERVA_VALIDA, "email_cliente": "  laura@example.com "})
+    assert errors == [] and args["email_cliente"] == "laura@example.com"
+    assert _campos_con_error("crear_reserva", {**RESERVA_VALIDA, "email_cliente": "laura @example.com"}) == {"email_cliente"}
+
+def test_reserva_con_errores():
+    """Todos los campos incorrectos se informan a la vez"""
+    args = {
+        **RESERVA_VALIDA,
+        "telefono_cliente": "12345",
+        "email_cliente": "laura@",
+        "fecha_reserva": f"{MANANA}T23:30",
+        "num_personas": 25
+    }
+    assert _campos_con_error("crear_reserva", args) == {
+        "telefono_cliente", "email_cliente", "fecha_reserva", "num_personas"
+    }
+
+def test_fechas():
+    """Formato, horario 9:00-23:00 y fecha futura"""
+    assert _campos_con_error("modificar_fecha_reserva", {"token": "T", "nueva_fecha": "25/12/2030 20:00"}) == {"nueva_fecha"}
+    assert _campos_con_error("modificar_fecha_reserva", {"token": "T", "nueva_fecha": f"{MANANA}T08:59"}) == {"nueva_fecha"}
+    assert _campos_con_error("modificar_fecha_reserva", {"token": "T", "nueva_fecha": "2020-01-10T20:00"}) == {"nueva_fecha"}
+    assert _campos_con_error("modificar_fecha_reserva", {"token": "T", "nueva_fecha": f"{MANANA}T23:00"}) == set()
+
+def test_resultado_para_el_modelo():
+    """El resultado de error es estructurado y no llega al backend"""
+    _, errors = validate_tool_args("crear_reserva", {**RESERVA_VALIDA, "num_personas": 0})
+    result = validation_error_result("crear_reserva", errors)
+    assert result["success"] is False
+    assert result["validation_errors"][0]["field"] == "num_personas"
+    assert "num_personas" in result["error"]
+
+def test_tools_sin_reglas():
+    """Las tools sin bloque `validation` no se tocan"""
+    args = {"token": "ABC"}
+    assert validate_tool_args("consultar_reserva", args) == (args, [])
+
+if __name__ == "__main__":
+    test_reserva_valida_normalizada()
+    test_strip_solo_en_los_extremos()
+    test_reserva_con_errores()
+    test_fechas()
+    test_resultado_para_el_modelo()
+    test_tools_sin_reglas()
+    print("✅ Tests de validación de reservas completados")
@@ -0,0 +1,44 @@
+"""
+Test del exportador de trazas: muestreo y rotación (no necesita servicio ni API)
+"""
+import os
+
+from tracing import JsonlExporter, Tracer
+
+def _trace(tracer: Tracer, spans: int = 3):
+    with tracer.span("process_message"):
+        for i in range(spans - 1):
+            with tracer.span(f"tool.{i}"):
+                pass
+
+def test_rotacion_por_tamano(tmp_path):
+    """El fichero no crece sin límite: rota y conserva solo TRACE_BACKUPS anteriores"""
+    path = str(tmp_path / "traces.jsonl")
+    exporter = JsonlExporter(path, max_bytes=2000, backups=2)
+    tracer = Tracer(True, exporter)
+    for _ in range(40):
+        _trace(tracer)
+    exporter.flush()
+    files = sorted(os.listdir(tmp_path))
+    assert files == ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"]
+    # Cada fichero rota en cuanto supera el tamaño (puede pasarse como mucho en una traza)
+    assert all(os.path.getsize(tmp_path / name) < 4000 for name in files)
+
+def test_muestreo_por_traza(tmp_path):
+    """Con TRACE_SAMPLE_RATE se guardan trazas completas, no spans sueltos"""
+    path = str(tmp_path / "traces.jsonl")
+    exporter = JsonlExporter(path, sample_rate=0.25)
+    tracer = Tracer(True, exporter)
+    for _ in range(400):
+        _trace(tracer)
+    exporter.flush()
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) % 3 == 0
+    assert 40 <= len(lines) // 3 <= 160
+    assert JsonlExporter(path, sample_rate=0).sampled("ffffffff") is False
+
+if __name__ == "__main__":
+    import sys
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
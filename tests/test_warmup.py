@@ -0,0 +1,45 @@
+"""
+Test del calentamiento del worker (no necesita servicio ni API)
+"""
+import asyncio
+import types
+
+from menu_cache import menu_cache
+from warmup import Warmup
+
+class ModeloLento:
+    """Modelo que no termina nunca la inferencia de calentamiento"""
+    async def generate_content_async(self, *args, **kwargs):
+        await asyncio.sleep(60)
+
+def _sistema(model) -> types.SimpleNamespace:
+    return types.SimpleNamespace(runner=types.SimpleNamespace(agents={"info_agent": types.SimpleNamespace(model=model)}))
+
+def test_warmup_informa_pasos(monkeypatch):
+    """Los pasos fallidos se informan pero no impiden que el worker quede listo"""
+    async def refresh():
+        return True
+    monkeypatch.setattr(menu_cache, "refresh", refresh)
+
+    warmup = Warmup()
+    asyncio.run(warmup.run(None, [(None, 80)], inference=False, timeout=5))
+    assert warmup.ready
+    assert warmup.report["menus"]["ok"] and warmup.report["dns"]["ok"]
+    assert "inference" not in warmup.report
+
+def test_warmup_timeout(monkeypatch):
+    """Si un paso se cuelga, el worker pasa a estar listo al agotar el timeout"""
+    async def refresh():
+        return False
+    monkeypatch.setattr(menu_cache, "refresh", refresh)
+
+    warmup = Warmup()
+    asyncio.run(warmup.run(_sistema(ModeloLento()), [], inference=True, timeout=0.1))
+    assert warmup.ready
+    assert warmup.report["menus"]["ok"] is False
+    assert warmup.report["timeout"]["ok"] is False
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
+    print("✅ Tests de calentamiento completados")
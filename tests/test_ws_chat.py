@@ -0,0 +1,158 @@
+"""
+Test del chat por WebSocket con el TestClient de FastAPI (sistema simulado, sin API)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import ws_chat
+from config import get_settings
+from fair_scheduler import SessionQueueFull
+from main import ChatDrain
+from metrics import metrics
+from progress import emit_progress
+from ws_chat import CHUNK_CHARS, SEND_QUEUE_SIZE, ChatSocket
+
+RESPONSE = "Tenemos mesa libre a las nueve. " * 8
+
+class FakeSystem:
+    """process_message con latencia fija que emite un evento de progreso"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.messages = []
+
+    async def process_message(self, user_message, session_id=None, history=None):
+        self.messages.append(user_message)
+        if self.error:
+            raise self.error
+        emit_progress("routing")
+        await asyncio.sleep(self.delay)
+        return {"success": True, "response": RESPONSE, "navigation_action": None,
+                "agents_used": ["reservas_agent"], "served_mode": "normal"}
+
+    def reset_session(self, session_id):
+        pass
+
+def _client(system) -> TestClient:
+    app = FastAPI()
+    drain = ChatDrain()
+
+    @app.websocket("/ws/chat")
+    async def endpoint(websocket: WebSocket):
+        await ChatSocket(websocket, system, drain).run()
+    return TestClient(app)
+
+@pytest.fixture
+def ws_settings(monkeypatch):
+    metrics.reset()
+    settings = get_settings()
+    monkeypatch.setattr(settings, "stateless_chat", False)
+    monkeypatch.setattr(settings, "ws_heartbeat_interval", 30)
+    monkeypatch.setattr(settings, "ws_idle_timeout", 300)
+    monkeypatch.setattr(settings, "ws_max_pending", 4)
+    return settings
+
+def _until(ws, frame_type: str) -> list:
+    """Lee mensajes hasta uno del tipo indicado (incluido)"""
+    frames = []
+    while not frames or frames[-1]["type"] != frame_type:
+        frames.append(ws.receive_json())
+    return frames
+
+def test_respuesta_por_fragmentos(ws_settings):
+    """Progreso durante el turno; al terminar, la respuesta completa troceada y done"""
+    with _client(FakeSystem()).websocket_connect("/ws/chat?session_id=s1") as ws:
+        assert ws.receive_json() == {"type": "session", "session_id": "s1"}
+        ws.send_json({"type": "message", "content": "Mesa para 2", "id": "t1"})
+        frames = _until(ws, "done")
+
+    assert frames[0] == {"type": "progress", "stage": "routing", "id": "t1"}
+    chunks = [frame["content"] for frame in frames if frame["type"] == "chunk"]
+    assert "".join(chunks) == RESPONSE and len(chunks) > 1
+    assert all(len(chunk) <= CHUNK_CHARS for chunk in chunks)
+    assert frames[-1]["agents_used"] == ["reservas_agent"]
+
+def test_mensajes_pendientes_acotados(ws_settings):
+    """Con un turno en curso y la cola llena, los mensajes siguientes se rechazan (reintentables)"""
+    ws_settings.ws_max_pending = 1
+    system = FakeSystem(delay=0.3)
+    with _client(system).websocket_connect("/ws/chat") as ws:
+        ws.receive_json()
+        for n in range(3):
+            ws.send_json({"type": "message", "content": f"Mensaje {n}", "id": f"t{n}"})
+        frames = []
+        while sum(1 for frame in frames if frame["type"] in ("done", "error")) < 3:
+            frames.append(ws.receive_json())
+
+    rejected = [frame for frame in frames if frame["type"] == "error"]
+    assert rejected and all(frame["retryable"] for frame in rejected)
+    assert len(system.messages) == 3 - len(rejected)
+    assert metrics.get_counter("ws_messages_rejected") == len(rejected)
+
+def test_cola_de_la_sesion_llena(ws_settings):
+    """SessionQueueFull del planificador llega al cliente como error reintentable"""
+    with _client(FakeSystem(error=SessionQueueFull())).websocket_connect("/ws/chat") as ws:
+        ws.receive_json()
+        ws.send_json({"type": "message", "content": "Hola", "id": "t1"})
+        frame = ws.receive_json()
+    assert frame["type"] == "error" and frame["id"] == "t1" and frame["retryable"] is True
+    assert "espera a la respuesta anterior" in frame["error"]
+
+def test_heartbeat_sin_respuesta(ws_settings):
+    """El servidor envía ping y cierra (1001) si el cliente no contesta"""
+    ws_settings.ws_heartbeat_interval = 0.05
+    with _client(FakeSystem()).websocket_connect("/ws/chat") as ws:
+        ws.receive_json()
+        assert ws.receive_json() == {"type": "ping"}
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            while True:
+                ws.receive_json()
+    assert excinfo.value.code == 1001 and excinfo.value.reason == "heartbeat timeout"
+
+def test_cierre_por_inactividad(ws_settings):
+    """Contestar a los ping mantiene viva la conexión, pero sin mensajes se cierra tras WS_IDLE_TIMEOUT"""
+    ws_settings.ws_heartbeat_interval = 0.05
+    ws_settings.ws_idle_timeout = 0.3
+    pings = 0
+    with _client(FakeSystem()).websocket_connect("/ws/chat") as ws:
+        ws.receive_json()
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            while True:
+                if ws.receive_json()["type"] == "ping":
+                    pings += 1
+                    ws.send_json({"type": "pong"})
+    assert excinfo.value.code == 1000 and excinfo.value.reason == "idle timeout"
+    assert pings >= 3
+    assert metrics.get_counter("ws_connections_closed", reason="idle timeout") == 1
+
+class StalledWebSocket:
+    """WebSocket de un cliente que no lee: send_text no termina nunca"""
+
+    query_params = {}
+
+    async def send_text(self, text):
+        await asyncio.sleep(60)
+
+def test_cola_de_envio_y_cliente_lento(ws_settings, monkeypatch):
+    """Con la cola de envío llena se descarta el progreso; un envío bloqueado cierra la conexión (1008)"""
+    monkeypatch.setattr(ws_chat, "SEND_TIMEOUT", 0.05)
+    socket = ChatSocket(StalledWebSocket(), FakeSystem(), SimpleNamespace(draining=False))
+
+    for _ in range(SEND_QUEUE_SIZE):
+        socket._emit({"type": "ping"})
+    socket._emit({"type": "progress", "stage": "routing"})
+    assert socket.outbox.qsize() == SEND_QUEUE_SIZE
+    assert metrics.get_counter("ws_frames_dropped", type="progress") == 1
+
+    asyncio.run(socket._send_loop())
+    assert (socket.close_code, socket.close_reason) == (1008, "send timeout")
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))